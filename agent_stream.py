@@ -0,0 +1,56 @@
+import time
+
+# Tag on the planner agent's own LLM, so its tokens can be told apart from
+# the LLM calls made inside tools (SQL generation, RAG, recommender)
+AGENT_LLM_TAG = "agent_llm"
+
+
+async def astream_agent(agent_executor, inputs: dict, config=None, on_token=None, on_tool_start=None, on_tool_end=None):
+    """
+    Runs the agent with astream_events and reports progress as it happens.
+    on_token(text_so_far) is called for every token of the answer,
+    on_tool_start(name, tool_input) and on_tool_end(name, seconds) around
+    each tool call. Returns the final output plus time-to-first-token and
+    total latency for the turn (both in seconds).
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    answer = ""
+    output = None
+    tool_started = {}
+
+    async for event in agent_executor.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+
+        if kind == "on_chat_model_stream" and AGENT_LLM_TAG in event.get("tags", []):
+            token = event["data"]["chunk"].content
+            if token:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                answer += token
+                if on_token:
+                    on_token(answer)
+
+        elif kind == "on_tool_start":
+            # Anything streamed before a tool call was not the final answer
+            answer = ""
+            first_token_at = None
+            tool_started[event["run_id"]] = time.perf_counter()
+            if on_tool_start:
+                on_tool_start(event["name"], event["data"].get("input"))
+
+        elif kind == "on_tool_end":
+            elapsed = time.perf_counter() - tool_started.pop(event["run_id"], start)
+            if on_tool_end:
+                on_tool_end(event["name"], elapsed)
+
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            result = event["data"].get("output") or {}
+            output = result.get("output") if isinstance(result, dict) else None
+
+    end = time.perf_counter()
+    return {
+        "output": output if output is not None else answer,
+        "ttft": (first_token_at - start) if first_token_at else None,
+        "total": end - start,
+    }
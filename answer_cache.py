@@ -0,0 +1,184 @@
+import os
+import re
+import threading
+import time
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from tracing import get_tracer
+
+# How long an answer stays fresh, by the tool that produced it (seconds).
+# Answers that used several tools get the shortest TTL among them; 0 = never cache.
+TOOL_TTLS = {
+    "CurrentWeather": 10 * 60,
+    "EventRecommender": 15 * 60,
+    "DatabaseQuery": 24 * 60 * 60,
+    "DocumentKnowledgeBase": 24 * 60 * 60,
+    "duckduckgo_search": 60 * 60,
+    "ImageGenerator": 0,
+}
+# Answers with no tool call are conversational and depend on the chat history
+NO_TOOL_TTL = 0
+
+SIMILARITY_THRESHOLD = 0.95
+MAX_ENTRIES = 1000
+
+# Words that only phrase a question. Anything that can change the answer stays in
+# the entity key: names, numbers, who/when/where, highest/lowest, average/total, more/less
+PHRASING_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "it", "its", "do", "does", "did", "can", "could", "would", "will",
+    "i", "we", "you", "me", "my", "our", "us", "please", "tell", "show", "give", "list", "find", "get", "check",
+    "know", "like", "what", "how", "in", "at", "for", "of", "on", "to", "there", "right", "now", "current",
+    "currently", "today", "tonight",
+}
+
+
+def entities(query: str) -> frozenset:
+    """
+    A question's words without its phrasing: names, places, literals and
+    modifiers. "Engineering budget" and "Marketing budget", or "highest
+    salary" and "lowest salary", embed almost identically but differ here.
+    """
+    words = (re.sub(r"'s$", "", word) for word in re.findall(r"[a-z0-9][a-z0-9'&.-]*", query.lower()))
+    return frozenset(word.rstrip(".") for word in words if word not in PHRASING_WORDS)
+
+
+def file_version(path: str) -> str:
+    """
+    Changes whenever the database is written; used to invalidate database
+    answers. In WAL mode commits go to the -wal file and leave the main
+    file untouched until a checkpoint, so both are part of the version.
+    """
+    parts = []
+    for name in (path, path + "-wal"):
+        try:
+            stat = os.stat(name)
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parts.append("missing")
+    return "|".join(parts)
+
+
+class ToolUsageRecorder(BaseCallbackHandler):
+    """Collects the names of the tools called during one agent run."""
+
+    def __init__(self):
+        self.tools = []
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.tools.append((serialized or {}).get("name") or kwargs.get("name"))
+
+
+class SemanticAnswerCache:
+    """
+    Caches final agent answers keyed by the embedding of the user's question.
+    A new question hits when its cosine similarity to a cached one is above
+    the threshold, both name the same entities and literals (see entities),
+    the answer is still within the TTL of every tool it used, and the data
+    versions those tools depend on (e.g. company.db, the knowledge base
+    index) are unchanged. Callers must not look up or store turns that
+    depend on the chat history (see intent_router.is_follow_up).
+    """
+
+    def __init__(self, embeddings, threshold: float = SIMILARITY_THRESHOLD, ttls=None, max_entries: int = MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttls = dict(TOOL_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.entries = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "stores": 0, "seconds_saved": 0.0}
+
+    def embed(self, query: str):
+        vector = np.array(self.embeddings.embed_query(query.strip().lower()), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def ttl(self, tools) -> float:
+        if not tools:
+            return NO_TOOL_TTL
+        return min(self.ttls.get(tool, NO_TOOL_TTL) for tool in tools)
+
+    def is_fresh(self, entry, versions, now) -> bool:
+        if now - entry["created"] > entry["ttl"]:
+            return False
+        return all(versions.get(key) == value for key, value in entry["versions"].items())
+
+    def lookup(self, query: str, versions=None):
+        """
+        Returns (answer, tools) for a similar, fresh question, or None.
+        'versions' maps data sources to their current version, e.g.
+        {"DatabaseQuery": file_version("company.db")}.
+        """
+        # Traced as one span, including the embedding call
+        with get_tracer().span("cache", "answer") as span:
+            result = self.find(query, versions)
+            span["cache"] = "hit" if result else "miss"
+            return result
+
+    def find(self, query: str, versions=None):
+        vector = self.embed(query)
+        now = time.time()
+        versions = versions or {}
+
+        with self.lock:
+            self.stats["lookups"] += 1
+            if not self.entries:
+                return None
+
+            # Drop stale answers so they can't shadow a fresh one
+            fresh = [i for i, entry in enumerate(self.entries) if self.is_fresh(entry, versions, now)]
+            if len(fresh) < len(self.entries):
+                self.entries = [self.entries[i] for i in fresh]
+                self.vectors = self.vectors[fresh]
+            if not self.entries:
+                return None
+
+            # Near-identical wording is not enough: the entities must be the same too
+            similarities = self.vectors @ vector
+            query_entities = entities(query)
+            for i, entry in enumerate(self.entries):
+                if entry["entities"] != query_entities:
+                    similarities[i] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            entry = self.entries[best]
+            entry["last_used"] = now
+            self.stats["hits"] += 1
+            self.stats["seconds_saved"] += entry["latency"]
+            return entry["answer"], entry["tools"]
+
+    def store(self, query: str, answer: str, tools, latency: float, versions=None):
+        ttl = self.ttl(tools)
+        if ttl <= 0 or not answer:
+            return
+
+        versions = versions or {}
+        entry = {
+            "query": query,
+            "entities": entities(query),
+            "answer": answer,
+            "tools": list(tools),
+            "ttl": ttl,
+            "latency": latency,
+            "created": time.time(),
+            "last_used": time.time(),
+            # Only the data sources this answer actually depended on
+            "versions": {tool: versions[tool] for tool in tools if tool in versions},
+        }
+        vector = self.embed(query)
+
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                oldest = min(range(len(self.entries)), key=lambda i: self.entries[i]["last_used"])
+                del self.entries[oldest]
+                self.vectors = np.delete(self.vectors, oldest, axis=0)
+
+            self.entries.append(entry)
+            self.vectors = vector.reshape(1, -1) if not len(self.vectors) else np.vstack([self.vectors, vector])
+            self.stats["stores"] += 1
+
+    @property
+    def hit_rate(self) -> float:
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
@@ -0,0 +1,151 @@
+"""
+HTTP API for the agent, without Streamlit.
+
+    POST   /sessions/{session}/messages   {"message": "..."} -> answer, tools, latency, image jobs
+    POST   /sessions/{session}/documents  multipart upload; syncs the session's knowledge base
+    DELETE /sessions/{session}            forgets the session (its index stays on disk)
+    GET    /images/{job}                  image job status
+    GET    /images/{job}/file             the finished image
+    GET    /health
+
+Sessions are created on first use and keep their memory, documents and
+engine between requests; turns of one session run one at a time, turns
+of different sessions concurrently.
+
+Usage (keys from OPENAI_API_KEY and WEATHER_API_KEY):
+    python api_server.py --port 8080
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from aiohttp import web
+from chat_service import ChatService, options_from_env
+from image_jobs import get_image_queue
+
+logger = logging.getLogger(__name__)
+
+SERVICE = web.AppKey("service", ChatService)
+TURN_LOCKS = web.AppKey("turn_locks", dict)
+
+
+class UploadedFile:
+    """A multipart file part, shaped like Streamlit's UploadedFile for KnowledgeBaseIndex.sync."""
+
+    def __init__(self, name: str, data: bytes):
+        self.file_id = uuid.uuid4().hex  # unique per upload, so its content is hashed once (see file_key)
+        self.name = name
+        self.data = data
+
+    def getvalue(self) -> bytes:
+        return self.data
+
+
+def image_status(job) -> dict:
+    return {"job": job.id, "description": job.description, "status": job.status,
+            "url": f"/images/{job.id}/file" if job.status == "done" else None, "error": job.error}
+
+
+def turn_lock(request, session_id: str) -> asyncio.Lock:
+    return request.app[TURN_LOCKS].setdefault(session_id, asyncio.Lock())
+
+
+async def post_message(request):
+    session_id = request.match_info["session"]
+    body = await request.json()
+    message = (body.get("message") or "").strip()
+    if not message:
+        raise web.HTTPBadRequest(text='Expected {"message": "..."}')
+
+    session = request.app[SERVICE].session(session_id)
+    async with turn_lock(request, session_id):
+        try:
+            turn = await session.ask(message)
+        except Exception as e:
+            logger.exception(f"Turn failed in session {session_id}")
+            return web.json_response({"session": session_id, "error": str(e)}, status=500)
+    return web.json_response({
+        "session": session_id, "answer": turn["output"], "tools": turn["tools"], "routed": turn["routed"],
+        "cached": turn["cached"], "ttft": turn["ttft"], "total": turn["total"],
+        "images": [image_status(job) for job in turn["images"]],
+    })
+
+
+async def post_documents(request):
+    session_id = request.match_info["session"]
+    files = []
+    reader = await request.multipart()
+    while (part := await reader.next()) is not None:
+        if part.filename:
+            files.append(UploadedFile(part.filename, await part.read()))
+    if not files:
+        raise web.HTTPBadRequest(text="Expected multipart files")
+
+    session = request.app[SERVICE].session(session_id)
+    async with turn_lock(request, session_id):
+        # Parsing and embedding are blocking; they run off the event loop
+        added, removed = await asyncio.to_thread(session.sync_documents, files)
+    return web.json_response({"session": session_id, "added": added, "removed": removed,
+                              "has_documents": session.vectorstore is not None})
+
+
+async def delete_session(request):
+    session_id = request.match_info["session"]
+    request.app[TURN_LOCKS].pop(session_id, None)
+    if not request.app[SERVICE].drop_session(session_id):
+        raise web.HTTPNotFound(text=f"No session {session_id}")
+    return web.json_response({"session": session_id, "deleted": True})
+
+
+async def get_image(request):
+    job = get_image_queue().get(request.match_info["job"])
+    if job is None:
+        raise web.HTTPNotFound(text="Unknown image job")
+    return web.json_response(image_status(job))
+
+
+async def get_image_file(request):
+    job = get_image_queue().get(request.match_info["job"])
+    if job is None or job.status != "done":
+        raise web.HTTPNotFound(text="Image not ready")
+    return web.FileResponse(job.path)
+
+
+async def health(request):
+    return web.json_response({"status": "ok", "sessions": len(request.app[SERVICE].sessions)})
+
+
+def create_app(service: ChatService) -> web.Application:
+    app = web.Application(client_max_size=200 * 1024 * 1024)
+    app[SERVICE] = service
+    app[TURN_LOCKS] = {}
+    app.add_routes([
+        web.post("/sessions/{session}/messages", post_message),
+        web.post("/sessions/{session}/documents", post_documents),
+        web.delete("/sessions/{session}", delete_session),
+        web.get("/images/{job}", get_image),
+        web.get("/images/{job}/file", get_image_file),
+        web.get("/health", health),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--no-answer-cache", action="store_true", help="always run the agent")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    service = ChatService(os.environ["OPENAI_API_KEY"], os.environ["WEATHER_API_KEY"],
+                          use_answer_cache=not args.no_answer_cache, **options_from_env())
+    web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
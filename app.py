@@ -1,24 +1,24 @@
-import json
+import asyncio
+import logging
 import os
-import requests
+import uuid
 import streamlit as st
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.chains import ConversationalRetrievalChain, LLMChain
-from langchain.memory import ConversationBufferMemory
-from langchain.vectorstores import FAISS
-from langchain.document_loaders import UnstructuredFileLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.prompts import PromptTemplate, ChatPromptTemplate
-
-# Import Agent and Tool components
-from langchain.agents import AgentExecutor, Tool, create_openai_functions_agent
-from langchain_community.tools.ddg_search import DuckDuckGoSearchRun
-from langchain_community.utilities.dalle_image_generator import DallEAPIWrapper
-from langchain_core.messages import SystemMessage
-
-# Import custom agents
-from sql_agent import query_agent 
-from recommender_system import run_event_recommender
+
+# The chat sessions and agent engine (shared with api_server.py and batch_runner.py)
+from chat_service import ChatService, ChatSession, options_from_env
+from image_jobs import get_image_queue
+from intent_router import ROUTABLE_TOOLS
+from weather_client import get_weather_client
+from tracing import get_tracer, start_metrics_server
+
+# Progress messages from the tools and indexes; LOG_LEVEL=WARNING quiets them
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+# Images are drawn in the background; pending ones are checked this often
+IMAGE_POLL_SECONDS = 2
 
 # Page Configuration
 st.set_page_config(
@@ -41,300 +41,94 @@ if not api_key or not weather_api_key:
 
 os.environ["OPENAI_API_KEY"] = api_key
 
-# Document Upload
-st.sidebar.header("Upload Documents for RAG")
-uploaded_files = st.sidebar.file_uploader(
-    "Upload your documents (PDF, TXT, etc.)", 
-    type=["pdf", "txt", "md", "docx"], 
-    accept_multiple_files=True
-)
-
-# Caching Function for Vector Store
+# Optional Prometheus endpoint (METRICS_PORT=9464), started once per process
 @st.cache_resource
-def create_vectorstore(files):
-    """Create a FAISS vector store from uploaded files."""
-    if not files:
-        return None
-    
-    with st.spinner("Processing documents, creating embeddings..."):
-        try:
-            docs = []
-            temp_dir = "temp_docs"
-            if not os.path.exists(temp_dir):
-                os.makedirs(temp_dir)
-
-            for file in files:
-                temp_path = os.path.join(temp_dir, file.name)
-                with open(temp_path, "wb") as f:
-                    f.write(file.getvalue())
-                loader = UnstructuredFileLoader(temp_path)
-                docs.extend(loader.load())
-
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-            splits = text_splitter.split_documents(docs)
-            
-            if not splits:
-                st.error("Could not split documents. Please check file content.")
-                return None
-
-            embeddings = OpenAIEmbeddings()
-            vectorstore = FAISS.from_documents(splits, embeddings)
-            
-            for file in files:
-                os.remove(os.path.join(temp_dir, file.name))
-            os.rmdir(temp_dir)
-            
-            st.success("Knowledge base created successfully!")
-            return vectorstore
-
-        except Exception as e:
-            st.error(f"Error creating vector store: {e}")
-            return None
-
-# Create RAG Chain (will be wrapped in a tool)
-vectorstore = create_vectorstore(uploaded_files)
-
-# Initialize LLM
-llm = ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1)
-
-# Initialize Memory
-if "memory" not in st.session_state:
-    st.session_state.memory = ConversationBufferMemory(
-        memory_key="chat_history", 
-        return_messages=True
-    )
-memory = st.session_state.memory
-
-# Create the RAG chain
-if vectorstore:
-    retriever = vectorstore.as_retriever()
-    rag_chain = ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=retriever,
-        memory=memory,
-        verbose=True
-    )
-else:
-    rag_chain = None
-
-
-# Agent and Tools Setup
-# Tool Function 1: RAG
-def run_rag_chain(query: str) -> str:
-    """Runs the RAG chain for document questions."""
-    st.write(f"🧠 *Querying knowledge base for: '{query}'*")
-    print(f"--- RAG TOOL CALLED with query: {query} ---")
-    
-    if not rag_chain:
-        print("--- RAG Tool FAILED: rag_chain not initialized. ---")
-        return "Error: The document knowledge base is not initialized. Please tell the user to upload documents first."
-    
-    try:
-        response = rag_chain.invoke({"question": query})
-        answer = response.get("answer")
-
-        if not answer or "don't know" in answer.lower() or "no information" in answer.lower():
-             print("--- RAG Tool found no relevant documents. ---")
-             return f"The documents do not contain specific information about: '{query}'. Tell the user you couldn't find the answer in their files."
-        
-        print(f"--- RAG Tool SUCCESS, returning answer. ---")
-        return answer
-    except Exception as e:
-        print(f"--- RAG Tool FAILED: {e} ---")
-        return f"Error occurred while searching documents: {e}"
-
-# Tool Function 2: Image Generation
-image_prompt_template = PromptTemplate(
-    input_variables=["image_desc"],
-    template=(
-        "You are a helpful prompt-engineering assistant. A user wants to generate an image based on this description: '{image_desc}'. "
-        "Generate a highly detailed, vivid, and specific prompt for the DALL-E 3 image generation model."
-    )
-)
-prompt_engineering_chain = LLMChain(llm=llm, prompt=image_prompt_template)
-
-def generate_engineered_image(prompt: str) -> str:
-    """Generates an image and returns a Markdown string."""
-    st.write(f"🖌️ *Crafting a detailed image prompt...*")
-    engineered_prompt = prompt_engineering_chain.run(prompt)
-    st.write(f"**Detailed Prompt:** {engineered_prompt}")
-    
-    st.write(f"🎨 *Sending to DALL-E 3...*")
-    dalle_wrapper = DallEAPIWrapper()
-    try:
-        image_url = dalle_wrapper.run(engineered_prompt)
-        st.write("✅ Image generated!")
-        return f"![Generated image: {prompt}]({image_url})"
-        
-    except Exception as e:
-        print(f"--- DALL-E Tool FAILED: {e} ---")
-        return f"Error generating image: {e}. The prompt might have been rejected by the safety system."
-
-# Tool Function 3: Simple Weather
-def get_current_weather(location: str) -> str:
-    """Gets the *current* weather for a location using weatherapi.com."""
-    st.write(f"🌦️ *Checking weather for: '{location}'*")
-    print(f"--- Weather Tool CALLED with location: {location} ---")
-    
-    base_url = "https://api.weatherapi.com/v1/current.json"
-    params = {
-        "key": weather_api_key, 
-        "q": location
-    }
-    
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status() 
-        data = response.json()
-        
-        loc_name = data['location']['name']
-        region = data['location']['region']
-        country = data['location']['country']
-        temp_c = data['current']['temp_c']
-        temp_f = data['current']['temp_f']
-        condition = data['current']['condition']['text']
-        
-        result = (
-            f"Current weather in {loc_name}, {region}, {country}: "
-            f"{temp_c}°C / {temp_f}°F, {condition}."
-        )
-        print(f"--- Weather Tool SUCCESS: {result} ---")
-        return result
-        
-    except requests.exceptions.HTTPError as http_err:
-        print(f"--- Weather Tool HTTP Error: {http_err} ---")
-        try:
-            error_msg = response.json()['error']['message']
-            return f"Error getting weather: {error_msg}"
-        except Exception:
-            return f"Error getting weather: HTTP {http_err.response.status_code}"
-    except Exception as e:
-        print(f"--- Weather Tool FAILED: {e} ---")
-        return f"An error occurred while trying to get the weather: {e}"
-
-# Initialize Tools List
-tools = []
-
-# Tool 1: RAG
-if rag_chain:
-    tools.append(
-        Tool(
-            name="DocumentKnowledgeBase",
-            func=run_rag_chain,
-            description=(
-                "Use this tool ONLY for questions about the user's **uploaded files** (PDFs, TXT, DOCX). "
-                "This is for querying **unstructured text**. "
-                "This tool has access to the user's private files."
-            )
-        )
-    )
-
-# Tool 2: SQL Database
-tools.append(
-    Tool(
-        name="DatabaseQuery",
-        # Use a lambda function to pass the 'llm' object to your agent
-        func=lambda q: query_agent(question=q, llm=llm),
-        description=(
-            "Use this tool ONLY for questions about employees, departments, salaries, or budgets. "
-            "Examples: 'Who has the highest salary?', 'What is the budget for the Engineering department?'"
-        )
-    )
-)
+def get_metrics_server(port):
+    return start_metrics_server(port)
 
-# Tool 3: Event Recommender
-tools.append(
-    Tool(
-        name="EventRecommender",
-        # Use a lambda to pass all required arguments
-        func=lambda location: run_event_recommender(
-            location=location, 
-            llm=llm, 
-            weather_key=weather_api_key
-        ),
-        description=(
-            "Use this tool ONLY when the user asks for event recommendations, "
-            "'what to do', or 'things to do' for **today**. "
-            "This tool will find events from a database and check the weather. "
-            "The input must be a location (e.g., 'Singapore')."
-        )
-    )
-)
-
-# Tool 4: Simple Weather
-tools.append(
-    Tool(
-        name="CurrentWeather",
-        func=get_current_weather,
-        description=(
-            "Use this tool ONLY when the user asks *just* for the current weather, "
-            "weather forecast, or temperature for a specific location. "
-            "Do NOT use this if they are also asking for event recommendations."
-        )
-    )
-)
-
-# Tool 5: Image Generation
-tools.append(
-    Tool(
-        name="ImageGenerator",
-        func=generate_engineered_image,
-        description="Use this tool ONLY when a user explicitly asks to create, draw, generate, show an image, picture or drawing."
-    )
-)
-
-# Tool 6: General Search for anything else
-tools.append(DuckDuckGoSearchRun())
+if os.environ.get("METRICS_PORT"):
+    get_metrics_server(int(os.environ["METRICS_PORT"]))
 
+# Shared by every session with these keys: answer cache and engine options
+# (RAG_MODE, RAG_K, RAG_SEARCH, IMAGE_API_URL, INDEX_MEMORY_MB; see chat_service.py)
+@st.cache_resource
+def get_chat_service(openai_api_key, weather_api_key):
+    return ChatService(openai_api_key, weather_api_key, **options_from_env())
 
-# System Prompt
-system_prompt = SystemMessage(
-    content=(
-        "You are a helpful, multi-function assistant. You must follow this priority list for every user query:\n\n"
-        
-        "1.  **Check for Document Question:** Is the user asking a specific question *about* their uploaded documents? "
-        "If YES, you MUST use the `DocumentKnowledgeBase` tool.\n"
+service = get_chat_service(api_key, weather_api_key)
 
-        "2.  **Check for Database Question:** Is the user asking about *employees, departments, salaries or budgets*? "
-        "If YES, you MUST use the `DatabaseQuery` tool.\n"
-        
-        "3.  **Check for Event Recommendation:** Is the user asking for event recommendations, 'what to do' or 'things to do' for **today**? "
-        "If YES, you MUST use the `EventRecommender` tool.\n"
+# This browser session's chat: memory, documents and engine.
+# Every span it records is tagged with its ID; tool progress goes to st.write
+if "chat" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:12]
+    st.session_state.chat = ChatSession(service, st.session_state.session_id, progress=st.write)
+chat = st.session_state.chat
+chat.service = service
 
-        "4.  **Check for *only* Weather:** Is the user asking *just* for the current weather? "
-        "If YES, you MUST use the `CurrentWeather` tool.\n"
-        
-        "5.  **Check for Image Request:** Is the user asking to create or draw an image? "
-        "If YES, you MUST use the `ImageGenerator` tool.\n"
-        
-        "6.  **General Knowledge (Fallback):** If the request is a general question NOT covered by any other tool, "
-        "you MUST use the `DuckDuckGoSearch` tool.\n"
-        
-        "7.  **No Tool:** If you can answer without any tools (like 'hello'), do so directly."
-    )
+# Document Upload
+st.sidebar.header("Upload Documents for RAG")
+uploaded_files = st.sidebar.file_uploader(
+    "Upload your documents (PDF, TXT, etc.)", 
+    type=["pdf", "txt", "md", "docx"], 
+    accept_multiple_files=True
 )
 
-# Initialize Agent
-agent_prompt = ChatPromptTemplate.from_messages([
-    system_prompt,
-    ("placeholder", "{chat_history}"),
-    ("human", "{input}"),
-    ("placeholder", "{agent_scratchpad}")
-])
+# Sync this session's index with the uploads (only changed files are re-embedded;
+# the RAG tool is only offered when it has documents)
+try:
+    if uploaded_files and chat.documents_changed(uploaded_files):
+        with st.spinner("Processing documents, creating embeddings..."):
+            chat.sync_documents(uploaded_files)
+        if chat.vectorstore is None:
+            st.error("Could not split documents. Please check file content.")
+        else:
+            st.success("Knowledge base updated successfully!")
+    else:
+        chat.sync_documents(uploaded_files)
+except Exception as e:
+    st.error(f"Error creating vector store: {e}")
+    chat.vectorstore = None
 
+# Agent Engine (LLM, chains, tools and agent), rebuilt only when its inputs change
 try:
-    agent = create_openai_functions_agent(llm, tools, agent_prompt)
-    agent_executor = AgentExecutor(
-        agent=agent, 
-        tools=tools, 
-        memory=memory, 
-        verbose=True,
-        handle_parsing_errors=True 
-    )
+    chat.current_engine()
 except Exception as e:
     st.error(f"Error initializing the agent: {e}")
     st.stop()
 
+# Generated images: each assistant message lists the image jobs of its turn.
+# Finished ones are shown from the local image store, so showing the
+# history again costs nothing; pending ones poll until their job is done.
+@st.fragment(run_every=IMAGE_POLL_SECONDS)
+def show_pending_image(image):
+    job = get_image_queue().get(image["job"])
+    if job is None or job.done.is_set():
+        st.rerun()
+    st.caption(f"🎨 Drawing '{image['description']}'...")
+
+def show_images(message):
+    for image in message.get("images", []):
+        if "path" not in image and "error" not in image:
+            job = get_image_queue().get(image["job"])
+            if job is None:
+                image["error"] = "the app restarted before it finished"
+            elif job.status == "done":
+                image["path"] = job.path
+            elif job.status == "error":
+                image["error"] = job.error
+
+        if "path" in image and os.path.exists(image["path"]):
+            st.image(image["path"], caption=image["description"])
+        elif "path" in image or "error" in image:
+            st.warning(f"Could not draw '{image['description']}': {image.get('error', 'the image file is missing')}")
+        else:
+            show_pending_image(image)
+
+def assistant_message(content, jobs=()):
+    """The chat history entry for an answer, with the images queued during its turn."""
+    return {"role": "assistant", "content": content,
+            "images": [{"job": job.id, "description": job.description} for job in jobs]}
+
 
 # Chat History Display
 if "messages" not in st.session_state:
@@ -343,6 +137,7 @@ if "messages" not in st.session_state:
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        show_images(msg)
 
 
 # Chat Input and Response
@@ -353,15 +148,95 @@ if prompt := st.chat_input("Ask about docs, DB, weather, events, or request a dr
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        with st.spinner("Agent is thinking..."):
-            try:
-                response = agent_executor.invoke({"input": prompt})
-                ai_response = response["output"]
-
-                st.markdown(ai_response)
-                st.session_state.messages.append({"role": "assistant", "content": ai_response})
-            
-            except Exception as e:
-                error_message = f"An error occurred: {e}"
-                st.error(error_message)
-                st.session_state.messages.append({"role": "assistant", "content": error_message})
+        status = st.status("Agent is thinking...")
+        answer_placeholder = st.empty()
+
+        def show_tool_start(name, tool_input):
+            status.update(label=f"Running {name}...")
+            status.write(f"🔧 Using **{name}**" + (f" with `{tool_input}`" if tool_input else ""))
+
+        def show_tool_end(name, seconds):
+            status.write(f"✅ {name} finished in {seconds:.1f}s")
+            status.update(label="Agent is thinking...")
+
+        try:
+            # The answer streams into the chat as it is generated.
+            # Tool progress written with st.write lands inside the status box.
+            with status:
+                turn = asyncio.run(chat.ask(
+                    prompt,
+                    on_token=lambda text: answer_placeholder.markdown(text + "▌"),
+                    on_tool_start=show_tool_start,
+                    on_tool_end=show_tool_end,
+                ))
+            answer_placeholder.markdown(turn["output"])
+            status.update(label="Answered from cache" if turn["cached"] else f"Done in {turn['total']:.1f}s",
+                          state="complete", expanded=False)
+            message = assistant_message(turn["output"], turn["images"])
+            st.session_state.messages.append(message)
+            show_images(message)
+        
+        except Exception as e:
+            error_message = f"An error occurred: {e}"
+            status.update(label="Failed", state="error", expanded=False)
+            st.error(error_message)
+            st.session_state.messages.append(assistant_message(error_message))
+
+
+# Latency Stats (perceived = time to first token, total = full answer)
+if chat.turn_metrics:
+    last_turn = chat.turn_metrics[-1]
+    turn_count = len(chat.turn_metrics)
+    st.sidebar.header("Latency")
+    st.sidebar.caption(
+        f"Last turn: first token {last_turn['ttft']:.2f}s, total {last_turn['total']:.2f}s"
+        + (" (cached)" if last_turn["cached"] else "")
+    )
+    st.sidebar.caption(
+        f"Avg over {turn_count} turns: first token "
+        f"{sum(t['ttft'] for t in chat.turn_metrics) / turn_count:.2f}s, total "
+        f"{sum(t['total'] for t in chat.turn_metrics) / turn_count:.2f}s"
+    )
+
+# Trace of the last turn and this session's totals, by span kind
+trace = get_tracer().session_summary(st.session_state.session_id)
+if trace["last_turn"]:
+    st.sidebar.header("Trace")
+    with st.sidebar.expander("Last turn breakdown"):
+        st.dataframe(
+            [
+                {
+                    "span": f"{span['kind']}: {span['name']}",
+                    "ms": span["duration_ms"],
+                    "tokens": (span.get("prompt_tokens") or 0) + (span.get("completion_tokens") or 0) or None,
+                    "cache": span.get("cache"),
+                }
+                for span in sorted(trace["last_turn"], key=lambda span: span["ts"])
+            ],
+            hide_index=True,
+        )
+    llm_calls = trace["totals"].get("llm", {}).get("count", 0)
+    st.sidebar.caption(
+        f"Session: {llm_calls} LLM calls, {trace['tokens']:,} tokens, ~${trace['cost']:.3f}. Time by kind: "
+        + ", ".join(f"{kind} {values['seconds']:.1f}s" for kind, values in trace["totals"].items() if kind != "turn")
+    )
+
+# Answer Cache Stats
+answer_cache = service.answer_cache
+cache_stats = answer_cache.stats
+st.sidebar.header("Answer Cache")
+st.sidebar.caption(
+    f"{cache_stats['hits']} hits / {cache_stats['lookups']} lookups "
+    f"({answer_cache.hit_rate:.0%}), ~{cache_stats['seconds_saved']:.1f}s saved"
+)
+
+router_stats = chat.engine.router.stats
+routed = sum(router_stats[tool] for tool in ROUTABLE_TOOLS)
+st.sidebar.caption(f"Router: {routed} requests sent straight to a tool, {sum(router_stats.values()) - routed} to the agent")
+
+weather_stats = get_weather_client(weather_api_key).metrics()
+st.sidebar.caption(
+    f"Weather API: {weather_stats['hits'] + weather_stats['coalesced']} cached / "
+    f"{weather_stats['upstream_calls']} upstream calls, "
+    f"avg {weather_stats['upstream_avg_seconds'] * 1000:.0f} ms"
+)
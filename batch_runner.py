@@ -0,0 +1,116 @@
+"""
+Runs a JSONL file of questions through the agent, without Streamlit.
+
+Each input line is {"question": "..."} with optional "id" and "session".
+Lines that share a session are asked in file order with shared memory;
+different sessions run concurrently, at most --concurrency at a time.
+Each answer is written as it finishes, one JSON line with the id,
+session, question, answer, tools, routed, cached, ttft and total
+seconds, image jobs and error (if the turn failed).
+
+Usage (keys from OPENAI_API_KEY and WEATHER_API_KEY):
+    python batch_runner.py questions.jsonl answers.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+from collections import Counter, OrderedDict
+from chat_service import ChatService, options_from_env
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(path: str) -> list:
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_number))
+            # Questions without a session are independent of each other
+            item.setdefault("session", f"batch-{item['id']}")
+            items.append(item)
+    return items
+
+
+async def run_batch(service: ChatService, items: list, out, concurrency: int = 4, wait_images: bool = False) -> list:
+    """
+    Asks every item's question and writes a result line to 'out' as each
+    finishes. Returns the results in completion order.
+    """
+    by_session = OrderedDict()
+    for item in items:
+        by_session.setdefault(item["session"], []).append(item)
+    slots = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def run_session(session_id, session_items):
+        session = service.session(session_id)
+        for item in session_items:
+            async with slots:
+                start = time.perf_counter()
+                result = {"id": item["id"], "session": session_id, "question": item["question"]}
+                try:
+                    turn = await session.ask(item["question"])
+                    if wait_images:
+                        await asyncio.gather(*(asyncio.to_thread(job.wait) for job in turn["images"]))
+                    result.update(
+                        answer=turn["output"], tools=turn["tools"], routed=turn["routed"], cached=turn["cached"],
+                        ttft=turn["ttft"], total=turn["total"],
+                        images=[{"job": job.id, "status": job.status, "path": job.path} for job in turn["images"]],
+                    )
+                except Exception as e:
+                    logger.warning(f"Question {item['id']} FAILED: {e}")
+                    result.update(error=str(e), total=time.perf_counter() - start)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+
+    await asyncio.gather(*(run_session(session_id, session_items) for session_id, session_items in by_session.items()))
+    return results
+
+
+def summarize(results: list, seconds: float) -> str:
+    totals = sorted(result["total"] for result in results if "error" not in result)
+    tools = Counter(tool for result in results for tool in result.get("tools", []))
+    lines = [f"{len(results)} questions in {seconds:.1f}s ({len(results) / seconds:.2f}/s), "
+             f"{len(results) - len(totals)} failed"]
+    if totals:
+        lines.append(f"latency p50 {statistics.median(totals):.2f}s, p95 {totals[round(0.95 * (len(totals) - 1))]:.2f}s, "
+                     f"{sum(result.get('cached', False) for result in results)} cached, "
+                     f"{sum(bool(result.get('routed')) for result in results)} routed")
+    if tools:
+        lines.append("tools: " + ", ".join(f"{name} {count}" for name, count in tools.most_common()))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="input JSONL")
+    parser.add_argument("answers", help="output JSONL")
+    parser.add_argument("--concurrency", type=int, default=4, help="turns in flight at once")
+    parser.add_argument("--no-answer-cache", action="store_true", help="always run the agent")
+    parser.add_argument("--wait-images", action="store_true", help="wait for image jobs and record their files")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "WARNING"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    service = ChatService(os.environ["OPENAI_API_KEY"], os.environ["WEATHER_API_KEY"],
+                          use_answer_cache=not args.no_answer_cache, **options_from_env())
+    items = read_questions(args.questions)
+
+    start = time.perf_counter()
+    with open(args.answers, "w", encoding="utf-8") as out:
+        results = asyncio.run(run_batch(service, items, out, args.concurrency, args.wait_images))
+    print(summarize(results, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
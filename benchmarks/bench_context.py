@@ -0,0 +1,141 @@
+"""
+RAG prompt size and answer latency: top-k chunks stuffed verbatim vs packed.
+
+The corpus mimics real uploads: department handbooks that share a company
+boilerplate paragraph and a confidentiality footer, plus older revisions
+that are near-copies of the current ones. Chunks are split as the app
+splits them (500 characters, 100 overlap) and retrieved with bag-of-words
+HashEmbeddings. For each question and k, the answer prompt is built from
+the naive context (chunks joined verbatim) and from pack_context, and
+answered by ScriptedChatModel with a per-prompt-token prefill latency.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_context
+    python -m benchmarks.bench_context --k 4 8 12 --budget 600 --prompt-token-latency 0.0005
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+DEPARTMENTS = ["Engineering", "Marketing", "Sales", "Finance", "Support", "Research"]
+TOPICS = {
+    "leave": "annual leave vacation days carry over approval manager calendar holiday sick",
+    "travel": "travel booking flights hotel per diem receipts reimbursement economy approval",
+    "expenses": "expenses claims receipts reimbursement limits card approval monthly report",
+    "security": "security passwords laptop encryption badge access incidents phishing training",
+    "remote": "remote work home office equipment hours availability video meetings stipend",
+}
+BOILERPLATE = (
+    "Acme Corporation is committed to a fair, safe and inclusive workplace. This handbook summarises the "
+    "policies that apply to every employee and is reviewed each year by the People team."
+)
+FOOTER = "This document is confidential and intended for Acme employees only. Do not share it outside the company."
+
+QUESTIONS = [
+    "What is the {topic} policy for {department}?",
+    "How does {department} handle {topic}?",
+]
+
+
+def paragraph(rng, department, topic, words):
+    vocabulary = words.split()
+    body = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(25, 45)))
+    return f"In {department}, the {topic} rules say: {body}."
+
+
+def handbook(rng, department, revision):
+    lines = [f"# {department} handbook (revision {revision})", BOILERPLATE]
+    for topic, words in TOPICS.items():
+        lines.append(f"## {topic.title()}")
+        lines += [paragraph(rng, department, topic, words) for _ in range(3)]
+        lines.append(FOOTER)
+    return "\n\n".join(lines)
+
+
+def make_handbooks(seed=7):
+    """Current and previous revision per department; the old one differs in a few paragraphs."""
+    from benchmarks.bench_parsing import SyntheticFile
+
+    files = []
+    for department in DEPARTMENTS:
+        current = handbook(random.Random(f"{seed}-{department}"), department, 2)
+        previous = current.replace("(revision 2)", "(revision 1)")
+        paragraphs = previous.split("\n\n")
+        rng = random.Random(f"{seed}-{department}-old")
+        for index in rng.sample(range(2, len(paragraphs)), 3):
+            paragraphs[index] = paragraph(rng, department, "general", "policy update notice effective date")
+        files.append(SyntheticFile(f"{department.lower()}_handbook.md", current.encode("utf-8")))
+        files.append(SyntheticFile(f"{department.lower()}_handbook_old.md", "\n\n".join(paragraphs).encode("utf-8")))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--budget", type=int, default=None, help="context token budget (default: CONTEXT_TOKENS)")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0002, help="seconds of prefill per prompt token")
+    args = parser.parse_args()
+
+    from benchmarks.bench_e2e import parse_plain_text
+    from benchmarks.fake_llm import HashEmbeddings, ScriptedChatModel
+    from context_packing import CONTEXT_TOKENS, pack_context
+    from document_search import DocumentSearch
+    from engine import RAG_ANSWER_PROMPT
+    from knowledge_base import KnowledgeBaseIndex
+    from token_counter import count_tokens
+
+    budget = args.budget or CONTEXT_TOKENS
+    llm = ScriptedChatModel(latency=args.llm_latency, prompt_token_latency=args.prompt_token_latency)
+    chain = RAG_ANSWER_PROMPT | llm
+    questions = [template.format(topic=topic, department=department)
+                 for department in DEPARTMENTS[:3] for topic in TOPICS for template in QUESTIONS]
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            kb = KnowledgeBaseIndex(HashEmbeddings(dimensions=512, bag_of_words=True), index_dir="index",
+                                    cache_dir="embedding_cache", max_workers=1, parse=parse_plain_text)
+            kb.sync(make_handbooks())
+            chunks = sum(len(ids) for ids in kb.doc_ids.values())
+
+            print(f"{len(kb.doc_ids)} handbooks, {chunks} chunks, {len(questions)} questions, "
+                  f"context budget {budget} tokens, {args.prompt_token_latency * 1e6:.0f} us/prompt token prefill")
+            print(f"{'k':>3} {'context':8} {'prompt tokens':>14} {'answer p50':>11} {'pack':>8}   dedup")
+            for k in args.k:
+                search = DocumentSearch(kb.vectorstore, kb.version, {"k": k, "context_tokens": budget})
+                rows = {"naive": ([], [], []), "packed": ([], [], [])}
+                totals = {"duplicates": 0, "repeated_sentences": 0, "chunks": 0, "passages": 0}
+                for question in questions:
+                    docs = search.search(question)
+                    start = time.perf_counter()
+                    packed, stats = pack_context(docs, budget)
+                    pack_seconds = time.perf_counter() - start
+                    for key in totals:
+                        totals[key] += stats[key]
+
+                    for name, context, seconds in (("naive", "\n\n".join(d.page_content for d in docs), 0.0),
+                                                   ("packed", packed, pack_seconds)):
+                        messages = RAG_ANSWER_PROMPT.format_messages(context=context, question=question)
+                        rows[name][0].append(sum(count_tokens(m.content, "gpt-4-turbo") for m in messages))
+                        start = time.perf_counter()
+                        chain.invoke({"context": context, "question": question})
+                        rows[name][1].append(time.perf_counter() - start)
+                        rows[name][2].append(seconds)
+
+                for name, (tokens, latencies, pack_times) in rows.items():
+                    dedup = (f"{totals['chunks']} chunks -> {totals['passages']} passages, "
+                             f"{totals['duplicates']} near-duplicates, {totals['repeated_sentences']} repeated sentences"
+                             if name == "packed" else "")
+                    print(f"{k:>3} {name:8} {statistics.mean(tokens):>14.0f} "
+                          f"{statistics.median(latencies) * 1000:>9.0f}ms {statistics.mean(pack_times) * 1000:>6.2f}ms   {dedup}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Offline end-to-end benchmark of the chatbot's stages.
+
+Runs the real code paths against deterministic fakes: ScriptedChatModel
+for OpenAI chat (with configurable latency), HashEmbeddings for OpenAI
+embeddings and FakeWeatherServer for WeatherAPI. Synthetic company and
+events databases are generated in a temporary directory. Stages:
+
+    ingest  KnowledgeBaseIndex.sync (what create_vectorstore runs), one file at a time
+    rag     AgentEngine.run_rag_chain
+    sql     query_agent
+    events  run_event_recommender
+    agent   the full agent_executor over a mix of questions
+
+Reports latency percentiles, throughput and resident memory per stage.
+--save-baseline writes the results as JSON; --compare checks a run against
+a saved baseline and exits with status 1 if a stage regressed by more than
+--tolerance.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_e2e --save-baseline bench_baseline.json
+    python -m benchmarks.bench_e2e --compare bench_baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest import mock
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+WEATHER_KEY = "bench-weather-key"
+
+SQL_QUESTIONS = [
+    "What is the budget for {d}?",
+    "How many employees work in {d}?",
+    "Who has the highest salary?",
+    "What is the average salary by department?",
+    "List the employees in {d}",
+]
+RAG_QUESTIONS = [
+    "What does the policy say about leave?",
+    "Summarise the quarterly budget report",
+    "What is the project alpha timeline?",
+    "Which vendor contract needs renewal?",
+]
+AGENT_QUESTIONS = [
+    "What is the budget for {d}?",
+    "What does the policy document say about onboarding?",
+    "Any things to do today?",
+    "What's the weather in Singapore?",
+    "Hello!",
+]
+
+
+def parse_plain_text(name, data):
+    """Parser for the synthetic corpus that needs no unstructured/nltk data."""
+    return data.decode("utf-8")
+
+
+def resident_mb():
+    if psutil is None:
+        return float("nan")
+    return psutil.Process(os.getpid()).memory_info().rss / 1e6
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_stage(name, calls, verbose):
+    """Runs each zero-argument call once, timing them; returns the stage's summary."""
+    samples = []
+    start = time.perf_counter()
+    for call in calls:
+        began = time.perf_counter()
+        if verbose:
+            call()
+        else:
+            with redirect_stdout(None):
+                call()
+        samples.append(time.perf_counter() - began)
+    wall = time.perf_counter() - start
+    return {
+        "n": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p90_ms": percentile(samples, 90) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+        "throughput": len(samples) / wall if wall else 0.0,
+        "rss_mb": resident_mb(),
+    }
+
+
+def questions(templates, count):
+    from benchmarks.fake_llm import DEPARTMENTS
+    return [templates[i % len(templates)].format(d=DEPARTMENTS[i % len(DEPARTMENTS)]) for i in range(count)]
+
+
+def run_benchmark(args):
+    import engine
+    import weather_client
+    from benchmarks.bench_parsing import make_corpus
+    from benchmarks.fake_llm import HashEmbeddings, ScriptedChatModel
+    from benchmarks.fake_weather_server import FakeWeatherServer
+    from conversation_memory import BudgetedMemory
+    from knowledge_base import KnowledgeBaseIndex
+    from recommender_system import run_event_recommender
+    from setup_db import setup_database as setup_company_db
+    from setup_events_db import setup_database as setup_events_db
+    from sql_agent import query_agent
+
+    llm = ScriptedChatModel(latency=args.llm_latency, per_token_latency=args.token_latency)
+    weather = FakeWeatherServer(("127.0.0.1", 0), latency=args.weather_latency).start()
+    weather_client._clients[WEATHER_KEY] = weather_client.WeatherClient(
+        WEATHER_KEY, ttl=args.weather_ttl, base_url=weather.base_url
+    )
+
+    results = {}
+    with redirect_stdout(None):
+        setup_company_db("company.db", args.employees)
+        setup_events_db("events.db", args.events)
+
+    kb = KnowledgeBaseIndex(
+        HashEmbeddings(latency=args.embedding_latency), index_dir="index", cache_dir="embedding_cache",
+        max_workers=1, parse=parse_plain_text,
+    )
+    files = make_corpus(args.files, args.paragraphs)
+    results["ingest"] = run_stage(
+        "ingest", [lambda i=i: kb.sync(files[:i + 1]) for i in range(len(files))], args.verbose
+    )
+
+    memory = BudgetedMemory(llm=llm, memory_key="chat_history", return_messages=True)
+    with mock.patch.object(engine, "ChatOpenAI", lambda **kwargs: llm):
+        agent_engine = engine.AgentEngine("sk-offline", WEATHER_KEY, memory, kb.vectorstore, progress=lambda message: None)
+
+    results["rag"] = run_stage(
+        "rag", [lambda q=q: agent_engine.run_rag_chain(q) for q in questions(RAG_QUESTIONS, args.requests)], args.verbose
+    )
+    results["sql"] = run_stage(
+        "sql", [lambda q=q: query_agent(q, llm) for q in questions(SQL_QUESTIONS, args.requests)], args.verbose
+    )
+    results["events"] = run_stage(
+        "events", [lambda: run_event_recommender("Singapore", llm, WEATHER_KEY) for _ in range(args.requests)], args.verbose
+    )
+    results["agent"] = run_stage(
+        "agent",
+        [lambda q=q: agent_engine.agent_executor.invoke({"input": q}) for q in questions(AGENT_QUESTIONS, args.requests)],
+        args.verbose,
+    )
+
+    weather.shutdown()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regressions against a baseline (empty if none)."""
+    regressions = []
+    for stage, old in baseline["stages"].items():
+        new = results.get(stage)
+        if new is None:
+            continue
+        for metric in ("p50_ms", "p90_ms"):
+            if new[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{stage} {metric}: {old[metric]:.1f} -> {new[metric]:.1f}")
+        if new["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{stage} throughput: {old['throughput']:.1f} -> {new['throughput']:.1f}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="calls per query stage")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--employees", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--weather-latency", type=float, default=0.05)
+    parser.add_argument("--weather-ttl", type=float, default=0, help="0 sends every lookup to the weather stub")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true", help="show the app's own progress output")
+    args = parser.parse_args()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare", "tolerance", "verbose")}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("warning: baseline was recorded with different settings")
+        args.compare = os.path.abspath(args.compare)
+    if args.save_baseline:
+        args.save_baseline = os.path.abspath(args.save_baseline)
+
+    # Every database and cache the app creates lands in a throwaway directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            results = run_benchmark(args)
+        finally:
+            os.chdir(cwd)
+
+    print(f"{'stage':8} {'n':>4} {'p50':>9} {'p90':>9} {'p99':>9} {'mean':>9} {'ops/s':>8} {'rss MB':>8}")
+    for stage, r in results.items():
+        print(
+            f"{stage:8} {r['n']:>4} {r['p50_ms']:7.1f}ms {r['p90_ms']:7.1f}ms {r['p99_ms']:7.1f}ms "
+            f"{r['mean_ms']:7.1f}ms {r['throughput']:8.2f} {r['rss_mb']:8.1f}"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"config": config, "stages": results}, f, indent=2)
+        print(f"\nbaseline saved to {args.save_baseline}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
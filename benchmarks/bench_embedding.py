@@ -0,0 +1,77 @@
+"""
+Embedding throughput of the EmbeddingScheduler against a local fake
+embedding server with injected latency, 429s and 503s. Requests that
+fail with a 503 are retried by the scheduler, so every run must still
+return a vector per chunk.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_embedding --chunks 2000 --latency 0.2 --server-concurrency 6
+"""
+import argparse
+import random
+import time
+from langchain_openai import OpenAIEmbeddings
+from embedding_scheduler import EmbeddingScheduler
+from benchmarks.fake_embedding_server import FakeEmbeddingServer
+
+
+def make_chunks(num_chunks, seed=7):
+    rng = random.Random(seed)
+    words = "alpha beta gamma delta budget policy salary engineering report quarter".split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(60, 110))) for _ in range(num_chunks)]
+
+
+def run(server, chunks, label, **scheduler_options):
+    embeddings = OpenAIEmbeddings(
+        base_url=server.base_url,
+        api_key="fake-key",
+        max_retries=0,
+        check_embedding_ctx_length=False,
+    )
+    scheduler = EmbeddingScheduler(embeddings, **scheduler_options)
+
+    start_stats = dict(server.stats)
+    start = time.perf_counter()
+    vectors = scheduler.embed_documents(chunks)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(chunks)
+
+    throttled = server.stats["rate_limited"] - start_stats["rate_limited"]
+    failed = server.stats["errors"] - start_stats["errors"]
+    print(
+        f"{label:<28} {elapsed:>8.2f}s {len(chunks) / elapsed:>10.0f} chunks/s "
+        f"{scheduler.stats['requests']:>6} requests {throttled:>5} x 429 {failed:>4} x 503  final limit {scheduler.limit}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--rate-limit", type=float, default=0.05, help="share of requests answered with 429")
+    parser.add_argument("--server-concurrency", type=int, default=6, help="server 429s beyond this many in flight")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of requests answered with 503")
+    parser.add_argument("--batch-tokens", type=int, default=8000)
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(
+        ("127.0.0.1", 0),
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        max_concurrency=args.server_concurrency,
+        retry_after=0.2,
+        error_rate=args.error_rate,
+    ).start()
+    chunks = make_chunks(args.chunks)
+
+    print(f"{args.chunks} chunks, {args.latency}s latency, {args.rate_limit:.0%} random 429s, "
+          f"{args.error_rate:.0%} random 503s, server allows {args.server_concurrency} in flight\n")
+    run(server, chunks, "sequential (1 in flight)", max_batch_tokens=args.batch_tokens, max_concurrency=1)
+    for concurrency in (4, 8, 16):
+        run(server, chunks, f"scheduler ({concurrency} max in flight)", max_batch_tokens=args.batch_tokens, max_concurrency=concurrency)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Event store query latency as the events table grows.
+
+Builds events databases of increasing size with setup_events_db's
+synthetic generator and times the recommender's queries (one city on
+one day, one city over a week, all cities on one day by type) with the
+(city, date, type) / (date, type) indexes, then again with them dropped.
+Indexed latency follows the number of matching events (capped by the
+store's limit), not the table size; unindexed latency grows with the table.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_events --sizes 10000 100000 1000000 --queries 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from event_store import EventStore
+from setup_events_db import CITIES, setup_database
+
+START = date(2025, 10, 26)
+DAYS = 365
+
+
+def make_queries(count, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        day = START + timedelta(days=rng.randrange(DAYS))
+        city = rng.choice(CITIES)
+        queries.append(("city + day", dict(date=day.isoformat(), location=city)))
+        queries.append(("city + week", dict(date=day.isoformat(), end_date=(day + timedelta(days=6)).isoformat(), location=city)))
+        queries.append(("day + type", dict(date=day.isoformat(), event_type=rng.choice(("indoor", "outdoor")))))
+    return queries
+
+
+def measure(store, queries):
+    timings = {}
+    for label, kwargs in queries:
+        start = time.perf_counter()
+        store.find(**kwargs)
+        timings.setdefault(label, []).append(time.perf_counter() - start)
+    return {label: statistics.median(samples) * 1000 for label, samples in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    print(f"{'events':>10} {'query':12} {'indexed p50':>12} {'no index p50':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"events_{size}.db")
+            with redirect_stdout(None):
+                setup_database(path, synthetic_events=size, days=DAYS, start=START)
+
+            store = EventStore(path)
+            indexed = measure(store, queries)
+
+            conn = sqlite3.connect(path)
+            conn.execute("DROP INDEX idx_events_city_date_type")
+            conn.execute("DROP INDEX idx_events_date_type")
+            conn.commit()
+            conn.close()
+            # A few unindexed queries are enough to see the trend
+            unindexed = measure(store, queries[:30])
+
+            for label in indexed:
+                print(f"{size:>10,} {label:12} {indexed[label]:10.2f}ms {unindexed[label]:11.2f}ms")
+            store.executor.close()
+
+
+if __name__ == "__main__":
+    main()
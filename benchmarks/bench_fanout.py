@@ -0,0 +1,94 @@
+"""
+Critical-path latency of the event recommender with stubbed backends.
+
+The weather API, the events query and the LLM are replaced by sleeps, so
+the sequential path costs weather + events + llm, while the concurrent
+path should cost max(weather, events) + llm. Also runs several sessions
+at once through the async tool entry point.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_fanout --weather 0.4 --events 0.25 --llm 0.6 --sessions 8
+"""
+import argparse
+import asyncio
+import time
+from unittest import mock
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+import recommender_system
+from recommender_system import CoordinatorAgent, arun_event_recommender, run_event_recommender
+
+WEATHER = {"current": {"condition": {"text": "Sunny"}, "temp_c": 31}}
+EVENTS = [(1, "Jazz in the Park", "outdoor", "Live jazz", "Botanic Gardens", "2025-10-26")]
+
+
+def stub_backends(weather_seconds, events_seconds):
+    def get_weather(self, location, date):
+        time.sleep(weather_seconds)
+        return WEATHER
+
+    def get_events(self, date, *args, **kwargs):
+        time.sleep(events_seconds)
+        return EVENTS
+
+    return (
+        mock.patch.object(recommender_system.WeatherAgent, "get_weather", get_weather),
+        mock.patch.object(recommender_system.EventAgent, "get_events", get_events),
+    )
+
+
+def sequential(coordinator, location, date):
+    # The pre-fan-out order: weather, then events, then the LLM
+    weather = coordinator.weather_agent.get_weather(location, date)
+    events = coordinator.event_agent.get_events(date)
+    return coordinator.recommendation_agent.generate_recommendation(weather, events)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+async def atimed(coro):
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weather", type=float, default=0.4)
+    parser.add_argument("--events", type=float, default=0.25)
+    parser.add_argument("--llm", type=float, default=0.6)
+    parser.add_argument("--sessions", type=int, default=8)
+    args = parser.parse_args()
+
+    llm = FakeListChatModel(responses=["Go to Jazz in the Park."], sleep=args.llm)
+    weather_patch, events_patch = stub_backends(args.weather, args.events)
+
+    with weather_patch, events_patch:
+        coordinator = CoordinatorAgent("stub-key", llm)
+        date = "2025-10-26"
+
+        print(f"weather {args.weather}s, events {args.events}s, llm {args.llm}s")
+        print(f"ideal critical path: {max(args.weather, args.events) + args.llm:.2f}s\n")
+        print(f"{'sequential (before)':<36} {timed(sequential, coordinator, 'Singapore', date):>6.2f}s")
+        print(f"{'get_recommendations (threads)':<36} {timed(coordinator.get_recommendations, 'Singapore', date):>6.2f}s")
+        print(f"{'aget_recommendations (asyncio)':<36} {asyncio.run(atimed(coordinator.aget_recommendations('Singapore', date))):>6.2f}s")
+
+        # Several sessions hitting the tool at the same time
+        start = time.perf_counter()
+        for _ in range(args.sessions):
+            run_event_recommender("Singapore", llm, "stub-key")
+        serial = time.perf_counter() - start
+
+        async def concurrent_sessions():
+            await asyncio.gather(*(arun_event_recommender("Singapore", llm, "stub-key") for _ in range(args.sessions)))
+
+        concurrent = asyncio.run(atimed(concurrent_sessions()))
+        print(f"\n{args.sessions} sessions, sync tool one after another: {serial:>6.2f}s")
+        print(f"{args.sessions} sessions, async tool concurrently:     {concurrent:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
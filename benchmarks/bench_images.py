@@ -0,0 +1,117 @@
+"""
+Image requests: blocking tool call vs background jobs (image_jobs.py).
+
+Replays --requests image requests drawn from a small set of descriptions
+(people ask for the same pictures again) against FakeImageServer, with the
+prompt-engineering LLM call played by ScriptedChatModel.
+
+    blocking  the old tool: engineer the prompt, then generate, inside the
+              turn, nothing cached
+    queued    AgentEngine.generate_engineered_image: the tool returns once
+              the job is queued; engineered prompts and images are cached
+
+For each, reports how long the chat turn waits on the tool, how long until
+the image is on disk, and the LLM calls and image API calls made. A last
+pass with a fresh queue over the same image store stands in for an app
+restart showing the chat history again.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_images
+    python -m benchmarks.bench_images --requests 40 --descriptions 8 --image-latency 3
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+SUBJECTS = ["a red fox", "a lighthouse", "a tea garden", "a robot chef", "a city skyline",
+            "a sailing boat", "a mountain village", "an owl", "a night market", "a desert road"]
+STYLES = ["in watercolour", "at sunset", "in the snow", "as a pencil sketch"]
+
+
+def make_requests(count, descriptions, seed=3):
+    rng = random.Random(seed)
+    pool = [f"{subject} {style}" for subject in SUBJECTS for style in STYLES]
+    chosen = rng.sample(pool, descriptions)
+    # Casing and punctuation vary between repeats
+    return [rng.choice([d, d.capitalize(), d + ".", d.upper()]) for d in rng.choices(chosen, k=count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=24)
+    parser.add_argument("--descriptions", type=int, default=6, help="distinct descriptions among the requests")
+    parser.add_argument("--gap", type=float, default=0.2, help="seconds between requests")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--image-latency", type=float, default=1.5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    import engine
+    from benchmarks.fake_image_server import FakeImageServer
+    from benchmarks.fake_llm import ScriptedChatModel
+    from conversation_memory import BudgetedMemory
+    from image_jobs import ImageJobQueue, ImageStore, ImagesClient
+
+    server = FakeImageServer(("127.0.0.1", 0), latency=args.image_latency).start()
+    llm = ScriptedChatModel(latency=args.llm_latency)
+    requests = make_requests(args.requests, args.descriptions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = ImageJobQueue(ImageStore(os.path.join(tmp, "images")), max_workers=args.workers)
+        with mock.patch.object(engine, "ChatOpenAI", lambda **kwargs: llm):
+            agent_engine = engine.AgentEngine(
+                "sk-offline", "weather-key", BudgetedMemory(memory_key="chat_history", return_messages=True),
+                progress=lambda message: None, image_queue=queue, image_api_url=server.base_url,
+            )
+
+        def blocking(description):
+            data, _ = ImagesClient("sk-offline", server.base_url).generate(agent_engine.engineer_image_prompt(description))
+            return data
+
+        results = {}
+        for name in ("blocking", "queued", "restart"):
+            if name == "restart":
+                queue = agent_engine.image_queue = ImageJobQueue(queue.store, max_workers=args.workers)
+            llm_calls, generations = llm.calls, server.stats["generations"]
+            turn_waits, ready, jobs = [], [], []
+            for description in requests:
+                start, submitted = time.perf_counter(), time.time()
+                if name == "blocking":
+                    blocking(description)
+                    ready.append(time.perf_counter() - start)
+                else:
+                    agent_engine.generate_engineered_image(description)
+                    jobs += [(submitted, job) for job in agent_engine.take_image_jobs()]
+                turn_waits.append(time.perf_counter() - start)
+                time.sleep(args.gap)
+            for submitted, job in jobs:
+                # A shared or cached job may have finished before this request
+                job.wait()
+                ready.append(max(0.0, job.finished - submitted))
+            results[name] = {
+                "turn_p50": statistics.median(turn_waits), "turn_max": max(turn_waits),
+                "ready_p50": statistics.median(ready), "ready_max": max(ready),
+                "llm_calls": llm.calls - llm_calls, "generations": server.stats["generations"] - generations,
+                "errors": sum(job.status == "error" for _, job in jobs), "stats": dict(queue.stats),
+            }
+        stored = sum(len(files) for _, _, files in os.walk(os.path.join(tmp, "images", "objects")))
+
+    print(f"{args.requests} requests over {args.descriptions} descriptions, {args.gap}s apart; "
+          f"LLM {args.llm_latency}s, image API {args.image_latency}s, {args.workers} workers")
+    print(f"{'':9} {'turn waits p50':>15} {'max':>8} {'image ready p50':>16} {'max':>8} {'LLM calls':>10} {'image calls':>12}")
+    for name, r in results.items():
+        print(f"{name:9} {r['turn_p50'] * 1000:>13.1f}ms {r['turn_max'] * 1000:>6.0f}ms "
+              f"{r['ready_p50'] * 1000:>14.0f}ms {r['ready_max'] * 1000:>6.0f}ms {r['llm_calls']:>10} {r['generations']:>12}"
+              + (f"  ({r['errors']} errors)" if r["errors"] else ""))
+    print(f"{stored} image files stored")
+    for name in ("queued", "restart"):
+        print(f"{name} queue: {results[name]['stats']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Recall@k, query latency and memory of each faiss index layout on a
+synthetic clustered corpus, against exact Flat search as ground truth.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_index --vectors 200000 --dim 384 --nprobe 8 16 32 --ef-search 32 64 128
+"""
+import argparse
+import os
+import time
+import faiss
+import numpy as np
+from vector_index import build_index, index_options, tune_index
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def resident_mb():
+    if psutil is None:
+        return float("nan")
+    return psutil.Process(os.getpid()).memory_info().rss / 1e6
+
+
+def make_vectors(num_vectors, dim, num_queries, clusters=256, seed=0):
+    # Clustered data behaves more like real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(clusters, size=num_vectors + num_queries)
+    data = centers[labels] + 0.4 * rng.normal(size=(num_vectors + num_queries, dim)).astype(np.float32)
+    return data[:num_vectors], data[num_vectors:]
+
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def measure(label, index, queries, truth, k, build_seconds, memory_mb):
+    index_mb = faiss.serialize_index(index).nbytes / 1e6
+
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(
+        f"{label:<26} {build_seconds:>8.1f} {recall_at_k(found, truth, k):>9.3f} "
+        f"{p50:>8.2f} {p99:>8.2f} {index_mb:>9.1f} {memory_mb:>9.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[16])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[64])
+    parser.add_argument("--layouts", nargs="+", default=["flat", "flat+sq8", "hnsw", "hnsw+sq8", "ivf", "ivf+sq8", "ivf+pq"])
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # Per-query latency, as in the app
+    vectors, queries = make_vectors(args.vectors, args.dim, args.queries)
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}\n")
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    print(f"{'layout':<26} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'index MB':>9} {'RSS +MB':>9}")
+    for layout in args.layouts:
+        options = index_options({"kind": layout.partition("+")[0]})
+        before = resident_mb()
+        start = time.perf_counter()
+        index = build_index(vectors, layout, options)
+        build_seconds = time.perf_counter() - start
+        memory_mb = resident_mb() - before
+
+        if layout.startswith("ivf"):
+            sweeps = [("nprobe", value) for value in args.nprobe]
+        elif layout.startswith("hnsw"):
+            sweeps = [("ef_search", value) for value in args.ef_search]
+        else:
+            sweeps = [(None, None)]
+
+        for knob, value in sweeps:
+            label = layout
+            if knob:
+                tune_index(index, {**options, knob: value})
+                label = f"{layout} {knob}={value}"
+            measure(label, index, queries, truth, args.k, build_seconds, memory_mb)
+        del index
+
+
+if __name__ == "__main__":
+    main()
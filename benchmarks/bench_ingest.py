@@ -0,0 +1,79 @@
+"""
+Re-ingest cost of the knowledge base (knowledge_base.py) with a counting
+fake embedder.
+
+Ingests a synthetic corpus, then ingests the identical corpus again in
+the ways the app does: into a fresh index sharing the embedding cache,
+after a restart (a new KnowledgeBaseIndex loading the saved index), after
+a file is removed and uploaded again, and in a new session whose index is
+saved by content (as IndexRegistry's are), which loads the saved copy
+instead of parsing. Reports the embedding calls and time of each, and
+exits with status 1 unless every repeat ingest makes zero embedding calls.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_ingest
+    python -m benchmarks.bench_ingest --files 20 --paragraphs 200 --embedding-latency 0.05
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--paragraphs", type=int, default=100, help="paragraphs per file")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="seconds per embedding request")
+    args = parser.parse_args()
+
+    from benchmarks.bench_e2e import parse_plain_text
+    from benchmarks.bench_parsing import make_corpus
+    from benchmarks.fake_llm import HashEmbeddings
+    from knowledge_base import KnowledgeBaseIndex
+
+    logging.disable(logging.INFO)
+    embeddings = HashEmbeddings(latency=args.embedding_latency)
+    files = make_corpus(args.files, args.paragraphs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def open_index(name, by_content=False):
+            return KnowledgeBaseIndex(embeddings, name=name, index_dir=os.path.join(tmp, "indexes"),
+                                      cache_dir=os.path.join(tmp, "embeddings"), max_workers=1, parse=parse_plain_text,
+                                      by_content=by_content)
+
+        def ingest(label, make_index, upload):
+            calls = embeddings.calls
+            start = time.perf_counter()
+            index = make_index()
+            for file_set in upload:
+                index.sync(file_set)
+            elapsed = time.perf_counter() - start
+            chunks = sum(len(ids) for ids in index.doc_ids.values())
+            print(f"{label:34} {embeddings.calls - calls:>6} {elapsed * 1000:>9.1f}ms {chunks:>7}")
+            return embeddings.calls - calls
+
+        print(f"{args.files} files x {args.paragraphs} paragraphs, {args.embedding_latency}s per embedding request")
+        print(f"{'ingest':34} {'calls':>6} {'time':>11} {'chunks':>7}")
+        first = ingest("first ingest", lambda: open_index("first"), [files])
+        repeats = {
+            "same corpus, fresh index": ingest("same corpus, fresh index", lambda: open_index("second"), [files]),
+            "same corpus, after a restart": ingest("same corpus, after a restart", lambda: open_index("first"), [files]),
+            "file removed and re-uploaded": ingest("file removed and re-uploaded", lambda: open_index("first"),
+                                                   [files[1:], files]),
+            "saved by content": ingest("saved by content", lambda: open_index(None, by_content=True), [files]),
+            "new session, saved by content": ingest("new session, saved by content",
+                                                    lambda: open_index(None, by_content=True), [files]),
+        }
+
+    failed = [label for label, calls in repeats.items() if calls]
+    if not first or failed:
+        print(f"FAIL: expected embedding calls on the first ingest only; got calls for {failed or 'none at all'}")
+        sys.exit(1)
+    print("OK: repeat ingests made no embedding calls")
+
+
+if __name__ == "__main__":
+    main()
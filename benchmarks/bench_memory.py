@@ -0,0 +1,88 @@
+"""
+Prompt size over a long chat: ConversationBufferMemory vs BudgetedMemory.
+
+Plays a scripted 100-turn conversation (short answers, with a large SQL
+result or document excerpt every few turns) into each memory. For every
+turn it renders the agent prompt (system prompt, history, question) and
+counts its tokens, and times save_context, the part of memory that runs
+on the request path. BudgetedMemory summarizes with ScriptedChatModel,
+whose latency stands in for the summary model's.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --turns 200 --summary-latency 1.0 --think-time 0.05
+"""
+import argparse
+import statistics
+import time
+
+
+def scripted_turns(count):
+    """(question, answer) pairs; every 7th answer is a big tool output."""
+    topics = ["the Engineering budget", "the weather in Singapore", "events today", "the leave policy",
+              "the highest salaries", "headcount in Sales", "the vendor contract"]
+    for i in range(count):
+        topic = topics[i % len(topics)]
+        question = f"Turn {i}: can you tell me about {topic}?"
+        if i % 7 == 3:
+            rows = "\n".join(f"| {n} | Employee {n} | Sales | {50000 + n * 37} |" for n in range(300))
+            answer = f"Here are the results for {topic}:\n| id | name | department | salary |\n{rows}"
+        else:
+            answer = f"Here is a short answer about {topic}, with a detail or two that matter for turn {i}."
+        yield question, answer
+
+
+def run(memory, turns, think_time, wait=False):
+    from engine import AGENT_PROMPT
+    from token_counter import count_tokens
+
+    prompt_tokens, save_seconds = [], []
+    for question, answer in scripted_turns(turns):
+        history = memory.load_memory_variables({"input": question})["chat_history"]
+        prompt = AGENT_PROMPT.format_messages(chat_history=history, input=question, agent_scratchpad=[])
+        prompt_tokens.append(sum(count_tokens(str(m.content), "gpt-4-turbo") + 4 for m in prompt))
+
+        start = time.perf_counter()
+        memory.save_context({"input": question}, {"output": answer})
+        save_seconds.append(time.perf_counter() - start)
+        time.sleep(think_time)
+    if wait:
+        memory.wait_for_summary()
+    return prompt_tokens, save_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--summary-latency", type=float, default=0.2, help="seconds per summary call")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between turns")
+    args = parser.parse_args()
+
+    from langchain.memory import ConversationBufferMemory
+    from conversation_memory import BudgetedMemory
+    from benchmarks.fake_llm import ScriptedChatModel
+
+    summarizer = ScriptedChatModel(latency=args.summary_latency)
+    memories = {
+        "buffer": ConversationBufferMemory(memory_key="chat_history", return_messages=True),
+        "budgeted": BudgetedMemory(llm=summarizer, memory_key="chat_history", return_messages=True),
+    }
+    results = {name: run(memory, args.turns, args.think_time, wait=name == "budgeted")
+               for name, memory in memories.items()}
+
+    checkpoints = sorted({1, 10, 25, 50, args.turns} & set(range(1, args.turns + 1)))
+    print(f"prompt tokens at turn {', '.join(map(str, checkpoints))}; then mean, max, total over {args.turns} turns")
+    for name, (tokens, saves) in results.items():
+        at = "  ".join(f"{tokens[turn - 1]:>7,}" for turn in checkpoints)
+        print(f"{name:9} {at}   mean {statistics.mean(tokens):>7,.0f}  max {max(tokens):>7,}  total {sum(tokens):>9,}")
+    print("\nsave_context on the request path (ms): p50 / max")
+    for name, (tokens, saves) in results.items():
+        print(f"{name:9} {statistics.median(saves) * 1000:6.2f} / {max(saves) * 1000:6.2f}")
+
+    budgeted = memories["budgeted"]
+    print(f"\n{summarizer.calls} summary calls in the background; final summary "
+          f"({len(budgeted.summary.split())} words): {budgeted.summary[:120]}...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Document parsing throughput (files/sec) against worker count.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_parsing --files 64 --workers 1 2 4 8
+"""
+import argparse
+import random
+import time
+from document_parser import default_workers, parse_files
+
+WORDS = (
+    "policy employee leave budget quarterly report engineering marketing "
+    "project alpha timeline review approval salary benefits onboarding "
+    "security compliance training vendor contract renewal milestone"
+).split()
+
+
+class SyntheticFile:
+    """Stands in for Streamlit's UploadedFile."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
+
+def make_corpus(num_files, paragraphs, seed=42):
+    rng = random.Random(seed)
+    files = []
+    for i in range(num_files):
+        lines = [f"# Synthetic document {i}"]
+        for _ in range(paragraphs):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))
+            lines.append(sentence.capitalize() + ".")
+        files.append(SyntheticFile(f"doc_{i}.md", "\n\n".join(lines).encode("utf-8")))
+    return files
+
+
+def run(files, workers):
+    start = time.perf_counter()
+    chunks = 0
+    for _, docs in parse_files(files, max_workers=workers):
+        chunks += len(docs)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(files) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, default_workers()])
+    args = parser.parse_args()
+
+    files = make_corpus(args.files, args.paragraphs)
+    total_mb = sum(len(f.getvalue()) for f in files) / 1e6
+    print(f"Corpus: {len(files)} files, {total_mb:.1f} MB\n")
+
+    # Warm the pools up so worker start-up and imports are not timed
+    for workers in sorted(set(args.workers)):
+        run(files[:workers * 2], workers)
+
+    print(f"{'workers':>8} {'seconds':>9} {'files/sec':>10} {'speedup':>8}")
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        elapsed, throughput = run(files, workers)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {elapsed:>9.2f} {throughput:>10.1f} {throughput / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
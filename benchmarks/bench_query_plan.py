@@ -0,0 +1,98 @@
+"""
+Latency of typical generated SQL on a large synthetic database, before and
+after the indexes recommended by the query plan guard.
+
+Runs each query through QueryPlanGuard.check (which records the columns
+scanned queries filter and join on) and the SQLExecutor, prints the
+recommended CREATE INDEX statements, builds them and runs the queries
+again. Finally shows a large row-returning full scan being rejected and
+a full-scan aggregate being let through.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_query_plan --employees 1000000 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from benchmarks.bench_sql import make_database
+from sql_executor import SQLExecutor
+from sql_planner import QueryPlanGuard, QueryRejected, explain
+
+QUERIES = [
+    ("SELECT COUNT(*) FROM employees WHERE department = ?", ("Engineering",)),
+    ("SELECT name, salary FROM employees WHERE department = ? ORDER BY salary DESC LIMIT 5", ("Sales",)),
+    ("SELECT budget FROM departments WHERE name = ?", ("Marketing",)),
+    (
+        "SELECT d.name, COUNT(*) FROM employees e JOIN departments d ON e.department = d.name "
+        "WHERE d.name = ? GROUP BY d.name",
+        ("Finance",),
+    ),
+    ("SELECT name FROM employees WHERE salary > ? LIMIT 20", (199_000,)),
+]
+
+
+def run_queries(guard, executor, repeat):
+    timings = []
+    for sql, params in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            guard.check(sql, params)
+            executor.execute(sql, params)
+            samples.append(time.perf_counter() - start)
+        timings.append(statistics.median(samples))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "company.db")
+        start = time.perf_counter()
+        make_database(path, args.employees)
+        print(f"built {args.employees:,} employees in {time.perf_counter() - start:.1f}s\n")
+
+        executor = SQLExecutor(path, timeout=60)
+        # Never reject here; only record what the queries scan
+        guard = QueryPlanGuard(path, max_scan_rows=float("inf"))
+
+        with guard.connection() as conn:
+            before_plans = [explain(conn, sql, params) for sql, params in QUERIES]
+        before = run_queries(guard, executor, args.repeat)
+
+        statements = guard.recommendations()
+        print("recommended indexes:")
+        for statement in statements:
+            print(f"  {statement}")
+        guard.create_indexes()
+
+        with guard.connection() as conn:
+            after_plans = [explain(conn, sql, params) for sql, params in QUERIES]
+        after = run_queries(guard, executor, args.repeat)
+
+        print(f"\n{'query':70} {'before':>10} {'after':>10}")
+        for (sql, _), b, a, bp, ap in zip(QUERIES, before, after, before_plans, after_plans):
+            print(f"{sql[:70]:70} {b * 1000:8.1f}ms {a * 1000:8.1f}ms")
+            print(f"{'':4}plan: {'; '.join(bp)}  ->  {'; '.join(ap)}")
+
+        strict = QueryPlanGuard(path, max_scan_rows=args.employees // 2)
+        try:
+            strict.check("SELECT name FROM employees WHERE name LIKE '%42%'")
+        except QueryRejected as e:
+            print(f"\nrejected: {e}")
+        sql = "SELECT AVG(salary) FROM employees"
+        plan = strict.check(sql)
+        start = time.perf_counter()
+        executor.execute(sql)
+        print(f"allowed:  {sql} ({'; '.join(plan)}, {(time.perf_counter() - start) * 1000:.0f}ms)")
+        executor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Document questions: ConversationalRetrievalChain vs single-pass RAG.
+
+Builds a knowledge base from a synthetic corpus with HashEmbeddings and
+asks document questions through the full agent (ScriptedChatModel) in
+both RAG modes, after one earlier turn so the chat history is non-empty
+(with an empty history the conversational chain skips its condensing
+call). Each question is asked twice, so the second round shows the
+single-pass query-embedding and retrieval caches.
+
+Reports LLM calls per question (agent + RAG tool) and latency.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_rag
+    python -m benchmarks.bench_rag --llm-latency 0.5 --embedding-latency 0.1 --search mmr
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+QUESTIONS = [
+    "What does the policy document say about leave?",
+    "Summarise the quarterly budget report",
+    "What does the onboarding document say about training?",
+    "Which vendor contract in my files needs renewal?",
+    "What is the project alpha timeline in the report?",
+    "What does the security policy require?",
+]
+
+
+def run_mode(mode, args, vectorstore, llm):
+    import engine
+    from conversation_memory import BudgetedMemory
+
+    memory = BudgetedMemory(memory_key="chat_history", return_messages=True)
+    memory.save_context({"input": "Hi, I uploaded our company handbook."}, {"output": "Thanks! Ask me anything about it."})
+    options = {"mode": mode, "k": args.k, "search_type": args.search}
+    with mock.patch.object(engine, "ChatOpenAI", lambda **kwargs: llm):
+        agent_engine = engine.AgentEngine(
+            "sk-offline", "weather-key", memory, vectorstore, progress=lambda message: None,
+            rag_options=options, index_version=f"bench-{mode}",
+        )
+
+    rounds = []
+    for _ in range(2):
+        calls, samples = llm.calls, []
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            agent_engine.agent_executor.invoke({"input": question})
+            samples.append(time.perf_counter() - start)
+        rounds.append({"calls": (llm.calls - calls) / len(QUESTIONS), "p50_ms": statistics.median(samples) * 1000,
+                       "mean_ms": statistics.mean(samples) * 1000})
+    return rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--search", choices=["similarity", "mmr"], default="similarity")
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    from benchmarks.bench_e2e import parse_plain_text
+    from benchmarks.bench_parsing import make_corpus
+    from benchmarks.fake_llm import HashEmbeddings, ScriptedChatModel
+    from document_search import cache_stats
+    from knowledge_base import KnowledgeBaseIndex
+
+    llm = ScriptedChatModel(latency=args.llm_latency)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            kb = KnowledgeBaseIndex(HashEmbeddings(latency=args.embedding_latency), index_dir="index",
+                                    cache_dir="embedding_cache", max_workers=1, parse=parse_plain_text)
+            kb.sync(make_corpus(args.files, args.paragraphs))
+            results = {mode: run_mode(mode, args, kb.vectorstore, llm) for mode in ("conversational", "single-pass")}
+        finally:
+            os.chdir(cwd)
+
+    print(f"{len(QUESTIONS)} document questions x 2 rounds, k={args.k}, {args.search} search, "
+          f"{args.llm_latency * 1000:.0f} ms per LLM call, {args.embedding_latency * 1000:.0f} ms per embedding")
+    print(f"{'mode':15} {'round':>5} {'LLM calls/q':>12} {'p50':>9} {'mean':>9}")
+    for mode, rounds in results.items():
+        for number, r in enumerate(rounds, 1):
+            print(f"{mode:15} {number:>5} {r['calls']:>12.1f} {r['p50_ms']:7.0f}ms {r['mean_ms']:7.0f}ms")
+
+    before, after = results["conversational"], results["single-pass"]
+    print(f"\nsingle-pass saves {before[0]['calls'] - after[0]['calls']:.1f} LLM calls and "
+          f"{before[0]['mean_ms'] - after[0]['mean_ms']:.0f} ms per question "
+          f"({before[1]['mean_ms'] - after[1]['mean_ms']:.0f} ms with warm caches)")
+    print(f"single-pass caches: {cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Per-session knowledge base indexes under a memory budget (index_registry.py).
+
+Simulates --sessions users who each upload their own documents, then
+--requests searches spread over the sessions with a skewed (Zipf-like)
+popularity, as a busy app would see. Each configuration runs in a fresh
+process so resident memory is comparable. Reports resident memory, the
+registry's estimate of loaded index memory, index objects held, live
+threads (every index embeds through one shared scheduler), evictions, and
+the latency of searches that had to reload their index from disk.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_registry
+    python -m benchmarks.bench_registry --sessions 50 --budgets 0 16 64 --paragraphs 200
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))] if ordered else float("nan")
+
+
+def run_config(args, budget_mb):
+    """Builds every session's index, then replays the request mix. Runs in its own process."""
+    import logging
+    from benchmarks.bench_e2e import parse_plain_text, resident_mb
+    from benchmarks.bench_parsing import make_corpus
+    from benchmarks.fake_llm import HashEmbeddings
+    from embedding_scheduler import EmbeddingScheduler
+    from index_registry import IndexRegistry
+    from knowledge_base import KnowledgeBaseIndex
+
+    logging.disable(logging.INFO)
+    embeddings = HashEmbeddings(dimensions=args.dimensions)
+    scheduler = EmbeddingScheduler(embeddings)  # as get_embedding_scheduler(api_key) is for the app
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = IndexRegistry(
+            budget_mb or float("inf"),
+            index_dir=os.path.join(tmp, "indexes"),
+            factory=lambda corpus, api_key: KnowledgeBaseIndex(
+                name=corpus, index_dir=os.path.join(tmp, "indexes"), cache_dir=os.path.join(tmp, "embeddings"),
+                max_workers=1, parse=parse_plain_text, scheduler=scheduler, by_content=True,
+            ),
+        )
+        baseline_mb = resident_mb()
+        sessions = [f"user-{i}" for i in range(args.sessions)]
+        for i, session in enumerate(sessions):
+            with registry.in_use(session):
+                registry.get(session).sync(make_corpus(args.files, args.paragraphs, seed=i))
+        after_upload_mb = resident_mb()
+
+        rng = random.Random(1)
+        weights = [1 / (rank + 1) ** args.skew for rank in range(len(sessions))]
+        handles = {session: registry.handle(session) for session in sessions}
+        query = embeddings.embed_query("policy leave budget")
+        warm, cold = [], []
+        for _ in range(args.requests):
+            session = rng.choices(sessions, weights)[0]
+            reloads = registry.stats["reloads"]
+            start = time.perf_counter()
+            with registry.in_use(session):
+                handles[session].similarity_search_by_vector(query, k=4)
+            elapsed = time.perf_counter() - start
+            (cold if registry.stats["reloads"] > reloads else warm).append(elapsed)
+
+        return {
+            "budget_mb": budget_mb,
+            "rss_upload_mb": after_upload_mb - baseline_mb,
+            "rss_end_mb": resident_mb() - baseline_mb,
+            "loaded_mb": registry.memory_bytes() / 1e6,
+            "loaded": sum(1 for index in registry.indexes.values() if index.resident_bytes),
+            "held": len(registry.indexes),
+            "threads": threading.active_count(),
+            "evictions": registry.stats["evictions"],
+            "reloads": registry.stats["reloads"],
+            "warm_p50_ms": percentile(warm, 50) * 1000,
+            "cold_p50_ms": percentile(cold, 50) * 1000,
+            "cold_p95_ms": percentile(cold, 95) * 1000,
+            "total_s": sum(warm) + sum(cold),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--files", type=int, default=2, help="files per session")
+    parser.add_argument("--paragraphs", type=int, default=120, help="paragraphs per file")
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of session popularity")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0, 64, 16], help="MB; 0 = unlimited")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for budget in args.budgets:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_config, (args, budget)))
+
+    print(f"{args.sessions} sessions x {args.files} files, {args.dimensions}-d vectors, "
+          f"{args.requests} searches (Zipf {args.skew})")
+    print(f"{'budget':>9} {'RSS upload':>11} {'RSS end':>9} {'loaded':>14} {'held':>5} {'threads':>8} {'evict':>6} {'reload':>7} "
+          f"{'warm p50':>9} {'reload p50':>11} {'reload p95':>11} {'total':>7}")
+    for r in results:
+        budget = f"{r['budget_mb']:.0f} MB" if r["budget_mb"] else "unlimited"
+        print(f"{budget:>9} {r['rss_upload_mb']:>8.0f} MB {r['rss_end_mb']:>6.0f} MB "
+              f"{r['loaded_mb']:>6.1f} MB ({r['loaded']:>2}) {r['held']:>5} {r['threads']:>8} {r['evictions']:>6} {r['reloads']:>7} "
+              f"{r['warm_p50_ms']:>7.2f}ms {r['cold_p50_ms']:>9.2f}ms {r['cold_p95_ms']:>9.2f}ms {r['total_s']:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
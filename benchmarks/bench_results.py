@@ -0,0 +1,109 @@
+"""
+Rendering SQL results for the agent: the old format_results vs sql_results.
+
+Builds a synthetic company database with --employees rows and renders the
+results of a few queries two ways:
+
+    old  every cell formatted, floats checked against str(row) for
+         "salary"/"budget", the whole result returned as one string
+    new  render_results: per-column formatters, a header, rows until
+         RESULT_TOKENS, then a preview note and SQL-computed aggregates
+
+Each query is run twice: with the executor's default row/byte caps (what
+the SQL tool does) and uncapped, so the full 100k-row result is rendered.
+Reports rendering time (the new renderer's aggregate query separately)
+and tool output tokens (the input the agent's next LLM call pays for).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_results
+    python -m benchmarks.bench_results --employees 100000 --repeat 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+QUERIES = [
+    "SELECT * FROM employees",
+    "SELECT e.name, e.salary, d.budget FROM employees e JOIN departments d ON d.name = e.department",
+    "SELECT department, AVG(salary), COUNT(*) FROM employees GROUP BY department",
+]
+
+
+def old_format_results(results):
+    """format_results and format_rows as they were before sql_results.py."""
+    if not isinstance(results, list):
+        return str(results)
+    if not results:
+        return "No results found"
+    if len(results[0]) == 1:
+        text = "\n".join([str(row[0]) for row in results])
+    else:
+        formatted_rows = []
+        for row in results:
+            row_items = []
+            for item in row:
+                if isinstance(item, float):
+                    row_items.append(f"${item:,.2f}" if "salary" in str(row) or "budget" in str(row) else f"{item:.2f}")
+                else:
+                    row_items.append(str(item))
+            formatted_rows.append("\t".join(row_items))
+        text = "\n".join(formatted_rows)
+    if getattr(results, "truncated", False):
+        text += f"\n(Showing the first {len(results)} rows; the query returned more.)"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from setup_db import setup_database
+    from sql_executor import SQLExecutor
+    from sql_results import RESULT_TOKENS, render_results
+    from token_counter import count_tokens
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "company.db")
+        setup_database(path, synthetic_employees=args.employees)
+        executors = {"capped": SQLExecutor(path), "uncapped": SQLExecutor(path, max_rows=10**9, max_bytes=10**12, timeout=60)}
+
+        print(f"{args.employees:,} synthetic employees, RESULT_TOKENS={RESULT_TOKENS}, best of {args.repeat}")
+        print(f"{'query':42} {'executor':9} {'rows':>7} {'old ms':>8} {'old tokens':>11} {'new ms':>8} {'+ SQL agg':>10} {'new tokens':>11}")
+        for sql in QUERIES:
+            for name, executor in executors.items():
+                results = executor.execute(sql)
+                timings = {"old": [], "new": [], "aggregates": []}
+
+                def timed_execute(aggregate_sql, params=(), executor=executor):
+                    start = time.perf_counter()
+                    try:
+                        return executor.execute(aggregate_sql, params)
+                    finally:
+                        timings["aggregates"][-1] += time.perf_counter() - start
+
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    old_text = old_format_results(results)
+                    timings["old"].append(time.perf_counter() - start)
+                    # Rendering only; the aggregate query (run when rows are left out) is timed apart
+                    timings["aggregates"].append(0.0)
+                    start = time.perf_counter()
+                    new_text = render_results(results, execute=timed_execute)
+                    timings["new"].append(time.perf_counter() - start - timings["aggregates"][-1])
+                print(f"{sql[:42]:42} {name:9} {len(results):>7,} "
+                      f"{min(timings['old']) * 1000:>8.1f} {count_tokens(old_text, 'gpt-4-turbo'):>11,} "
+                      f"{min(timings['new']) * 1000:>8.1f} {min(timings['aggregates']) * 1000:>10.1f} "
+                      f"{count_tokens(new_text, 'gpt-4-turbo'):>11,}")
+
+        print("\nNew output for the first query (capped executor):")
+        text = render_results(executors["capped"].execute(QUERIES[0]), execute=executors["capped"].execute)
+        print("\n".join(text.splitlines()[:4] + ["..."] + text.splitlines()[-2:]))
+        for executor in executors.values():
+            executor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Benchmark of the local intent router (intent_router.py) on a labeled query set.
+
+Reports:
+  * routing accuracy: of the queries the router dispatched, how many went
+    to the labeled tool (a wrong dispatch is worse than a fallback)
+  * coverage: the share of routable queries it dispatched
+  * LLM calls and latency, agent vs router, measured by running both paths
+    over the routable queries on ScriptedChatModel with synthetic databases
+    and a fake weather server
+
+Labels are the tool the agent's priority list prescribes, or 'agent' for
+requests the router must leave to the agent (documents, images, general
+knowledge, follow-ups, other days). The set is held out: none of it is in
+intent_router.EXAMPLES, and it includes near misses that carry a tool's
+keywords without being its question (another company's headcount, a
+holiday budget, tomorrow's forecast, two cities).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_router
+    python -m benchmarks.bench_router --llm-latency 0.5 --no-run
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest import mock
+
+WEATHER_KEY = "bench-weather-key"
+
+LABELED = [
+    ("What is the budget for the Marketing department?", "DatabaseQuery"),
+    ("Who earns the most in Engineering?", "DatabaseQuery"),
+    ("How many employees work in Engineering?", "DatabaseQuery"),
+    ("What is the average salary by department?", "DatabaseQuery"),
+    ("List the employees in Finance", "DatabaseQuery"),
+    ("Which department has the biggest budget?", "DatabaseQuery"),
+    ("Who is paid the least in Sales?", "DatabaseQuery"),
+    ("Total payroll for HR", "DatabaseQuery"),
+    ("How many staff are in Legal?", "DatabaseQuery"),
+    ("Which department spends the least?", "DatabaseQuery"),
+    ("Show the top 5 earners", "DatabaseQuery"),
+    ("what's the headcount of research", "DatabaseQuery"),
+    ("What is Jane Smith's salary?", "DatabaseQuery"),
+    ("How many employees are there?", "DatabaseQuery"),
+    ("What events are on in London today?", "EventRecommender"),
+    ("what to do in tokyo today", "EventRecommender"),
+    ("Recommend some activities in Paris", "EventRecommender"),
+    ("What can we do today in Berlin?", "EventRecommender"),
+    ("Is there anything going on in Sydney tonight?", "EventRecommender"),
+    ("Suggest something fun to do in Kuala Lumpur", "EventRecommender"),
+    ("Any concerts in Melbourne tonight?", "EventRecommender"),
+    ("weather in new york right now", "CurrentWeather"),
+    ("What is the temperature in Dubai?", "CurrentWeather"),
+    ("Is it raining in Manila?", "CurrentWeather"),
+    ("How humid is it in Bangkok today?", "CurrentWeather"),
+    ("Current weather for Paris, France", "CurrentWeather"),
+    ("How hot is it in Phoenix right now?", "CurrentWeather"),
+    ("Is it snowing in Helsinki?", "CurrentWeather"),
+    # Left to the agent
+    ("What does the policy document say about onboarding?", "agent"),
+    ("Summarise the uploaded report", "agent"),
+    ("Draw a picture of a cat in the rain", "agent"),
+    ("Create an image of the Singapore skyline", "agent"),
+    ("Hi there", "agent"),
+    ("Thanks a lot", "agent"),
+    ("Who won the 2018 world cup?", "agent"),
+    ("What is the capital of Canada?", "agent"),
+    ("Explain quantum computing simply", "agent"),
+    ("What about Sales?", "agent"),
+    ("And how much do they earn?", "agent"),
+    ("What's the weather like?", "agent"),
+    ("Is it raining there?", "agent"),
+    ("Any events this weekend in Singapore?", "agent"),
+    ("Things to do tomorrow in London", "agent"),
+    ("Compare the Engineering budget with the weather in Singapore", "agent"),
+    ("Tell me a joke about databases", "agent"),
+    ("What's the latest news on AI?", "agent"),
+    ("Any events in Singapore, and will the weather be ok?", "agent"),
+    # Near misses: the keywords of a tool, but not its question
+    ("How many employees does Apple have?", "agent"),
+    ("how many employees does tesla have", "agent"),
+    ("What's a good budget for a trip to Japan?", "agent"),
+    ("what's a sensible budget for a week in italy", "agent"),
+    ("What does the Department of Defense do?", "agent"),
+    ("department of defense budget", "agent"),
+    ("How much do software engineers earn in London?", "agent"),
+    ("What is the average salary of a data scientist in the US?", "agent"),
+    ("Which teams are in the Premier League?", "agent"),
+    ("forecast for Paris tomorrow", "agent"),
+    ("What will the temperature be in Rome next week?", "agent"),
+    ("weather in New York and London", "agent"),
+    ("Is it raining in Seoul or Busan?", "agent"),
+    ("What's the weather in Madrid for my flight?", "agent"),
+    ("Which events shaped the 20th century?", "agent"),
+    ("Any events in Singapore next Friday?", "agent"),
+    ("How cold does it get on Mars?", "agent"),
+    ("Hot chocolate recipes please", "agent"),
+]
+
+
+def evaluate(router):
+    """Routing decisions for LABELED; returns the confusion counts."""
+    from intent_router import EXAMPLES
+    seen = {text.lower() for texts in EXAMPLES.values() for text in texts}
+    overlap = [query for query, _ in LABELED if query.lower() in seen]
+    assert not overlap, f"evaluation queries also used to train the classifier: {overlap}"
+
+    counts = {"correct": 0, "wrong": 0, "fallback": 0, "correct_fallback": 0, "routable": 0}
+    mistakes = []
+    start = time.perf_counter()
+    for query, label in LABELED:
+        before = dict(router.stats)
+        route = router.route(query)
+        if label != "agent":
+            counts["routable"] += 1
+        if route is None:
+            counts["correct_fallback" if label == "agent" else "fallback"] += 1
+            if label != "agent":
+                reason = next((key for key, value in router.stats.items() if value != before.get(key, 0)), "?")
+                mistakes.append((query, label, f"agent ({reason})"))
+        elif route.tool == label:
+            counts["correct"] += 1
+        else:
+            counts["wrong"] += 1
+            mistakes.append((query, label, route.tool))
+    counts["us_per_query"] = (time.perf_counter() - start) / len(LABELED) * 1e6
+    return counts, mistakes
+
+
+def run_paths(agent_engine, llm, queries):
+    """LLM calls and seconds for the agent and the router on the same queries."""
+    results = {}
+    for path in ("agent", "router"):
+        calls, start = llm.calls, time.perf_counter()
+        with redirect_stdout(None):
+            for query in queries:
+                route = agent_engine.route(query) if path == "router" else None
+                if route:
+                    agent_engine.run_route(query, route)
+                else:
+                    agent_engine.agent_executor.invoke({"input": query})
+        results[path] = {"llm_calls": llm.calls - calls, "seconds": time.perf_counter() - start}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--weather-latency", type=float, default=0.02)
+    parser.add_argument("--no-run", action="store_true", help="only measure routing accuracy")
+    args = parser.parse_args()
+
+    from langchain.memory import ConversationBufferMemory
+    import engine
+    import weather_client
+    from benchmarks.fake_llm import ScriptedChatModel
+    from benchmarks.fake_weather_server import FakeWeatherServer
+    from setup_db import setup_database as setup_company_db
+    from setup_events_db import setup_database as setup_events_db
+
+    llm = ScriptedChatModel(latency=args.llm_latency)
+    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    with mock.patch.object(engine, "ChatOpenAI", lambda **kwargs: llm):
+        agent_engine = engine.AgentEngine("sk-offline", WEATHER_KEY, memory, progress=lambda message: None)
+
+    weather = FakeWeatherServer(("127.0.0.1", 0), latency=args.weather_latency).start()
+    weather_client._clients[WEATHER_KEY] = weather_client.WeatherClient(WEATHER_KEY, ttl=0, base_url=weather.base_url)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            # The router checks names in SQL questions against company.db
+            with redirect_stdout(None):
+                setup_company_db("company.db", 2000)
+                setup_events_db("events.db", 2000)
+
+            counts, mistakes = evaluate(agent_engine.router)
+            dispatched = counts["correct"] + counts["wrong"]
+            print(f"{len(LABELED)} labeled queries, {counts['routable']} routable")
+            print(f"routing accuracy: {counts['correct']}/{dispatched} dispatched queries went to the right tool "
+                  f"({counts['correct'] / max(1, dispatched):.0%})")
+            print(f"coverage: {counts['correct']}/{counts['routable']} routable queries skipped the agent "
+                  f"({counts['correct'] / max(1, counts['routable']):.0%})")
+            print(f"left to the agent: {counts['fallback'] + counts['correct_fallback']} "
+                  f"({counts['correct_fallback']} by label)")
+            print(f"routing cost: {counts['us_per_query']:.0f} us/query")
+            for query, expected, got in mistakes:
+                print(f"  {query!r}: expected {expected}, got {got}")
+
+            if args.no_run:
+                return
+            # Queries labeled 'agent' take the same path either way (and some need the network)
+            results = run_paths(agent_engine, llm, [query for query, label in LABELED if label != "agent"])
+        finally:
+            os.chdir(cwd)
+            weather.shutdown()
+
+    agent, router = results["agent"], results["router"]
+    print(f"\n{'path':8} {'LLM calls':>10} {'seconds':>9}")
+    for path, r in results.items():
+        print(f"{path:8} {r['llm_calls']:>10} {r['seconds']:9.2f}")
+    saved = agent["llm_calls"] - router["llm_calls"]
+    print(f"LLM calls saved: {saved} ({saved / max(1, agent['llm_calls']):.0%}), "
+          f"{agent['seconds'] - router['seconds']:.2f}s at {args.llm_latency * 1000:.0f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
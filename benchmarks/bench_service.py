@@ -0,0 +1,150 @@
+"""
+Load test of the headless engine (chat_service.py) through its two front
+ends: batch_runner.run_batch in-process, and api_server.py over HTTP with
+one client per session.
+
+--sessions sessions each ask --turns questions in order (SQL, weather,
+events, small talk and a drawing), so later turns run with memory. The
+agent and summarizer LLM is ScriptedChatModel; WeatherAPI and the Images
+API are FakeWeatherServer and FakeImageServer; the company and events
+databases are generated in a temporary directory. Reports throughput and
+turn latency for each concurrency level.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_service
+    python -m benchmarks.bench_service --sessions 32 --concurrency 1 8 32 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest import mock
+
+WEATHER_KEY = "bench-weather-key"
+TURNS = [
+    "What is the budget for {d}?",
+    "Hello!",
+    "What's the weather in Singapore?",
+    "Draw a lighthouse in {d} colours",
+    "How many employees work in {d}?",
+    "Any things to do today?",
+]
+
+
+def make_items(sessions, turns):
+    from benchmarks.fake_llm import DEPARTMENTS
+    return [{"id": f"{s}-{t}", "session": f"user-{s}", "question": TURNS[t % len(TURNS)].format(d=DEPARTMENTS[s % len(DEPARTMENTS)])}
+            for s in range(sessions) for t in range(turns)]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+async def run_http(service, items, concurrency):
+    """Serves create_app(service) on a local port and drives it with one client per session."""
+    import aiohttp
+    from aiohttp import web
+    from api_server import create_app
+
+    runner = web.AppRunner(create_app(service))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    by_session = {}
+    for item in items:
+        by_session.setdefault(item["session"], []).append(item)
+    slots = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def client(http, session_id, session_items):
+        for item in session_items:
+            async with slots:
+                start = time.perf_counter()
+                async with http.post(f"http://127.0.0.1:{port}/sessions/{session_id}/messages",
+                                     json={"message": item["question"]}) as response:
+                    body = await response.json()
+                results.append({"total": time.perf_counter() - start, "error": body.get("error"),
+                                "tools": body.get("tools", [])})
+
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as http:
+            await asyncio.gather(*(client(http, session_id, session_items) for session_id, session_items in by_session.items()))
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=6, help="questions per session")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--weather-latency", type=float, default=0.05)
+    parser.add_argument("--image-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    import chat_service
+    import engine
+    import image_jobs
+    import weather_client
+    from batch_runner import run_batch
+    from benchmarks.fake_image_server import FakeImageServer
+    from benchmarks.fake_llm import ScriptedChatModel
+    from benchmarks.fake_weather_server import FakeWeatherServer
+    from setup_db import setup_database as setup_company_db
+    from setup_events_db import setup_database as setup_events_db
+
+    llm = ScriptedChatModel(latency=args.llm_latency)
+    weather = FakeWeatherServer(("127.0.0.1", 0), latency=args.weather_latency).start()
+    images = FakeImageServer(("127.0.0.1", 0), latency=args.image_latency).start()
+    weather_client._clients[WEATHER_KEY] = weather_client.WeatherClient(WEATHER_KEY, base_url=weather.base_url)
+    items = make_items(args.sessions, args.turns)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            with redirect_stdout(None):
+                setup_company_db("company.db", 200)
+                setup_events_db("events.db", 200)
+            image_jobs._queue = image_jobs.ImageJobQueue(image_jobs.ImageStore("images"))
+
+            print(f"{args.sessions} sessions x {args.turns} turns; LLM {args.llm_latency}s, "
+                  f"weather {args.weather_latency}s, image API {args.image_latency}s (in the background)")
+            print(f"{'front end':10} {'concurrency':>11} {'turns/s':>8} {'p50':>8} {'p95':>8} {'LLM calls':>10} {'errors':>7}")
+            with mock.patch.object(engine, "ChatOpenAI", lambda **kwargs: llm), \
+                    mock.patch.object(chat_service, "ChatOpenAI", lambda **kwargs: llm):
+                for front_end in ("batch", "http"):
+                    for concurrency in args.concurrency:
+                        # Fresh sessions each run; no answer cache, so every turn does the work
+                        service = chat_service.ChatService("sk-offline", WEATHER_KEY, image_api_url=images.base_url,
+                                                           use_answer_cache=False)
+                        calls = llm.calls
+                        start = time.perf_counter()
+                        if front_end == "batch":
+                            results = asyncio.run(run_batch(service, items, io.StringIO(), concurrency))
+                        else:
+                            results = asyncio.run(run_http(service, items, concurrency))
+                        seconds = time.perf_counter() - start
+                        latencies = [result["total"] for result in results]
+                        errors = sum(bool(result.get("error")) for result in results)
+                        print(f"{front_end:10} {concurrency:>11} {len(results) / seconds:>8.1f} "
+                              f"{statistics.median(latencies) * 1000:>6.0f}ms {percentile(latencies, 95) * 1000:>6.0f}ms "
+                              f"{llm.calls - calls:>10} {errors:>7}")
+        finally:
+            os.chdir(cwd)
+    weather.shutdown()
+    images.shutdown()
+
+
+if __name__ == "__main__":
+    main()
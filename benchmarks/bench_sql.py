@@ -0,0 +1,90 @@
+"""
+Concurrent query throughput of the SQL tool's execution layer.
+
+Builds a synthetic company database, then runs the same mix of queries
+from several threads two ways: a fresh sqlite3.connect + fetchall per
+query (the old execute_query), and the pooled read-only SQLExecutor.
+Also checks that a runaway cross join is stopped at the deadline and that
+large results are capped.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_sql --employees 200000 --threads 8 --queries 200
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from setup_db import setup_database
+from sql_executor import SQLExecutor, QueryTimeout
+
+# Lookups where connection setup dominates, and scans where SQLite's own work does
+POINT_QUERIES = [
+    ("SELECT budget FROM departments WHERE name = ?", ("Engineering",)),
+    ("SELECT name, salary FROM employees WHERE id = ?", (4242,)),
+    ("SELECT name FROM employees WHERE department = ? LIMIT 50", ("Sales",)),
+]
+SCAN_QUERIES = [
+    ("SELECT department, AVG(salary) FROM employees GROUP BY department", ()),
+    ("SELECT name, salary FROM employees ORDER BY salary DESC LIMIT 10", ()),
+    ("SELECT COUNT(*) FROM employees WHERE salary > ?", (90000,)),
+]
+
+
+def make_database(path, employees):
+    setup_database(path, synthetic_employees=employees)
+
+
+def connect_per_query(path):
+    def run(sql, params):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    return run
+
+
+def throughput(run, mix, threads, queries):
+    work = [mix[i % len(mix)] for i in range(queries)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda q: run(*q), work))
+    return queries / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "company.db")
+        make_database(path, args.employees)
+        executor = SQLExecutor(path, pool_size=args.threads, timeout=args.timeout)
+
+        for label, mix, count in (("point", POINT_QUERIES, args.queries * 20), ("scan", SCAN_QUERIES, args.queries)):
+            baseline = throughput(connect_per_query(path), mix, args.threads, count)
+            pooled = throughput(executor.execute, mix, args.threads, count)
+            print(f"{label:5} connect per query : {baseline:8.1f} queries/s")
+            print(f"{label:5} pooled read-only  : {pooled:8.1f} queries/s ({pooled / baseline:.2f}x)")
+
+        start = time.perf_counter()
+        try:
+            executor.execute("SELECT COUNT(*) FROM employees a, employees b")
+            print("cross join        : finished (database too small to hit the deadline)")
+        except QueryTimeout as e:
+            print(f"cross join        : stopped after {time.perf_counter() - start:.2f}s ({e})")
+
+        rows = executor.execute("SELECT * FROM employees")
+        print(f"full table scan   : {len(rows)} rows returned, truncated={rows.truncated}")
+        print(f"executor stats    : {executor.stats}")
+        executor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cold-start import time and per-rerun overhead of the chat app, before and
+after caching the AgentEngine and deferring heavy imports.
+
+"Before" imports everything app.py used to import eagerly and rebuilds the
+LLM, chains, tools and agent on every rerun; "after" imports only what
+app.py imports now and reuses the cached engine.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_startup --reruns 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+EAGER_IMPORTS = (
+    "import engine, knowledge_base; "
+    "from langchain_community.document_loaders import UnstructuredFileLoader; "
+    "from langchain_community.utilities.dalle_image_generator import DallEAPIWrapper"
+)
+LAZY_IMPORTS = "import engine, answer_cache, weather_client, agent_stream"
+
+
+def cold_import_seconds(statement, runs):
+    """Best-of-N wall time for a fresh interpreter to run the imports."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--cold-runs", type=int, default=3)
+    args = parser.parse_args()
+
+    baseline = cold_import_seconds("pass", args.cold_runs)
+    eager = cold_import_seconds(EAGER_IMPORTS, args.cold_runs) - baseline
+    lazy = cold_import_seconds(LAZY_IMPORTS, args.cold_runs) - baseline
+    print(f"{'cold start imports':<28} before {eager:>7.2f}s   after {lazy:>7.2f}s")
+
+    # No network calls are made while building; the key only has to be present
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    from langchain.memory import ConversationBufferMemory
+    from engine import AgentEngine
+
+    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        AgentEngine("sk-benchmark", "weather-key", memory).agent_executor
+    rebuild = (time.perf_counter() - start) / args.reruns
+
+    session_state = {}
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        engine_key = ("sk-benchmark", "weather-key", None)
+        if session_state.get("engine_key") != engine_key:
+            session_state["engine"] = AgentEngine("sk-benchmark", "weather-key", memory)
+            session_state["engine_key"] = engine_key
+        session_state["engine"].agent_executor
+    cached = (time.perf_counter() - start) / args.reruns
+
+    print(f"{'per-rerun engine overhead':<28} before {rebuild * 1000:>6.1f}ms   after {cached * 1000:>6.1f}ms "
+          f"(first build amortised over {args.reruns} reruns)")
+
+
+if __name__ == "__main__":
+    main()
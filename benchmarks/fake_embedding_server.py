@@ -0,0 +1,137 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint.
+
+Returns deterministic hash-based vectors after a configurable latency, and
+answers a configurable share of requests (or anything over a concurrency
+limit) with HTTP 429 and another share with HTTP 503, so the embedding
+scheduler can be exercised offline:
+
+    python -m benchmarks.fake_embedding_server --port 8765 --latency 0.2 --rate-limit 0.1 --error-rate 0.05
+
+Point OpenAIEmbeddings at it with base_url="http://127.0.0.1:8765/v1".
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIMENSIONS = 64
+
+
+def fake_vector(text, dimensions=DIMENSIONS):
+    digest = hashlib.sha256(str(text).encode("utf-8")).digest()
+    values = [(digest[i % len(digest)] / 255.0) - 0.5 for i in range(dimensions)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.1, per_token_latency=0.0, rate_limit=0.0, max_concurrency=None, retry_after=None, error_rate=0.0):
+        super().__init__(address, FakeEmbeddingHandler)
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.rate_limit = rate_limit
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "inputs": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+
+        with server.lock:
+            server.stats["requests"] += 1
+            over_limit = server.max_concurrency is not None and server.in_flight >= server.max_concurrency
+            throttled = over_limit or random.random() < server.rate_limit
+            failed = not throttled and random.random() < server.error_rate
+            if throttled:
+                server.stats["rate_limited"] += 1
+            elif failed:
+                server.stats["errors"] += 1
+            else:
+                server.in_flight += 1
+                server.stats["inputs"] += len(inputs)
+
+        if throttled:
+            headers = {"retry-after": str(server.retry_after)} if server.retry_after is not None else {}
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, headers)
+            return
+        if failed:
+            self.send_json(503, {"error": {"message": "The server is overloaded", "type": "server_error", "code": None}})
+            return
+
+        try:
+            # Inputs arrive as strings or, when the client pre-tokenizes, as token lists
+            tokens = sum(len(item) if isinstance(item, list) else len(item) // 4 + 1 for item in inputs)
+            time.sleep(server.latency + tokens * server.per_token_latency)
+
+            data = []
+            for i, item in enumerate(inputs):
+                vector = fake_vector(item)
+                if request.get("encoding_format") == "base64":
+                    vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+                data.append({"object": "embedding", "index": i, "embedding": vector})
+
+            self.send_json(200, {
+                "object": "list",
+                "data": data,
+                "model": request.get("model", "fake"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="429 anything beyond this many in flight")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(("127.0.0.1", args.port), args.latency, rate_limit=args.rate_limit,
+                                 max_concurrency=args.max_concurrency, error_rate=args.error_rate)
+    print(f"Fake embedding server on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Local stand-in for the OpenAI Images API (POST /v1/images/generations).
+
+Each generation waits --latency seconds and returns a URL on this server;
+downloading it returns a small PNG whose colour depends on the prompt, so
+identical prompts give identical bytes:
+
+    python -m benchmarks.fake_image_server --port 8767 --latency 2
+
+Run the app against it with IMAGE_API_URL=http://127.0.0.1:8767/v1/images/generations.
+"""
+import argparse
+import hashlib
+import json
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_png(seed: bytes, size: int = 64) -> bytes:
+    """A solid-colour size x size PNG, coloured by the first bytes of 'seed'."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + seed[:3] * size
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(row * size)) + chunk(b"IEND", b""))
+
+
+class FakeImageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=1.0, download_latency=0.05):
+        super().__init__(address, FakeImageHandler)
+        self.latency = latency
+        self.download_latency = download_latency
+        self.lock = threading.Lock()
+        self.stats = {"generations": 0, "downloads": 0}
+
+    @property
+    def root_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self):
+        return self.root_url + "/v1/images/generations"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeImageHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, body: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.stats["generations"] += 1
+        time.sleep(self.server.latency)
+
+        digest = hashlib.sha256(request.get("prompt", "").encode("utf-8")).hexdigest()
+        payload = {"created": int(time.time()),
+                   "data": [{"url": f"{self.server.root_url}/files/{digest}.png", "revised_prompt": request.get("prompt")}]}
+        self.send(json.dumps(payload).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        if not self.path.startswith("/files/"):
+            self.send(b"not found", "text/plain", 404)
+            return
+        with self.server.lock:
+            self.server.stats["downloads"] += 1
+        time.sleep(self.server.download_latency)
+        digest = self.path.rsplit("/", 1)[-1].split(".")[0]
+        self.send(make_png(bytes.fromhex(digest)), "image/png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = FakeImageServer(("127.0.0.1", args.port), latency=args.latency)
+    print(f"Serving fake Images API on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Deterministic offline stand-ins for the OpenAI chat model and embeddings.
+
+ScriptedChatModel answers each prompt the app sends (agent planning, SQL
+generation, event recommendations, RAG question answering, image prompts,
+conversation summaries)
+with a fixed, plausible reply after a configurable latency. The agent
+gets OpenAI-style function calls, so AgentExecutor runs real tools.
+HashEmbeddings returns hash-based vectors, like fake_embedding_server,
+without the HTTP round-trip.
+"""
+import asyncio
+import json
+import re
+import time
+import zlib
+from typing import Any, List
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, FunctionMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from benchmarks.fake_embedding_server import fake_vector
+
+DEPARTMENTS = ["Engineering", "Marketing", "Sales", "Finance", "HR", "Legal", "Support", "Research"]
+
+
+def pick_sql(question: str) -> str:
+    text = question.lower()
+    department = next((d for d in DEPARTMENTS if d.lower() in text), "Engineering")
+    if "budget" in text:
+        return f"SELECT budget FROM departments WHERE name = '{department}'"
+    if "highest" in text or "top" in text:
+        return "SELECT name, salary FROM employees ORDER BY salary DESC LIMIT 5"
+    if "average" in text:
+        return "SELECT department, AVG(salary) FROM employees GROUP BY department"
+    if "how many" in text:
+        return f"SELECT COUNT(*) FROM employees WHERE department = '{department}'"
+    return f"SELECT name, salary FROM employees WHERE department = '{department}' LIMIT 20"
+
+
+def pick_tool(question: str, tools: set):
+    """The tool (and its input) the system prompt's priority list would pick."""
+    text = question.lower()
+    if "DocumentKnowledgeBase" in tools and any(w in text for w in ("document", "file", "policy", "report")):
+        return "DocumentKnowledgeBase", question
+    if any(w in text for w in ("salary", "salaries", "budget", "employee", "department")):
+        return "DatabaseQuery", question
+    if any(w in text for w in ("event", "things to do", "what to do")):
+        return "EventRecommender", "Singapore"
+    if "weather" in text:
+        return "CurrentWeather", "Singapore"
+    if any(w in text for w in ("draw", "image", "picture")):
+        return "ImageGenerator", question
+    return None, None
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that replies from a script after 'latency' (+ per output token) seconds."""
+
+    latency: float = 0.05
+    per_token_latency: float = 0.0
+    prompt_token_latency: float = 0.0  # prefill time per prompt token (~4 characters)
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def respond(self, messages, functions) -> AIMessage:
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        human = [m.content for m in messages if isinstance(m, HumanMessage)]
+        question = human[-1] if human else ""
+
+        if functions:
+            if isinstance(messages[-1], FunctionMessage):
+                return AIMessage(content=f"Here is what I found: {messages[-1].content[:300]}")
+            name, tool_input = pick_tool(question, {f["name"] for f in functions})
+            if name is None:
+                return AIMessage(content="Hello! How can I help you today?")
+            call = {"name": name, "arguments": json.dumps({"__arg1": tool_input})}
+            return AIMessage(content="", additional_kwargs={"function_call": call})
+
+        if "SQL expert" in system:
+            return AIMessage(content=pick_sql(question.replace("Generate SQL for:", "")))
+        if "event recommender" in system:
+            return AIMessage(content="I recommend the indoor events today; the outdoor ones depend on the weather.")
+
+        prompt = "\n".join(str(m.content) for m in messages)
+        if "Progressively summarize" in prompt:
+            previous = prompt.split("Previous summary:\n", 1)[1].split("\n", 1)[0]
+            asked = re.findall(r"^Human: (.{0,60})", prompt, re.MULTILINE)
+            return AIMessage(content=" ".join(([] if previous == "(none)" else [previous]) + [f"Asked: {a}." for a in asked])[-1200:])
+        if "follow up question" in prompt.lower():
+            match = re.search(r"Follow Up Input: (.*)\n", prompt)
+            return AIMessage(content=match.group(1) if match else question)
+        if "pieces of context" in prompt:
+            context = prompt.split("pieces of context", 1)[1]
+            sentence = next((line for line in context.splitlines()[2:] if len(line.split()) > 5), "nothing relevant")
+            return AIMessage(content=f"According to the documents: {sentence[:200]}")
+        if "DALL-E" in prompt:
+            match = re.search(r"description: '(.*?)'\. ", prompt)
+            return AIMessage(content=f"A vivid, detailed watercolour scene of {match.group(1) if match else 'a landscape'}.")
+        return AIMessage(content="OK")
+
+    def delay(self, message, messages=()) -> float:
+        tokens = len(str(message.content).split()) + len(json.dumps(message.additional_kwargs).split())
+        prompt_tokens = sum(len(str(m.content)) for m in messages) / 4
+        return self.latency + self.per_token_latency * tokens + self.prompt_token_latency * prompt_tokens
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        message = self.respond(messages, kwargs.get("functions"))
+        time.sleep(self.delay(message, messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        message = self.respond(messages, kwargs.get("functions"))
+        await asyncio.sleep(self.delay(message, messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def bag_of_words_vector(text, dimensions):
+    """Hashed word counts: texts sharing words get similar vectors, so retrieval is meaningful."""
+    values = [0.0] * dimensions
+    for word in re.findall(r"[a-z]{3,}", str(text).lower()):
+        values[zlib.crc32(word.encode("utf-8")) % dimensions] += 1.0
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Hash-based embeddings with a fixed latency per embed_documents call.
+    bag_of_words=True hashes words instead of the whole text, for benchmarks
+    that need relevant chunks to be retrieved.
+    """
+
+    def __init__(self, latency: float = 0.0, dimensions: int = 64, bag_of_words: bool = False):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.model = "fake-bow-embedding" if bag_of_words else "fake-hash-embedding"
+        self.vector = bag_of_words_vector if bag_of_words else fake_vector
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self.vector(text, self.dimensions) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self.vector(text, self.dimensions)
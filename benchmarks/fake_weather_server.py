@@ -0,0 +1,71 @@
+"""
+Local stand-in for WeatherAPI's current.json endpoint.
+
+Returns a fixed payload for any location after a configurable latency:
+
+    python -m benchmarks.fake_weather_server --port 8766 --latency 0.2
+
+Point a WeatherClient at it with base_url="http://127.0.0.1:8766/v1/current.json".
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeWeatherServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.1):
+        super().__init__(address, FakeWeatherHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/current.json"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeWeatherHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+        time.sleep(self.server.latency)
+
+        location = parse_qs(urlparse(self.path).query).get("q", ["Singapore"])[0]
+        payload = {
+            "location": {"name": location.title(), "region": "", "country": "Testland"},
+            "current": {"temp_c": 30.0, "temp_f": 86.0, "condition": {"text": "Partly cloudy"}},
+        }
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = FakeWeatherServer(("127.0.0.1", args.port), latency=args.latency)
+    print(f"Serving fake WeatherAPI on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
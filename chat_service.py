@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from agent_stream import astream_agent
+from answer_cache import SemanticAnswerCache, ToolUsageRecorder, file_version
+from conversation_memory import BudgetedMemory
+from engine import AgentEngine
+from image_jobs import IMAGE_API_URL
+from intent_router import is_follow_up
+from tracing import TracingCallbackHandler, trace_turn
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = "gpt-3.5-turbo"  # cheap model for the rolling conversation summary
+MAX_SESSIONS = 1000               # sessions kept by ChatService.session, least recently used dropped
+
+
+def options_from_env() -> dict:
+    """
+    ChatService options shared by every front end. RAG_MODE=conversational
+    restores the question-condensing chain, RAG_SEARCH=mmr diversifies the
+    chunks, IMAGE_API_URL points image generation at another endpoint and
+    INDEX_MEMORY_MB caps the memory of loaded knowledge base indexes.
+    """
+    return {
+        "rag_options": {
+            "mode": os.environ.get("RAG_MODE", "single-pass"),
+            "k": int(os.environ.get("RAG_K", 4)),
+            "search_type": os.environ.get("RAG_SEARCH", "similarity"),
+        },
+        "image_api_url": os.environ.get("IMAGE_API_URL", IMAGE_API_URL),
+        "index_memory_mb": float(os.environ["INDEX_MEMORY_MB"]) if os.environ.get("INDEX_MEMORY_MB") else None,
+    }
+
+
+class ChatService:
+    """
+    What every chat session shares: API keys, engine options, the semantic
+    answer cache and the per-session knowledge base indexes. The Streamlit
+    app, api_server.py and batch_runner.py are thin clients of it.
+    """
+
+    def __init__(self, openai_api_key: str, weather_api_key: str, rag_options=None, image_api_url: str = IMAGE_API_URL,
+                 use_answer_cache: bool = True, index_memory_mb: float = None):
+        self.openai_api_key = openai_api_key
+        self.weather_api_key = weather_api_key
+        self.rag_options = rag_options
+        self.image_api_url = image_api_url
+        self.answer_cache = SemanticAnswerCache(OpenAIEmbeddings(openai_api_key=openai_api_key)) if use_answer_cache else None
+        self.index_memory_mb = index_memory_mb
+        self.sessions = OrderedDict()  # session ID -> ChatSession, least recently used first
+        self.lock = threading.Lock()
+
+    def index_registry(self):
+        """Knowledge base indexes, one per session, under one memory budget for the process (see index_registry.py)."""
+        # Imported on first upload; faiss and the parsing stack are not needed before that
+        from index_registry import get_index_registry
+        return get_index_registry(self.index_memory_mb)
+
+    def make_memory(self):
+        """Recent turns verbatim, older ones summarized in the background, within a fixed token budget."""
+        return BudgetedMemory(
+            llm=ChatOpenAI(model_name=SUMMARY_MODEL, temperature=0, api_key=self.openai_api_key),
+            memory_key="chat_history",
+            output_key="output",  # streamed agent runs also return "messages"
+            return_messages=True
+        )
+
+    def session(self, session_id: str):
+        """The session's state, created on first use."""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = ChatSession(self, session_id)
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > MAX_SESSIONS:
+                _, dropped = self.sessions.popitem(last=False)
+                if dropped.vectorstore is not None:
+                    self.index_registry().drop(dropped.session_id)
+        return session
+
+    def drop_session(self, session_id: str) -> bool:
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None and session.vectorstore is not None:
+            self.index_registry().drop(session_id)
+        return session is not None
+
+
+class ChatSession:
+    """
+    One conversation: its memory, its documents' index and an AgentEngine
+    rebuilt only when those inputs change. ask runs a turn the way the app
+    always has: answer cache, then the intent router, then the agent.
+    Turns of one session must not overlap (callers serialize them).
+    """
+
+    def __init__(self, service: ChatService, session_id: str, progress=None):
+        self.service = service
+        self.session_id = session_id
+        self.progress = progress or (lambda message: logger.info(f"[{session_id}] {message}"))
+        self.memory = service.make_memory()
+        self.tracing_handler = TracingCallbackHandler(session_id)
+        self.vectorstore = None
+        self.engine = None
+        self.engine_key = None
+        self.turn_metrics = []
+
+    def documents_changed(self, files) -> bool:
+        registry = self.service.index_registry()
+        with registry.in_use(self.session_id):
+            added, removed = registry.get(self.session_id, self.service.openai_api_key).diff(files)
+        return bool(added or removed)
+
+    def sync_documents(self, files):
+        """
+        Syncs this session's index with the uploaded files (only changed
+        files are re-embedded). Files need 'name' and 'getvalue()'.
+        Returns (number of files added, number of files removed).
+        """
+        if not files:
+            self.vectorstore = None
+            return 0, 0
+        registry = self.service.index_registry()
+        with registry.in_use(self.session_id):
+            # Uploads are embedded (and billed) with this service's key
+            knowledge_base = registry.get(self.session_id, self.service.openai_api_key)
+            changes = knowledge_base.sync(files)
+            # The engine keeps a handle, not the index, so the registry can unload it
+            self.vectorstore = registry.handle(self.session_id) if any(knowledge_base.doc_ids.values()) else None
+        return changes
+
+    def index_in_use(self):
+        """Keeps this session's index loaded for the whole turn."""
+        if self.vectorstore is None:
+            return nullcontext()
+        return self.service.index_registry().in_use(self.session_id)
+
+    def current_engine(self) -> AgentEngine:
+        """The engine for the current keys and documents, built on first use and after uploads."""
+        service = self.service
+        key = (service.openai_api_key, service.weather_api_key, self.vectorstore.version if self.vectorstore else None)
+        if self.engine_key != key:
+            self.engine = AgentEngine(
+                service.openai_api_key, service.weather_api_key, self.memory, self.vectorstore,
+                progress=self.progress, rag_options=service.rag_options, index_version=key[2],
+                image_api_url=service.image_api_url,
+            )
+            self.engine_key = key
+        return self.engine
+
+    def data_versions(self) -> dict:
+        """Current version of each data source a cached answer may depend on."""
+        return {
+            "DatabaseQuery": file_version("company.db"),
+            "EventRecommender": file_version("events.db"),
+            "DocumentKnowledgeBase": self.engine_key[2] if self.engine_key else None,
+        }
+
+    async def ask(self, prompt: str, on_token=None, on_tool_start=None, on_tool_end=None) -> dict:
+        """
+        Runs one turn. on_token(text_so_far), on_tool_start(name, tool_input)
+        and on_tool_end(name, seconds) report progress as in astream_agent.
+        Returns the answer with the tools used, whether it was routed or
+        cached, time to first token and total seconds, and the image jobs
+        queued during the turn.
+        """
+        engine = await asyncio.to_thread(self.current_engine)
+        engine.take_image_jobs()  # left over from a turn that failed
+        # A follow-up's answer depends on this conversation, so it is neither served nor stored
+        answer_cache = None if is_follow_up(prompt) else self.service.answer_cache
+        with trace_turn(self.session_id) as turn_span, self.index_in_use():
+            start_time = time.perf_counter()
+            versions = self.data_versions()
+            cached = await asyncio.to_thread(answer_cache.lookup, prompt, versions) if answer_cache else None
+
+            if cached:
+                output, tools = cached
+                # Keep the conversation history consistent with what the user saw
+                self.memory.save_context({"input": prompt}, {"output": output})
+                total = time.perf_counter() - start_time
+                turn = {"output": output, "tools": list(tools), "routed": None, "cached": True, "ttft": total, "total": total}
+            else:
+                tool_usage = ToolUsageRecorder()
+                callbacks = [tool_usage, self.tracing_handler]
+                route = engine.route(prompt)
+
+                # Clear-cut SQL, weather and event requests skip the agent's tool-picking call
+                if route:
+                    turn_span["routed"] = route.tool
+                    if on_tool_start:
+                        on_tool_start(route.tool, route.tool_input)
+                    output = await engine.arun_route(prompt, route, callbacks)
+                    result = {"output": output, "ttft": None, "total": time.perf_counter() - start_time}
+                    if on_tool_end:
+                        on_tool_end(route.tool, result["total"])
+                else:
+                    # Async tools let blocking I/O (HTTP, SQLite) overlap inside the turn
+                    result = await astream_agent(
+                        engine.agent_executor,
+                        {"input": prompt},
+                        config={"callbacks": callbacks},
+                        on_token=on_token,
+                        on_tool_start=on_tool_start,
+                        on_tool_end=on_tool_end,
+                    )
+                if answer_cache:
+                    await asyncio.to_thread(answer_cache.store, prompt, result["output"], tool_usage.tools,
+                                            result["total"], versions)
+                turn = {"output": result["output"], "tools": tool_usage.tools, "routed": route.tool if route else None,
+                        "cached": False, "ttft": result["ttft"] or result["total"], "total": result["total"]}
+
+            turn_span.update(cached=turn["cached"], ttft_ms=round(turn["ttft"] * 1000, 1))
+
+        self.turn_metrics.append({key: turn[key] for key in ("ttft", "total", "cached")})
+        turn["images"] = engine.take_image_jobs()
+        return turn
@@ -0,0 +1,136 @@
+import re
+from typing import NamedTuple
+from token_counter import count_tokens, truncate_tokens
+
+CONTEXT_TOKENS = 1000      # budget for the retrieved context in the answer prompt
+DUPLICATE_THRESHOLD = 0.8  # shingle containment above which a passage is a near-duplicate
+SHINGLE_WORDS = 5
+MAX_OVERLAP_CHARS = 400    # chunks overlap by at most CHUNK_OVERLAP (100) characters
+MIN_OVERLAP_CHARS = 10     # shorter suffix/prefix matches are coincidences
+MIN_SENTENCE_WORDS = 6     # shorter sentences (headings, "Yes.") are never dropped as repeats
+MIN_TAIL_TOKENS = 40       # a truncated last passage must keep at least this much
+TOKEN_MODEL = "gpt-4-turbo"
+
+
+class Passage(NamedTuple):
+    source: str
+    text: str
+    rank: int  # best (lowest) retrieval rank among its chunks
+
+
+def chunk_position(doc):
+    """(file key, chunk number) from knowledge_base's '<file key>#<n>' document IDs."""
+    key, _, number = (getattr(doc, "id", None) or "").rpartition("#")
+    return (key, int(number)) if number.isdigit() else (None, None)
+
+
+def overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of 'left' that 'right' starts with."""
+    for size in range(min(len(left), len(right), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_adjacent(docs) -> list:
+    """
+    Joins consecutive chunks of the same file into one passage, dropping the
+    text the splitter repeated between them. 'docs' is in retrieval order.
+    """
+    passages, by_key = [], {}
+    for rank, doc in enumerate(docs):
+        key, number = chunk_position(doc)
+        source = doc.metadata.get("source", "document")
+        if key is None:
+            passages.append(Passage(source, doc.page_content, rank))
+        else:
+            by_key.setdefault(key, []).append((number, rank, source, doc.page_content))
+
+    for chunks in by_key.values():
+        chunks.sort()
+        run_end, text, best, source = None, None, None, None
+        for number, rank, chunk_source, content in chunks:
+            if run_end is not None and number == run_end + 1:
+                shared = overlap(text, content)
+                text += content[shared:] if shared else "\n" + content
+                best = min(best, rank)
+            else:
+                if text is not None:
+                    passages.append(Passage(source, text, best))
+                text, best, source = content, rank, chunk_source
+            run_end = number
+        passages.append(Passage(source, text, best))
+
+    return sorted(passages, key=lambda passage: passage.rank)
+
+
+def shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def containment(a: set, b: set) -> float:
+    """Share of the smaller shingle set found in the other one (1.0 = one contains the other)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def split_sentences(text: str) -> list:
+    """(sentence, separator that follows it) pairs, so lines and paragraphs survive."""
+    pieces = re.split(r"((?<=[.!?])[ \t]+|\s*\n\s*)", text)
+    return [(pieces[i], pieces[i + 1] if i + 1 < len(pieces) else "") for i in range(0, len(pieces), 2)]
+
+
+def pack_context(docs, max_tokens: int = CONTEXT_TOKENS, threshold: float = DUPLICATE_THRESHOLD):
+    """
+    Builds the RAG prompt context from retrieved chunks (best first):
+    adjacent chunks of a file are merged without their overlap, passages
+    that are near-duplicates of a better-ranked one are dropped, sentences
+    already included elsewhere (shared boilerplate) are removed, and
+    passages are added in rank order until 'max_tokens' is reached.
+    Returns (context, stats).
+    """
+    passages = merge_adjacent(docs)
+    stats = {"chunks": len(docs), "passages": len(passages), "duplicates": 0, "repeated_sentences": 0,
+             "truncated": 0, "omitted": 0, "tokens": 0}
+
+    kept_shingles, seen_sentences, parts = [], set(), []
+    budget = max_tokens
+    for passage in passages:
+        passage_shingles = shingles(passage.text)
+        if any(containment(passage_shingles, other) >= threshold for other in kept_shingles):
+            stats["duplicates"] += 1
+            continue
+
+        sentences = []
+        for sentence, separator in split_sentences(passage.text):
+            normalized = " ".join(re.findall(r"\w+", sentence.lower()))
+            if len(normalized.split()) >= MIN_SENTENCE_WORDS and normalized in seen_sentences:
+                stats["repeated_sentences"] += 1
+                continue
+            seen_sentences.add(normalized)
+            sentences.append(sentence + separator)
+        text = "".join(sentences).strip()
+        if not text:
+            stats["duplicates"] += 1
+            continue
+
+        part = f"[{passage.source}]\n{text}"
+        tokens = count_tokens(part, TOKEN_MODEL)
+        if tokens > budget:
+            if budget < MIN_TAIL_TOKENS:
+                stats["omitted"] += 1
+                continue
+            part = truncate_tokens(part, budget, TOKEN_MODEL)
+            tokens = budget
+            stats["truncated"] += 1
+        parts.append(part)
+        kept_shingles.append(passage_shingles)
+        budget -= tokens
+
+    context = "\n\n".join(parts)
+    stats["tokens"] = max_tokens - budget
+    return context, stats
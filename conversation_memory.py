@@ -0,0 +1,156 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.prompts import PromptTemplate
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from pydantic import PrivateAttr
+from token_counter import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+MAX_TOKENS = 1500          # hard budget for the history sent with each prompt
+RECENT_TURNS = 4           # turns kept verbatim; older ones are summarized
+SUMMARY_TOKENS = 300       # budget for the running summary
+MAX_MESSAGE_TOKENS = 400   # longer messages (SQL dumps, documents) are cut to this
+MESSAGE_OVERHEAD = 4       # tokens the chat format adds per message
+TOKEN_MODEL = "gpt-4-turbo"
+
+SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["summary", "new_lines", "max_words"],
+    template=(
+        "Progressively summarize the conversation, adding the new lines to the previous summary. "
+        "Keep names, numbers and decisions the user may refer back to. Answer in at most {max_words} words.\n\n"
+        "Previous summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}\n\nNew summary:"
+    )
+)
+
+# Summaries are written off the request path, by a small pool shared by all sessions
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+
+class BudgetedMemory(BaseChatMemory):
+    """
+    Conversation memory with a hard token budget, for the agent and the RAG chain.
+    The last 'recent_turns' turns are kept verbatim (long messages cut to
+    'max_message_tokens'); older turns are folded into a running summary by
+    'llm' in a background thread, so save_context never waits on the LLM.
+    Without an llm, older turns are dropped. Whatever is loaded, the summary
+    plus the newest messages that fit, stays within 'max_tokens'.
+    """
+
+    memory_key: str = "chat_history"
+    llm: Optional[Any] = None
+    max_tokens: int = MAX_TOKENS
+    recent_turns: int = RECENT_TURNS
+    summary_tokens: int = SUMMARY_TOKENS
+    max_message_tokens: int = MAX_MESSAGE_TOKENS
+    summary: str = ""
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _pending: list = PrivateAttr(default_factory=list)  # older turns waiting for the summarizer
+    _future: Any = PrivateAttr(default=None)
+    _generation: int = PrivateAttr(default=0)  # bumped by clear(), so a late summary is discarded
+
+    @property
+    def memory_variables(self) -> list:
+        return [self.memory_key]
+
+    def compact(self, text: str) -> str:
+        tokens = count_tokens(text, TOKEN_MODEL)
+        if tokens <= self.max_message_tokens:
+            return text
+        kept = truncate_tokens(text, self.max_message_tokens, TOKEN_MODEL)
+        return f"{kept}\n[... {tokens - self.max_message_tokens} more tokens omitted from the history]"
+
+    def save_context(self, inputs: dict, outputs: dict) -> None:
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        with self._lock:
+            self.chat_memory.add_messages([
+                HumanMessage(content=self.compact(str(input_str))),
+                AIMessage(content=self.compact(str(output_str))),
+            ])
+            messages = self.chat_memory.messages
+            overflow = len(messages) - 2 * self.recent_turns
+            if overflow <= 0:
+                return
+            older, recent = messages[:overflow], messages[overflow:]
+            self.chat_memory.clear()
+            self.chat_memory.add_messages(recent)
+            if self.llm is None:
+                return
+            self._pending.extend(older)
+            if self._future is None:
+                self._future = _summary_pool.submit(self.summarize_pending)
+
+    async def asave_context(self, inputs: dict, outputs: dict) -> None:
+        self.save_context(inputs, outputs)
+
+    def summarize_pending(self):
+        """Folds the pending turns into the summary until none are left (runs in the pool)."""
+        while True:
+            with self._lock:
+                batch, summary, generation = list(self._pending), self.summary, self._generation
+                if not batch:
+                    self._future = None
+                    return
+            try:
+                prompt = SUMMARY_PROMPT.format(
+                    summary=summary or "(none)",
+                    new_lines=get_buffer_string(batch),
+                    max_words=int(self.summary_tokens * 0.7),
+                )
+                reply = self.llm.invoke(prompt)
+                summary = truncate_tokens(str(getattr(reply, "content", reply)).strip(), self.summary_tokens, TOKEN_MODEL)
+            except Exception as e:
+                logger.warning(f"Could not summarize {len(batch)} messages, dropping them: {e}")
+            with self._lock:
+                if generation == self._generation:
+                    self.summary = summary
+                    del self._pending[:len(batch)]
+
+    def wait_for_summary(self, timeout: float = None):
+        """Blocks until the background summary is up to date."""
+        future = self._future
+        if future is not None:
+            future.result(timeout)
+
+    def history(self) -> list:
+        """The summary and the newest messages that fit in max_tokens, oldest first."""
+        with self._lock:
+            # Turns still waiting for the summarizer are shown verbatim while they fit
+            messages = self._pending + self.chat_memory.messages
+            summary = self.summary
+
+        budget = self.max_tokens
+        head = []
+        if summary:
+            head = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")]
+            budget -= count_tokens(head[0].content, TOKEN_MODEL) + MESSAGE_OVERHEAD
+
+        kept = []
+        for message in reversed(messages):
+            cost = count_tokens(message.content, TOKEN_MODEL) + MESSAGE_OVERHEAD
+            if cost > budget:
+                break
+            kept.append(message)
+            budget -= cost
+        kept.reverse()
+        # Never start the window with an answer whose question was cut
+        if kept and isinstance(kept[0], AIMessage):
+            kept = kept[1:]
+        return head + kept
+
+    def load_memory_variables(self, inputs: dict) -> dict:
+        messages = self.history()
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: get_buffer_string(messages)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.chat_memory.clear()
+            self._pending.clear()
+            self.summary = ""
+            self._generation += 1
@@ -0,0 +1,74 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from langchain_core.documents import Document
+
+# Parser processes are shared by every session and kept warm between uploads,
+# so unstructured is only imported once per worker. They are spawned, not
+# forked: the app process runs threads (Streamlit, the embedding pool) and a
+# forked child could inherit a lock held by one of them.
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def parse_file(name: str, data: bytes) -> str:
+    """
+    Parses one file from its raw bytes with unstructured.
+    Runs inside a worker process; returns the text joined the same way as
+    UnstructuredFileLoader's default "single" mode.
+    """
+    from unstructured.partition.auto import partition
+
+    elements = partition(file=io.BytesIO(data), metadata_filename=name)
+    return "\n\n".join(str(element) for element in elements)
+
+
+def get_pool(max_workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = max_workers
+        return _pool
+
+
+def to_documents(name: str, text: str):
+    return [Document(page_content=text, metadata={"source": name})]
+
+
+def parse_files(files, max_workers: int = None, parse=parse_file):
+    """
+    Parses uploaded files in parallel straight from their in-memory bytes.
+    Yields (file, documents) as each file finishes, so callers can split and
+    embed early files while later ones are still being parsed.
+    Files only need 'name' and 'getvalue()', like Streamlit's UploadedFile.
+    """
+    if max_workers is None:
+        max_workers = default_workers()
+
+    # Not worth the inter-process round-trip for a single file
+    if max_workers == 1 or len(files) == 1:
+        for file in files:
+            yield file, to_documents(file.name, parse(file.name, file.getvalue()))
+        return
+
+    pool = get_pool(max_workers)
+    futures = {pool.submit(parse, file.name, file.getvalue()): file for file in files}
+    try:
+        for future in as_completed(futures):
+            file = futures[future]
+            yield file, to_documents(file.name, future.result())
+    finally:
+        # Stop any queued work if the caller bailed out early
+        for future in futures:
+            future.cancel()
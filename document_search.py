@@ -0,0 +1,134 @@
+import logging
+import threading
+from collections import OrderedDict
+from context_packing import CONTEXT_TOKENS, DUPLICATE_THRESHOLD, pack_context
+from tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_OPTIONS = {
+    "mode": "single-pass",   # single-pass | conversational (ConversationalRetrievalChain)
+    "k": 4,                  # chunks passed to the answer prompt
+    "search_type": "similarity",  # similarity | mmr
+    "fetch_k": 20,           # MMR candidates re-ranked for diversity
+    "lambda_mult": 0.5,      # MMR: 1 = pure relevance, 0 = pure diversity
+    "context_tokens": CONTEXT_TOKENS,  # budget for the packed context (see context_packing.py)
+    "duplicate_threshold": DUPLICATE_THRESHOLD,
+}
+
+QUERY_CACHE_SIZE = 512    # query embeddings, per embedding model
+RESULT_CACHE_SIZE = 1024  # retrieval results, per index version and search settings
+
+
+def search_options(options=None) -> dict:
+    merged = dict(DEFAULT_SEARCH_OPTIONS)
+    merged.update(options or {})
+    return merged
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class LRUCache:
+    """A small thread-safe LRU mapping with hit/miss counts."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+def query_model_name(embeddings) -> str:
+    """
+    The model behind 'embeddings', which key the query vector cache. Indexes
+    wrap their embedder in CacheBackedEmbeddings, so the wrapped one is used.
+    """
+    embeddings = getattr(embeddings, "underlying_embeddings", embeddings)
+    # Same rule as knowledge_base.embedding_model_name, without importing FAISS here
+    return getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or type(embeddings).__name__
+
+
+# Shared by every session, so a question one user asked is free for the next
+_query_vectors = LRUCache(QUERY_CACHE_SIZE)
+_results = LRUCache(RESULT_CACHE_SIZE)
+
+
+class DocumentSearch:
+    """
+    Retrieval for the single-pass RAG tool. The agent has already turned the
+    user's message into a standalone query, so the query is embedded as-is
+    (no condensing LLM call). Query embeddings are cached per embedding
+    model and results per index version, so a new upload never serves
+    stale chunks.
+    """
+
+    def __init__(self, vectorstore, version: str = None, options=None):
+        self.vectorstore = vectorstore
+        self.version = version or f"id:{id(vectorstore)}"
+        self.options = search_options(options)
+        self.model = query_model_name(vectorstore.embeddings)
+
+    def embed(self, query: str):
+        key = (self.model, query)
+        vector = _query_vectors.get(key)
+        if vector is None:
+            vector = self.vectorstore.embeddings.embed_query(query)
+            _query_vectors.put(key, vector)
+        return vector
+
+    def retrieve(self, query: str):
+        options = self.options
+        vector = self.embed(query)
+        if options["search_type"] == "mmr":
+            return self.vectorstore.max_marginal_relevance_search_by_vector(
+                vector, k=options["k"], fetch_k=options["fetch_k"], lambda_mult=options["lambda_mult"]
+            )
+        return self.vectorstore.similarity_search_by_vector(vector, k=options["k"])
+
+    def search(self, query: str):
+        """The k chunks for 'query' (similarity or MMR), from the cache when possible."""
+        query = normalize_query(query)
+        options = self.options
+        key = (self.version, query, options["search_type"], options["k"], options["fetch_k"], options["lambda_mult"])
+        with get_tracer().span("retriever", "documents", k=options["k"], search_type=options["search_type"]) as span:
+            docs = _results.get(key)
+            span["cache"] = "hit" if docs is not None else "miss"
+            if docs is None:
+                docs = self.retrieve(query)
+                _results.put(key, docs)
+            span["documents"] = len(docs)
+        return docs
+
+    def context(self, query: str) -> str:
+        """The answer prompt's context for 'query': retrieved chunks, deduplicated and packed to budget."""
+        docs = self.search(query)
+        with get_tracer().span("retriever", "packing") as span:
+            context, stats = pack_context(docs, self.options["context_tokens"], self.options["duplicate_threshold"])
+            span.update(stats)
+        return context
+
+
+def cache_stats() -> dict:
+    return {
+        "query_hits": _query_vectors.hits, "query_misses": _query_vectors.misses,
+        "result_hits": _results.hits, "result_misses": _results.misses,
+    }
@@ -0,0 +1,166 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from token_counter import count_tokens
+from tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+# OpenAI accepts up to 2048 inputs / 300k tokens per embeddings request; smaller
+# batches keep several requests in flight instead of one huge one
+MAX_BATCH_TOKENS = 50_000
+MAX_BATCH_SIZE = 1000
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 8
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+# Failures worth retrying besides 429s: server errors, timeouts and dropped connections
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "InternalServerError",
+                    "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError"}
+
+
+def is_rate_limit_error(e) -> bool:
+    return getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError"
+
+
+def is_transient_error(e) -> bool:
+    """Errors a retry may fix; the OpenAI client's own retries are off (max_retries=0)."""
+    return (getattr(e, "status_code", None) in TRANSIENT_STATUS_CODES
+            or type(e).__name__ in TRANSIENT_ERRORS
+            or isinstance(e, (ConnectionError, TimeoutError)))
+
+
+def retry_after(e):
+    """Seconds from a 429's Retry-After header, if the server sent one."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Wraps an embedder for bulk ingestion.
+    Texts are packed into batches by token count, batches are sent with a
+    bounded number of requests in flight, and the in-flight limit adapts to
+    rate limiting: it halves on every 429 and grows back by one after a run of
+    successful requests (AIMD), so ingestion settles just under the limit.
+    Server errors, timeouts and connection resets are retried with the same
+    backoff but leave the limit alone.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+        self.stats = {"requests": 0, "texts": 0, "tokens": 0, "rate_limited": 0, "transient_errors": 0}
+
+    @property
+    def model(self):
+        # Lets the embedding cache namespace by the underlying model
+        return getattr(self.embeddings, "model", None) or getattr(self.embeddings, "model_name", None)
+
+    def make_batches(self, texts):
+        """Groups text indexes into batches under the token and size limits."""
+        batches, batch, batch_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            tokens = count_tokens(text, self.model)
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                batches.append((batch, batch_tokens))
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            batches.append((batch, batch_tokens))
+        return batches
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, rate_limited: bool):
+        with self.condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+                self.stats["rate_limited"] += 1
+            elif self.limit < self.max_concurrency:
+                self.successes += 1
+                if self.successes >= self.limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+    def call_with_backoff(self, fn, *args):
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            rate_limited = False
+            try:
+                result = fn(*args)
+                with self.condition:
+                    self.stats["requests"] += 1
+                return result
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                if not (rate_limited or is_transient_error(e)) or attempt == self.max_retries:
+                    raise
+                if not rate_limited:
+                    with self.condition:
+                        self.stats["transient_errors"] += 1
+                delay = retry_after(e) or random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+                reason = "rate limited" if rate_limited else f"failed ({type(e).__name__})"
+            finally:
+                self.release(rate_limited)
+
+            logger.warning(f"Embedding request {reason}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def embed_batch(self, texts, tokens):
+        with get_tracer().span("http", "embeddings", model=self.model, inputs=len(texts), tokens=tokens):
+            vectors = self.call_with_backoff(self.embeddings.embed_documents, texts)
+        with self.condition:
+            self.stats["texts"] += len(texts)
+            self.stats["tokens"] += tokens
+        return vectors
+
+    def embed_documents(self, texts):
+        # Each batch runs in a copy of the caller's context, so its span keeps the session
+        futures = [
+            self.pool.submit(contextvars.copy_context().run, self.embed_batch, [texts[i] for i in batch], tokens)
+            for batch, tokens in self.make_batches(texts)
+        ]
+
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_query(self, text):
+        return self.call_with_backoff(self.embeddings.embed_query, text)
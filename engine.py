@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import requests
+from langchain_openai import ChatOpenAI
+from langchain.chains import ConversationalRetrievalChain, LLMChain
+from langchain.memory import ReadOnlySharedMemory
+from langchain.prompts import PromptTemplate, ChatPromptTemplate
+
+# Import Agent and Tool components
+from langchain.agents import AgentExecutor, Tool, create_openai_functions_agent
+from langchain_community.tools.ddg_search import DuckDuckGoSearchRun
+from langchain_core.messages import SystemMessage
+
+# Import custom agents
+from sql_agent import company_names_known, query_agent, aquery_agent
+from recommender_system import run_event_recommender, arun_event_recommender
+from weather_client import get_weather_client
+from agent_stream import AGENT_LLM_TAG
+from document_search import DocumentSearch, search_options
+from image_jobs import IMAGE_API_URL, get_image_queue, get_images_client
+from intent_router import IntentRouter
+
+logger = logging.getLogger(__name__)
+
+# Prompts are static, so they are built once at import time
+IMAGE_PROMPT_TEMPLATE = PromptTemplate(
+    input_variables=["image_desc"],
+    template=(
+        "You are a helpful prompt-engineering assistant. A user wants to generate an image based on this description: '{image_desc}'. "
+        "Generate a highly detailed, vivid, and specific prompt for the DALL-E 3 image generation model."
+    )
+)
+
+SYSTEM_PROMPT = SystemMessage(
+    content=(
+        "You are a helpful, multi-function assistant. You must follow this priority list for every user query:\n\n"
+
+        "1.  **Check for Document Question:** Is the user asking a specific question *about* their uploaded documents? "
+        "If YES, you MUST use the `DocumentKnowledgeBase` tool.\n"
+
+        "2.  **Check for Database Question:** Is the user asking about *employees, departments, salaries or budgets*? "
+        "If YES, you MUST use the `DatabaseQuery` tool.\n"
+
+        "3.  **Check for Event Recommendation:** Is the user asking for event recommendations, 'what to do' or 'things to do' for **today**? "
+        "If YES, you MUST use the `EventRecommender` tool.\n"
+
+        "4.  **Check for *only* Weather:** Is the user asking *just* for the current weather? "
+        "If YES, you MUST use the `CurrentWeather` tool.\n"
+
+        "5.  **Check for Image Request:** Is the user asking to create or draw an image? "
+        "If YES, you MUST use the `ImageGenerator` tool.\n"
+
+        "6.  **General Knowledge (Fallback):** If the request is a general question NOT covered by any other tool, "
+        "you MUST use the `DuckDuckGoSearch` tool.\n"
+
+        "7.  **No Tool:** If you can answer without any tools (like 'hello'), do so directly."
+    )
+)
+
+# Single-pass RAG answer prompt (the "stuff" prompt ConversationalRetrievalChain uses)
+RAG_ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Use the following pieces of context to answer the user's question.\n"
+     "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n"
+     "----------------\n{context}"),
+    ("human", "{question}")
+])
+
+AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    SYSTEM_PROMPT,
+    ("placeholder", "{chat_history}"),
+    ("human", "{input}"),
+    ("placeholder", "{agent_scratchpad}")
+])
+
+
+class AgentEngine:
+    """
+    The LLM, chains, tools and agent executor for one chat.
+    Building these is the expensive part of a Streamlit rerun, so the app
+    builds an engine once per (API keys, knowledge base version) and reuses
+    it. 'progress' receives the tools' status messages (st.write in the app).
+    'rag_options' configures document search (see document_search.py);
+    'index_version' keys its caches. Images are drawn in the background
+    by 'image_queue' (see image_jobs.py) through the Images API at
+    'image_api_url'.
+    """
+
+    def __init__(self, openai_api_key: str, weather_api_key: str, memory, vectorstore=None, progress=print,
+                 rag_options=None, index_version: str = None, image_queue=None, image_api_url: str = IMAGE_API_URL):
+        self.weather_api_key = weather_api_key
+        self.memory = memory
+        self.progress = progress
+        self.image_queue = image_queue
+        self.images_client = get_images_client(openai_api_key, image_api_url)
+        self.image_jobs = []  # jobs queued during the current turn (see take_image_jobs)
+
+        # Initialize LLM
+        self.llm = ChatOpenAI(model_name="gpt-4-turbo", temperature=0.1, api_key=openai_api_key)
+
+        # Document questions. Single-pass (the default) embeds the agent's query
+        # directly and answers in one LLM call. Conversational mode first
+        # condenses the question with the chat history, costing another call.
+        self.rag_options = search_options(rag_options)
+        self.rag_chain = None
+        self.document_search = None
+        self.rag_answer_chain = RAG_ANSWER_PROMPT | self.llm
+        if vectorstore and self.rag_options["mode"] == "single-pass":
+            self.document_search = DocumentSearch(vectorstore, index_version, self.rag_options)
+        elif vectorstore:
+            # Reads the shared history but leaves saving the turn to the agent,
+            # so a document question isn't stored twice
+            search_kwargs = {"k": self.rag_options["k"]}
+            if self.rag_options["search_type"] == "mmr":
+                search_kwargs.update(fetch_k=self.rag_options["fetch_k"], lambda_mult=self.rag_options["lambda_mult"])
+            self.rag_chain = ConversationalRetrievalChain.from_llm(
+                llm=self.llm,
+                retriever=vectorstore.as_retriever(search_type=self.rag_options["search_type"], search_kwargs=search_kwargs),
+                memory=ReadOnlySharedMemory(memory=memory)
+            )
+
+        self.prompt_engineering_chain = LLMChain(llm=self.llm, prompt=IMAGE_PROMPT_TEMPLATE)
+        self.tools = self.build_tools()
+        self.router = IntentRouter(self.tools, known_names=company_names_known)
+
+        # Tagged so only the agent's own tokens are streamed to the chat
+        agent = create_openai_functions_agent(self.llm.with_config(tags=[AGENT_LLM_TAG]), self.tools, AGENT_PROMPT)
+        self.agent_executor = AgentExecutor(
+            agent=agent,
+            tools=self.tools,
+            memory=memory,
+            handle_parsing_errors=True
+        )
+
+    @property
+    def has_documents(self) -> bool:
+        return self.document_search is not None or self.rag_chain is not None
+
+    # Direct dispatch for clear-cut requests (no agent round-trip)
+    def route(self, query: str):
+        """The router's tool call for 'query', or None if the agent should handle it."""
+        return self.router.route(query)
+
+    def run_route(self, query: str, route, callbacks=None) -> str:
+        """Runs a routed tool and records the exchange in memory, as the agent would."""
+        logger.info(f"Router sent the request to {route.tool} ({route.reason}, {route.confidence:.2f})")
+        tool = next(tool for tool in self.tools if tool.name == route.tool)
+        output = tool.invoke(route.tool_input, config={"callbacks": callbacks})
+        self.memory.save_context({"input": query}, {"output": output})
+        return output
+
+    async def arun_route(self, query: str, route, callbacks=None) -> str:
+        """Async version of run_route."""
+        logger.info(f"Router sent the request to {route.tool} ({route.reason}, {route.confidence:.2f})")
+        tool = next(tool for tool in self.tools if tool.name == route.tool)
+        output = await tool.ainvoke(route.tool_input, config={"callbacks": callbacks})
+        self.memory.save_context({"input": query}, {"output": output})
+        return output
+
+    # Tool Function 1: RAG
+    def check_rag_answer(self, query: str, answer: str) -> str:
+        if not answer or "don't know" in answer.lower() or "no information" in answer.lower():
+             logger.info("RAG Tool found no relevant documents.")
+             return f"The documents do not contain specific information about: '{query}'. Tell the user you couldn't find the answer in their files."
+
+        logger.info("RAG Tool SUCCESS, returning answer.")
+        return answer
+
+    def run_rag_chain(self, query: str) -> str:
+        """Runs the RAG chain for document questions."""
+        self.progress(f"🧠 *Querying knowledge base for: '{query}'*")
+        logger.info(f"RAG TOOL CALLED with query: {query}")
+
+        if not self.has_documents:
+            logger.warning("RAG Tool FAILED: rag_chain not initialized.")
+            return "Error: The document knowledge base is not initialized. Please tell the user to upload documents first."
+
+        try:
+            if self.document_search:
+                context = self.document_search.context(query)
+                response = self.rag_answer_chain.invoke({"context": context, "question": query})
+                return self.check_rag_answer(query, response.content)
+            response = self.rag_chain.invoke({"question": query})
+            return self.check_rag_answer(query, response.get("answer"))
+        except Exception as e:
+            logger.warning(f"RAG Tool FAILED: {e}")
+            return f"Error occurred while searching documents: {e}"
+
+    async def arun_rag_chain(self, query: str) -> str:
+        """Async version of run_rag_chain."""
+        self.progress(f"🧠 *Querying knowledge base for: '{query}'*")
+        logger.info(f"RAG TOOL CALLED with query: {query}")
+
+        if not self.has_documents:
+            logger.warning("RAG Tool FAILED: rag_chain not initialized.")
+            return "Error: The document knowledge base is not initialized. Please tell the user to upload documents first."
+
+        try:
+            if self.document_search:
+                context = await asyncio.to_thread(self.document_search.context, query)
+                response = await self.rag_answer_chain.ainvoke({"context": context, "question": query})
+                return self.check_rag_answer(query, response.content)
+            response = await self.rag_chain.ainvoke({"question": query})
+            return self.check_rag_answer(query, response.get("answer"))
+        except Exception as e:
+            logger.warning(f"RAG Tool FAILED: {e}")
+            return f"Error occurred while searching documents: {e}"
+
+    # Tool Function 2: Image Generation
+    def engineer_image_prompt(self, description: str) -> str:
+        return self.prompt_engineering_chain.invoke({"image_desc": description})["text"]
+
+    def generate_engineered_image(self, prompt: str) -> str:
+        """Queues the image and returns at once; the app shows it when the job finishes."""
+        queue = self.image_queue or get_image_queue()
+        job = queue.submit(prompt, self.engineer_image_prompt, self.images_client)
+        self.image_jobs.append(job)
+        if job.status == "done":
+            self.progress("✅ Image ready (drawn before)")
+            return f"The image of '{prompt}' is ready and is shown below your answer. Do not include a link to it."
+        self.progress(f"🎨 *Drawing in the background (job {job.id})...*")
+        return (f"The image of '{prompt}' is being drawn in the background and will appear below your answer "
+                "when it is ready. Do not include a link to it.")
+
+    async def agenerate_engineered_image(self, prompt: str) -> str:
+        """Async version of generate_engineered_image (queuing doesn't wait on the network)."""
+        return self.generate_engineered_image(prompt)
+
+    def take_image_jobs(self) -> list:
+        """The image jobs queued since the last call, for the app to show with the answer."""
+        jobs, self.image_jobs = self.image_jobs, []
+        return jobs
+
+    # Tool Function 3: Simple Weather
+    def weather_report(self, location: str) -> str:
+        """Fetches and formats the current weather (no progress calls, so it can run in a worker thread)."""
+        try:
+            data = get_weather_client(self.weather_api_key).get_current(location)
+
+            loc_name = data['location']['name']
+            region = data['location']['region']
+            country = data['location']['country']
+            temp_c = data['current']['temp_c']
+            temp_f = data['current']['temp_f']
+            condition = data['current']['condition']['text']
+
+            result = (
+                f"Current weather in {loc_name}, {region}, {country}: "
+                f"{temp_c}°C / {temp_f}°F, {condition}."
+            )
+            logger.info(f"Weather Tool SUCCESS: {result}")
+            return result
+
+        except requests.exceptions.HTTPError as http_err:
+            logger.warning(f"Weather Tool HTTP Error: {http_err}")
+            try:
+                error_msg = http_err.response.json()['error']['message']
+                return f"Error getting weather: {error_msg}"
+            except Exception:
+                return f"Error getting weather: HTTP {http_err.response.status_code}"
+        except Exception as e:
+            logger.warning(f"Weather Tool FAILED: {e}")
+            return f"An error occurred while trying to get the weather: {e}"
+
+    def get_current_weather(self, location: str) -> str:
+        """Gets the *current* weather for a location using weatherapi.com."""
+        self.progress(f"🌦️ *Checking weather for: '{location}'*")
+        logger.info(f"Weather Tool CALLED with location: {location}")
+        return self.weather_report(location)
+
+    async def aget_current_weather(self, location: str) -> str:
+        """Async version of get_current_weather."""
+        self.progress(f"🌦️ *Checking weather for: '{location}'*")
+        logger.info(f"Weather Tool CALLED with location: {location}")
+        return await asyncio.to_thread(self.weather_report, location)
+
+    def build_tools(self):
+        # Initialize Tools List
+        tools = []
+
+        # Tool 1: RAG
+        if self.has_documents:
+            tools.append(
+                Tool(
+                    name="DocumentKnowledgeBase",
+                    func=self.run_rag_chain,
+                    coroutine=self.arun_rag_chain,
+                    description=(
+                        "Use this tool ONLY for questions about the user's **uploaded files** (PDFs, TXT, DOCX). "
+                        "This is for querying **unstructured text**. "
+                        "This tool has access to the user's private files."
+                    )
+                )
+            )
+
+        # Tool 2: SQL Database
+        tools.append(
+            Tool(
+                name="DatabaseQuery",
+                # Use a lambda function to pass the 'llm' object to your agent
+                func=lambda q: query_agent(question=q, llm=self.llm),
+                coroutine=lambda q: aquery_agent(question=q, llm=self.llm),
+                description=(
+                    "Use this tool ONLY for questions about employees, departments, salaries, or budgets. "
+                    "Examples: 'Who has the highest salary?', 'What is the budget for the Engineering department?'"
+                )
+            )
+        )
+
+        # Tool 3: Event Recommender
+        tools.append(
+            Tool(
+                name="EventRecommender",
+                # Use a lambda to pass all required arguments
+                func=lambda location: run_event_recommender(
+                    location=location,
+                    llm=self.llm,
+                    weather_key=self.weather_api_key
+                ),
+                coroutine=lambda location: arun_event_recommender(
+                    location=location,
+                    llm=self.llm,
+                    weather_key=self.weather_api_key
+                ),
+                description=(
+                    "Use this tool ONLY when the user asks for event recommendations, "
+                    "'what to do', or 'things to do' for **today**. "
+                    "This tool will find events from a database and check the weather. "
+                    "The input must be a location (e.g., 'Singapore')."
+                )
+            )
+        )
+
+        # Tool 4: Simple Weather
+        tools.append(
+            Tool(
+                name="CurrentWeather",
+                func=self.get_current_weather,
+                coroutine=self.aget_current_weather,
+                description=(
+                    "Use this tool ONLY when the user asks *just* for the current weather, "
+                    "weather forecast, or temperature for a specific location. "
+                    "Do NOT use this if they are also asking for event recommendations."
+                )
+            )
+        )
+
+        # Tool 5: Image Generation
+        tools.append(
+            Tool(
+                name="ImageGenerator",
+                func=self.generate_engineered_image,
+                coroutine=self.agenerate_engineered_image,
+                description="Use this tool ONLY when a user explicitly asks to create, draw, generate, show an image, picture or drawing."
+            )
+        )
+
+        # Tool 6: General Search for anything else (BaseTool runs it in a thread when awaited)
+        tools.append(DuckDuckGoSearchRun())
+
+        return tools
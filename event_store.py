@@ -0,0 +1,111 @@
+import logging
+import sqlite3
+import threading
+from sql_executor import get_executor
+
+logger = logging.getLogger(__name__)
+
+EVENTS_DB = "events.db"
+DEFAULT_CITY = "Singapore"  # the city of the original sample events
+MAX_EVENTS = 200            # events handed to the recommender per query
+
+EVENT_COLUMNS = "id, name, type, description, location, date, city"
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        type TEXT,  -- 'indoor' or 'outdoor'
+        description TEXT,
+        location TEXT,  -- venue
+        date TEXT,  -- YYYY-MM-DD
+        city TEXT COLLATE NOCASE
+    )
+    """,
+    # City first: the recommender always filters on one city and a date (range)
+    "CREATE INDEX IF NOT EXISTS idx_events_city_date_type ON events(city, date, type)",
+    # For date queries across all cities
+    "CREATE INDEX IF NOT EXISTS idx_events_date_type ON events(date, type)",
+]
+
+
+def city_of(location: str) -> str:
+    """'Singapore, SG' and ' singapore' both mean the city 'singapore'."""
+    return " ".join(location.split(",")[0].split())
+
+
+def ensure_schema(path: str = EVENTS_DB):
+    """
+    Creates the events table and its indexes, and upgrades databases made
+    by older versions of setup_events_db.py, which had no city column.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(SCHEMA[0])
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+        if "city" not in columns:
+            logger.info(f"Adding a city column to {path}")
+            conn.execute("ALTER TABLE events ADD COLUMN city TEXT COLLATE NOCASE")
+            conn.execute("UPDATE events SET city = ?", (DEFAULT_CITY,))
+        for statement in SCHEMA[1:]:
+            conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def insert_events(conn, events):
+    """events: (name, type, description, location, date, city) tuples."""
+    conn.executemany(
+        "INSERT INTO events (name, type, description, location, date, city) VALUES (?, ?, ?, ?, ?, ?)",
+        events,
+    )
+
+
+class EventStore:
+    """
+    Read side of events.db for the recommender. Queries go through the
+    pooled read-only executor and are served by the (city, date, type)
+    index, so their cost depends on the events matched, not the table size.
+    """
+
+    def __init__(self, path: str = EVENTS_DB):
+        self.path = path
+        ensure_schema(path)
+        self.executor = get_executor(path)
+
+    def find(self, date: str, end_date: str = None, location: str = None, event_type: str = None,
+             limit: int = MAX_EVENTS):
+        """
+        Events on 'date', or from 'date' to 'end_date' inclusive, optionally
+        limited to a city and an event type ('indoor'/'outdoor').
+        """
+        sql = f"SELECT {EVENT_COLUMNS} FROM events WHERE "
+        conditions, params = [], []
+        if location:
+            conditions.append("city = ?")
+            params.append(city_of(location))
+        if end_date:
+            conditions.append("date BETWEEN ? AND ?")
+            params += [date, end_date]
+        else:
+            conditions.append("date = ?")
+            params.append(date)
+        if event_type:
+            conditions.append("type = ?")
+            params.append(event_type)
+        sql += " AND ".join(conditions) + " ORDER BY date, id LIMIT ?"
+        params.append(limit)
+        return self.executor.execute(sql, params)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_event_store(path: str = EVENTS_DB) -> EventStore:
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = EventStore(path)
+        return _stores[path]
@@ -0,0 +1,268 @@
+import base64
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import requests
+from requests.adapters import HTTPAdapter
+from tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = ".image_cache"  # content-addressed image files and images.db
+IMAGE_API_URL = "https://api.openai.com/v1/images/generations"
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+IMAGE_WORKERS = 2           # concurrent image jobs per process
+MAX_JOBS = 500              # finished jobs remembered for the chat history
+TIMEOUT = (3.05, 120)       # (connect, read) seconds; DALL-E 3 takes 10-30s
+
+CONTENT_TYPES = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+
+
+def normalize_description(description: str) -> str:
+    """'A  red Fox.' and 'a red fox' share one engineered prompt."""
+    return " ".join(description.lower().split()).rstrip(".!? ")
+
+
+class ImageStore:
+    """
+    Generated images on disk, named by the SHA-256 of their bytes, plus two
+    lookups in images.db: engineered prompt per normalized description, and
+    image per (model, size, prompt). A repeated request, or a chat history
+    shown again, is served from local files with no LLM or image API call.
+    """
+
+    def __init__(self, root: str = IMAGE_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.db_path = os.path.join(root, "images.db")
+        with closing(self.connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS prompts (description TEXT PRIMARY KEY, prompt TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS images (key TEXT PRIMARY KEY, digest TEXT, suffix TEXT)")
+
+    def connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def path(self, digest: str, suffix: str = ".png") -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + suffix)
+
+    def cached_prompt(self, description: str):
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT prompt FROM prompts WHERE description = ?",
+                               (normalize_description(description),)).fetchone()
+        return row[0] if row else None
+
+    def save_prompt(self, description: str, prompt: str):
+        with closing(self.connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO prompts VALUES (?, ?)", (normalize_description(description), prompt))
+
+    def cached_image(self, key: str):
+        """Path of the image stored for 'key', if its file is still there."""
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT digest, suffix FROM images WHERE key = ?", (key,)).fetchone()
+        if row and os.path.exists(self.path(*row)):
+            return self.path(*row)
+        return None
+
+    def save_image(self, key: str, data: bytes, suffix: str = ".png") -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest, suffix)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?)", (key, digest, suffix))
+        return path
+
+
+class ImagesClient:
+    """
+    OpenAI Images API client: one generation request, then a download of the
+    returned URL (or decoding of b64_json), over a pooled keep-alive session.
+    'base_url' can point at a stub (see benchmarks/fake_image_server.py).
+    """
+
+    def __init__(self, api_key: str, base_url: str = IMAGE_API_URL, model: str = IMAGE_MODEL,
+                 size: str = IMAGE_SIZE, timeout=TIMEOUT):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.size = size
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=IMAGE_WORKERS * 2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def cache_key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{self.size}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def generate(self, prompt: str):
+        """Returns (image bytes, file suffix). Raises requests exceptions on failure."""
+        payload = {"model": self.model, "prompt": prompt, "size": self.size, "n": 1}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        with get_tracer().span("http", "images", model=self.model) as span:
+            response = self.session.post(self.base_url, json=payload, headers=headers, timeout=self.timeout)
+            span["status_code"] = response.status_code
+            response.raise_for_status()
+            image = response.json()["data"][0]
+
+        if image.get("b64_json"):
+            return base64.b64decode(image["b64_json"]), ".png"
+        # Generated URLs expire after about an hour, so the bytes are kept instead
+        with get_tracer().span("http", "image-download") as span:
+            response = self.session.get(image["url"], timeout=self.timeout)
+            span["status_code"] = response.status_code
+            response.raise_for_status()
+            span["bytes"] = len(response.content)
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+        return response.content, CONTENT_TYPES.get(content_type, ".png")
+
+
+class ImageJob:
+    """One image request. 'status' is queued, running, done or error."""
+
+    def __init__(self, description: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.description = description
+        self.status = "queued"
+        self.prompt = None
+        self.path = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def finish(self, status: str, path: str = None, error: str = None):
+        self.status, self.path, self.error = status, path, error
+        self.finished = time.time()
+        self.done.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.done.wait(timeout)
+
+
+class ImageJobQueue:
+    """
+    Runs image requests on a small worker pool so the chat turn that asked
+    for one returns at once. A job engineers the prompt (cached per
+    description), generates the image (cached per prompt) and saves it to
+    the ImageStore. Concurrent requests for the same description share a
+    job; already-stored images finish without being queued.
+    """
+
+    def __init__(self, store: ImageStore = None, max_workers: int = IMAGE_WORKERS):
+        self.store = store or ImageStore()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-job")
+        self.jobs = OrderedDict()  # job id -> ImageJob, oldest first
+        self.active = {}           # normalized description -> unfinished ImageJob
+        self.lock = threading.Lock()
+        self.stats = {"submitted": 0, "coalesced": 0, "cached": 0, "prompt_hits": 0,
+                      "prompts": 0, "generations": 0, "errors": 0}
+
+    def submit(self, description: str, engineer, client: ImagesClient) -> ImageJob:
+        """
+        Queues an image for 'description'. 'engineer' turns the description
+        into the detailed image prompt (an LLM call); 'client' renders it.
+        """
+        key = normalize_description(description)
+        with self.lock:
+            self.stats["submitted"] += 1
+            job = self.active.get(key)
+            if job is not None:
+                self.stats["coalesced"] += 1
+                return job
+            job = ImageJob(description)
+            self.remember(job)
+            self.active[key] = job
+
+        prompt = self.store.cached_prompt(description)
+        path = prompt and self.store.cached_image(client.cache_key(prompt))
+        if path:
+            job.prompt = prompt
+            with self.lock:
+                self.stats["cached"] += 1
+                del self.active[key]
+            job.finish("done", path)
+        else:
+            self.pool.submit(self.run, job, key, engineer, client)
+        return job
+
+    def run(self, job: ImageJob, key: str, engineer, client: ImagesClient):
+        job.status = "running"
+        try:
+            with get_tracer().span("tool", "ImageJob", job=job.id) as span:
+                job.prompt = self.store.cached_prompt(job.description)
+                if job.prompt is None:
+                    job.prompt = engineer(job.description)
+                    self.store.save_prompt(job.description, job.prompt)
+                    self.count("prompts")
+                else:
+                    self.count("prompt_hits")
+
+                cache_key = client.cache_key(job.prompt)
+                path = self.store.cached_image(cache_key)
+                span["cache"] = "hit" if path else "miss"
+                if path is None:
+                    data, suffix = client.generate(job.prompt)
+                    path = self.store.save_image(cache_key, data, suffix)
+                    self.count("generations")
+            logger.info(f"Image job {job.id} finished: {path}")
+            job.finish("done", path)
+        except Exception as e:
+            logger.warning(f"Image job {job.id} FAILED: {e}")
+            self.count("errors")
+            job.finish("error", error=str(e))
+        finally:
+            with self.lock:
+                self.active.pop(key, None)
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def remember(self, job: ImageJob):
+        """Adds a job, forgetting the oldest finished ones past MAX_JOBS (caller holds the lock)."""
+        self.jobs[job.id] = job
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= MAX_JOBS:
+                break
+            if self.jobs[job_id].done.is_set():
+                del self.jobs[job_id]
+
+    def count(self, stat: str):
+        with self.lock:
+            self.stats[stat] += 1
+
+
+_queue = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_image_queue() -> ImageJobQueue:
+    """Returns the process-wide job queue."""
+    global _queue
+    with _lock:
+        if _queue is None:
+            _queue = ImageJobQueue()
+        return _queue
+
+
+def get_images_client(api_key: str, base_url: str = IMAGE_API_URL) -> ImagesClient:
+    """Returns the process-wide client for an API key and endpoint."""
+    with _lock:
+        if (api_key, base_url) not in _clients:
+            _clients[(api_key, base_url)] = ImagesClient(api_key, base_url)
+        return _clients[(api_key, base_url)]
@@ -0,0 +1,190 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, List
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from knowledge_base import INDEX_DIR, KnowledgeBaseIndex
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUDGET_MB = 1024  # loaded indexes across all sessions
+MAX_INDEXES = 256        # index objects kept, loaded or empty; idle ones beyond this are dropped
+SAVED_INDEX_DAYS = 7     # saved indexes no session holds are deleted after this long unused
+PRUNE_INTERVAL = 60 * 60 # seconds between scans of the saved indexes
+
+
+class IndexRegistry:
+    """
+    One knowledge base index per session (or tenant), so users never see
+    each other's documents. Loaded indexes share a memory budget: when it is
+    exceeded, or more than 'max_indexes' are held, the least recently used
+    idle index is dropped (it is already saved on disk) and loaded again the
+    next time its session needs it. Sessions with a turn in progress (see
+    in_use) are never dropped.
+
+    Indexes are saved by content (see KnowledgeBaseIndex), so sessions that
+    upload the same files share one saved copy and a user who comes back in
+    a new session finds theirs. Copies unused for SAVED_INDEX_DAYS are
+    deleted (see prune_saved).
+    """
+
+    def __init__(self, memory_budget_mb: float = MEMORY_BUDGET_MB, index_dir: str = INDEX_DIR, factory=None,
+                 max_indexes: int = MAX_INDEXES):
+        self.memory_budget = memory_budget_mb * 1e6
+        self.max_indexes = max_indexes
+        self.index_dir = index_dir
+        self.factory = factory or (lambda corpus, api_key: KnowledgeBaseIndex(
+            name=corpus, index_dir=index_dir, api_key=api_key, by_content=True))
+        self.indexes = OrderedDict()  # session -> KnowledgeBaseIndex, least recently used first
+        self.api_keys = {}  # session -> OpenAI API key its documents are embedded with
+        self.corpora = {}   # session -> corpus version of its dropped index, loaded again on next use
+        self.last_prune = 0.0
+        self.busy = Counter()
+        self.lock = threading.Lock()
+        self.stats = {"gets": 0, "reloads": 0, "evictions": 0, "reload_seconds": 0.0}
+
+    def get(self, session: str, api_key: str = None) -> KnowledgeBaseIndex:
+        """
+        The session's index, loaded (from disk if it was dropped). 'api_key'
+        is remembered for the session, so reloads embed with it too.
+        """
+        with self.lock:
+            self.stats["gets"] += 1
+            if api_key:
+                self.api_keys[session] = api_key
+            api_key = self.api_keys.get(session)
+            index = self.indexes.get(session)
+            if index is not None:
+                self.indexes.move_to_end(session)
+
+        if index is None:
+            # Disk reads happen outside the registry lock, so other sessions aren't held up
+            start = time.perf_counter()
+            created = self.factory(self.corpora.get(session), api_key)
+            with self.lock:
+                index = self.indexes.setdefault(session, created)
+                self.indexes.move_to_end(session)
+                if index is created and created.resident_bytes:
+                    self.stats["reloads"] += 1
+                    self.stats["reload_seconds"] += time.perf_counter() - start
+            if time.time() - self.last_prune > PRUNE_INTERVAL:
+                self.prune_saved()
+        self.enforce_budget(keep=session)
+        return index
+
+    def handle(self, session: str):
+        """A vector store stand-in for the session's index that survives eviction (see IndexHandle)."""
+        return IndexHandle(self, session)
+
+    @contextmanager
+    def in_use(self, session: str):
+        with self.lock:
+            self.busy[session] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.busy[session] -= 1
+                if not self.busy[session]:
+                    del self.busy[session]
+
+    def memory_bytes(self) -> int:
+        with self.lock:
+            return sum(index.resident_bytes for index in self.indexes.values())
+
+    def enforce_budget(self, keep: str = None):
+        """Drops least recently used idle indexes until the rest fit the memory budget and max_indexes."""
+        with self.lock:
+            total = sum(index.resident_bytes for index in self.indexes.values())
+            for session, index in list(self.indexes.items()):
+                if total <= self.memory_budget and len(self.indexes) <= self.max_indexes:
+                    break
+                if session == keep or self.busy[session]:
+                    continue
+                total -= index.resident_bytes
+                del self.indexes[session]
+                self.corpora[session] = index.version
+                index.unload()
+                self.stats["evictions"] += 1
+                logger.info(f"Dropped the index of session {session} ({total / 1e6:.0f} MB still loaded)")
+
+    def drop(self, session: str):
+        """Forgets a session's index (it stays on disk)."""
+        with self.lock:
+            index = self.indexes.pop(session, None)
+            self.api_keys.pop(session, None)
+            self.corpora.pop(session, None)
+        if index is not None:
+            index.unload()
+
+    def prune_saved(self):
+        """Deletes saved indexes (and abandoned temp copies) no held session uses, unused for SAVED_INDEX_DAYS."""
+        with self.lock:
+            self.last_prune = time.time()
+            in_use = {index.version for index in self.indexes.values()} | set(self.corpora.values())
+        cutoff = time.time() - SAVED_INDEX_DAYS * 24 * 60 * 60
+        try:
+            entries = list(os.scandir(self.index_dir))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name in in_use or not entry.is_dir() or entry.stat().st_mtime >= cutoff:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            logger.info(f"Deleted unused saved index {entry.name}")
+
+
+class IndexHandle:
+    """
+    Stands in for one session's FAISS store in the engine and its chains.
+    It holds no reference to the index itself, so the registry can free it;
+    every use goes through IndexRegistry.get, which reloads it if needed.
+    """
+
+    def __init__(self, registry: IndexRegistry, session: str):
+        self.registry = registry
+        self.session = session
+
+    @property
+    def version(self) -> str:
+        return self.registry.get(self.session).version
+
+    def current(self):
+        return self.registry.get(self.session).vectorstore
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def as_retriever(self, search_type: str = "similarity", search_kwargs=None, **kwargs):
+        return HandleRetriever(handle=self, search_type=search_type, search_kwargs=search_kwargs or {})
+
+
+class HandleRetriever(BaseRetriever):
+    """Retriever over an IndexHandle; resolves the loaded store on every query."""
+
+    handle: Any
+    search_type: str = "similarity"
+    search_kwargs: dict = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        retriever = self.handle.current().as_retriever(search_type=self.search_type, search_kwargs=self.search_kwargs)
+        return retriever.invoke(query)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_index_registry(memory_budget_mb: float = None) -> IndexRegistry:
+    """Returns the process-wide registry; the budget applies when it is first created."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = IndexRegistry(memory_budget_mb or MEMORY_BUDGET_MB)
+        return _registry
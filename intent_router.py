@@ -0,0 +1,303 @@
+import math
+import re
+from collections import Counter
+from typing import NamedTuple, Optional
+
+# Tools the router may call directly; everything else goes to the agent
+ROUTABLE_TOOLS = ("DatabaseQuery", "EventRecommender", "CurrentWeather")
+
+# Keyword rules, one per routable tool, mirroring the agent's priority list.
+# A rule only proposes a tool; the similarity classifier has to agree.
+RULES = {
+    "DatabaseQuery": re.compile(
+        r"\b(salar(y|ies)|budgets?|employees?|departments?|headcount|payroll|staff|paid|pay|earn(s|ers?)?"
+        r"|teams?|spend(s|ing)?|works? (in|for))\b"
+    ),
+    "EventRecommender": re.compile(
+        r"\b(events?|things to do|what to do|(something|anything)( fun)? to do|what (can|should|could) (i|we) do"
+        r"|activities|going on|concerts?|exhibitions?)\b"
+    ),
+    "CurrentWeather": re.compile(
+        r"\b(weather|temperature|forecast|rain(ing|y)?|humid(ity)?|hot|cold|warm|sunny|snow(ing)?)\b"
+    ),
+}
+
+# Requests the router never answers: documents come first in the priority list,
+# images and follow-ups need the agent and its chat history, and the event and
+# weather tools only know about today.
+AGENT_ONLY = re.compile(
+    r"\b(documents?|files?|uploaded|pdfs?|docx|report|policy|policies|draw|image|picture|paint|sketch)\b"
+)
+# Turns that only make sense with the chat history: "what about Sales?", "and them?"
+FOLLOW_UP = re.compile(
+    r"^\s*(and|also|what about|how about|same for|then)\b"
+    r"|\b(he|she|him|her|his|they|them|those|these|that one|the same|instead|again|else)\b"
+    # "weather there?", "what's it like there?", but not the existential "how many are there?"
+    r"|\b(?!(?:is|are|was|were|be|been)\b)\w+\s+there\s*[?.!]*\s*$"
+)
+NOT_TODAY = re.compile(
+    r"\b(tomorrow|yesterday|weekend|next|last|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b"
+    r"|\b\d{4}-\d{2}-\d{2}\b"
+)
+
+# 'in Singapore', 'for new york', 'at Paris, FR' (not 'for today'), up to a time word or 'and'
+LOCATION = re.compile(
+    r"\b(?:in|at|for|near|around)\s+(?!(?:today|tonight|now|the|this|me|us|a|an)\b)"
+    r"([a-z][a-z.'-]*(?:[ ,]+[a-z][a-z.'-]*){0,3}?)"
+    r"\s*(?=,?\s*\b(?:today|tonight|now|right now|currently|please|and|or|but)\b|[?.!]|$)",
+    re.IGNORECASE,
+)
+
+# Words a request to each tool may use besides its entities. Any other word
+# in a weather or event request ("... and London", "... for my flight")
+# sends it to the agent; in a SQL question, the other words must be names
+# known to company.db ("Engineering", "Jane Smith"; not "Apple" or "Japan").
+TOOL_WORDS = {
+    "DatabaseQuery": {
+        "salary", "salaries", "budget", "budgets", "employee", "employees", "department", "departments", "team",
+        "teams", "staff", "headcount", "payroll", "paid", "pay", "earn", "earns", "earner", "earners", "earning",
+        "earnings", "spend", "spends", "spending", "spent", "work", "works", "working", "people", "person",
+        "everyone", "list", "show", "give", "tell", "find", "count", "number", "total", "sum", "average", "mean",
+        "median", "top", "bottom", "highest", "lowest", "most", "least", "biggest", "largest", "smallest", "more",
+        "less", "than", "over", "under", "above", "below", "between", "per", "by", "each", "every", "all", "has",
+        "have", "with", "and", "or", "name", "names", "their", "many", "much", "money", "cost", "costs", "order",
+        "ordered", "sorted", "highest-paid", "lowest-paid", "best", "who's", "combined", "do",
+    },
+    "CurrentWeather": {
+        "weather", "temperature", "forecast", "rain", "raining", "rainy", "humid", "humidity", "hot", "cold",
+        "warm", "sunny", "snow", "snowing", "like", "outside", "current", "currently", "today", "tonight",
+        "conditions", "how's", "hows", "tell", "check", "show", "get",
+    },
+    "EventRecommender": {
+        "events", "event", "things", "thing", "do", "activities", "activity", "going", "on", "today", "tonight",
+        "fun", "something", "anything", "recommend", "suggest", "happening", "go", "out", "concerts", "concert",
+        "exhibitions", "exhibition", "interesting", "good", "tell", "show", "list", "find",
+    },
+}
+
+# Example requests per label, used with the tool descriptions to train the
+# similarity classifier. The non-routable labels keep it from claiming
+# requests that belong to another tool or to the agent itself.
+EXAMPLES = {
+    "DatabaseQuery": [
+        "Who has the highest salary?",
+        "What is the budget for the Engineering department?",
+        "How many people work in Sales?",
+        "List everyone in the Marketing team",
+        "Which team spends the most?",
+        "Average pay by team",
+        "Top 10 highest paid people",
+        "Headcount per department",
+        "Number of employees per department",
+        "Total salary spend",
+    ],
+    "EventRecommender": [
+        "Any things to do today in Singapore?",
+        "What should I do today in London?",
+        "Recommend something fun to do in Tokyo",
+        "Where can I go out tonight in Paris?",
+        "Any concerts or exhibitions in Singapore today?",
+    ],
+    "CurrentWeather": [
+        "What's the weather in Singapore?",
+        "How hot is it in Dubai right now?",
+        "Is it raining in London?",
+        "Is it cold in Oslo?",
+        "Current conditions in Tokyo",
+        "Humidity in Jakarta",
+    ],
+    "agent": [
+        "Hello!",
+        "Thanks, that's helpful",
+        "Who won the world cup in 2022?",
+        "What is the capital of Australia?",
+        "Explain how vaccines work",
+        "Summarise my uploaded notes",
+        "Draw a cat wearing a hat",
+        "Create an image of a sunset over the sea",
+        "Tell me a joke",
+        "What's the time in Tokyo?",
+        "What is the population of London?",
+        "Tell me about the history of Paris",
+        "How do I get to the airport in Singapore?",
+        # Weather-sounding questions that are not about current conditions
+        "What is the hottest place on earth?",
+        "How do I treat a cold?",
+        "Why is the sky blue?",
+    ],
+}
+
+# Words that carry no intent; left in, they make "What's the time in Tokyo?"
+# look like "What's the weather in Tokyo?"
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "it", "its", "it's", "what", "what's", "whats", "who", "how", "which",
+    "where", "when", "does", "can", "could", "should", "would", "i", "we", "you", "me", "my", "our",
+    "in", "at", "for", "of", "on", "to", "near", "around", "any", "some", "there", "right", "now", "please",
+    "today", "tonight",
+}
+
+MIN_SIMILARITY = 0.2   # classifier score the rule's tool needs to count as agreement
+MIN_MARGIN = 0.05      # over the best competing label
+
+
+class Route(NamedTuple):
+    tool: str
+    tool_input: str
+    confidence: float
+    reason: str  # why it was routed; 'rule+similarity' when the keyword rule and classifier agree
+
+
+def ngrams(text: str, n: int = 3) -> Counter:
+    """Character n-grams of each content word, so 'salaries' still shares most of 'salary'."""
+    grams = Counter()
+    for word in re.findall(r"[a-z0-9']+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        padded = f" {word} "
+        grams.update(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    return grams
+
+
+class SimilarityClassifier:
+    """
+    Nearest-example classifier over TF-IDF weighted character trigrams.
+    Tiny, local and deterministic: scoring a query is a few dict lookups
+    per example, with no embedding API call.
+    """
+
+    def __init__(self, examples: dict):
+        counts = {label: [ngrams(text) for text in texts] for label, texts in examples.items()}
+        documents = [grams for vectors in counts.values() for grams in vectors]
+        frequency = Counter(gram for grams in documents for gram in grams)
+        self.idf = {gram: math.log((1 + len(documents)) / (1 + df)) + 1 for gram, df in frequency.items()}
+        self.examples = {label: [self.weigh(grams) for grams in vectors] for label, vectors in counts.items()}
+
+    def weigh(self, grams: Counter) -> dict:
+        vector = {gram: count * self.idf.get(gram, 0.0) for gram, count in grams.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {gram: value / norm for gram, value in vector.items() if value}
+
+    def scores(self, text: str) -> dict:
+        """Best cosine similarity to each label's examples."""
+        query = self.weigh(ngrams(text))
+        return {
+            label: max((sum(value * example.get(gram, 0.0) for gram, value in query.items()) for example in vectors),
+                       default=0.0)
+            for label, vectors in self.examples.items()
+        }
+
+
+def extract_location(text: str) -> Optional[str]:
+    match = LOCATION.search(text)
+    if not match:
+        return None
+    return match.group(1).strip(" ,")
+
+
+def is_follow_up(text: str) -> bool:
+    return bool(FOLLOW_UP.search(text.lower()))
+
+
+def leftover_phrases(text: str, label: str) -> list:
+    """
+    Runs of words in 'text' that are neither stopwords, numbers nor in the
+    tool's TOOL_WORDS, e.g. ["jane smith"] for "What is Jane Smith's salary?".
+    """
+    allowed = STOPWORDS | TOOL_WORDS[label]
+    phrases, current = [], []
+    for token in re.findall(r"[a-z0-9'&-]+|[^a-z0-9'&\s-]+", text.lower()):
+        word = re.sub(r"'s$", "", token)
+        if re.match(r"[a-z0-9]", word) and word not in allowed and token not in allowed and not word.isdigit():
+            current.append(word)
+            continue
+        if current:
+            phrases.append(" ".join(current))
+            current = []
+    if current:
+        phrases.append(" ".join(current))
+    return phrases
+
+
+class IntentRouter:
+    """
+    Sends clear-cut requests straight to the SQL, event and weather tools,
+    skipping the functions-agent call that would only pick the tool (and the
+    one that rephrases its output). A request is routed only when a keyword
+    rule and a similarity classifier (trained on the tool descriptions and
+    EXAMPLES) pick the same tool and its entities check out: names in a SQL
+    question must be known to company.db ('known_names(names) -> bool'),
+    and a weather or event request must name one place, for today, with no
+    other ask attached. Everything else returns None and goes to the agent.
+    """
+
+    def __init__(self, tools, min_similarity: float = MIN_SIMILARITY, min_margin: float = MIN_MARGIN,
+                 known_names=None):
+        descriptions = {tool.name: tool.description for tool in tools if tool.name in ROUTABLE_TOOLS}
+        examples = {label: list(texts) for label, texts in EXAMPLES.items() if label in descriptions or label == "agent"}
+        for name, description in descriptions.items():
+            # One example per sentence of the description ("Use this tool ONLY when ...")
+            examples[name] += [s for s in re.split(r"(?<=[.?!])\s+", description) if len(s.split()) > 3]
+        self.tools = set(descriptions)
+        self.classifier = SimilarityClassifier(examples)
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.known_names = known_names
+        self.stats = Counter()
+
+    def classify(self, text: str):
+        """Returns (label, confidence, reason), label None when nothing is clear-cut."""
+        lowered = text.lower()
+        if AGENT_ONLY.search(lowered) or FOLLOW_UP.search(lowered):
+            return None, 0.0, "agent-only"
+
+        hits = {name for name, rule in RULES.items() if name in self.tools and rule.search(lowered)}
+        if hits == {"EventRecommender", "CurrentWeather"}:
+            # Priority list: events (which check the weather themselves) beat weather
+            hits = {"EventRecommender"}
+        if len(hits) > 1:
+            return None, 0.0, "multi-intent"
+        if not hits:
+            return None, 0.0, "no-rule"
+        rule = hits.pop()
+
+        # The place says nothing about the intent ("in Tokyo" vs "in London"), but in
+        # a SQL question "in Sales" is the department, so it stays
+        location = extract_location(text) if rule != "DatabaseQuery" else None
+        scores = self.classifier.scores(text.replace(location, " ") if location else text)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (label, best), runner_up = ranked[0], ranked[1][1] if len(ranked) > 1 else 0.0
+        if label != rule or best < self.min_similarity or best - runner_up < self.min_margin:
+            return None, best, "disagreement"
+        return label, best, "rule+similarity"
+
+    def route(self, text: str) -> Optional[Route]:
+        """The tool call for a clear-cut request, or None to use the agent."""
+        label, confidence, reason = self.classify(text)
+        if label is None:
+            self.stats[reason] += 1
+            return None
+
+        if label == "DatabaseQuery":
+            # "How many employees does Apple have?" is not about this company
+            names = leftover_phrases(text, label)
+            if names and not (self.known_names and self.known_names(names)):
+                self.stats["unknown-entity"] += 1
+                return None
+            tool_input = text
+        else:
+            if NOT_TODAY.search(text.lower()):
+                self.stats["not-today"] += 1
+                return None
+            location = extract_location(text)
+            if not location or set(location.lower().replace(",", " ").split()) & STOPWORDS:
+                # No place, or one that ran on into the sentence ("Madrid for my flight")
+                self.stats["missing-input"] += 1
+                return None
+            # A second place or another ask would be dropped from the tool input
+            if leftover_phrases(text.lower().replace(location.lower(), " ", 1), label):
+                self.stats["leftover-text"] += 1
+                return None
+            tool_input = location
+
+        self.stats[label] += 1
+        return Route(label, tool_input, confidence, reason)
@@ -0,0 +1,336 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain_community.vectorstores import FAISS
+from langchain_openai import OpenAIEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from document_parser import parse_file, parse_files
+from embedding_scheduler import EmbeddingScheduler
+from vector_index import build_vectorstore, can_remove_in_place, index_layout, index_options, remove_vectors, tune_index
+
+logger = logging.getLogger(__name__)
+
+# On-disk locations for the embedding cache and the saved FAISS indexes
+CACHE_DIR = ".rag_cache"
+EMBEDDING_CACHE_DIR = os.path.join(CACHE_DIR, "embeddings")
+INDEX_DIR = os.path.join(CACHE_DIR, "indexes")
+
+MANIFEST_FILE = "manifest.json"
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+# In memory, the pickled docstore (chunk texts and metadata) takes about twice its file size
+DOCSTORE_OVERHEAD = 2
+
+MAX_SCHEDULERS = 64  # API keys with a shared embedding scheduler, least recently used dropped
+MAX_FILE_KEYS = 4096 # content hashes remembered by upload ID (see file_key)
+
+
+def embedding_model_name(embeddings) -> str:
+    # OpenAIEmbeddings exposes 'model', most other embedders expose 'model_name'
+    return getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or type(embeddings).__name__
+
+
+def get_cached_embeddings(embeddings=None, cache_dir: str = EMBEDDING_CACHE_DIR):
+    """
+    Wraps an embedder with a local content-addressed store.
+    Keys are sha256(chunk text) namespaced by the embedding model, so the
+    same chunk is only ever embedded once per model.
+    """
+    if embeddings is None:
+        embeddings = OpenAIEmbeddings()
+
+    store = LocalFileStore(cache_dir)
+    return CacheBackedEmbeddings.from_bytes_store(
+        embeddings,
+        store,
+        namespace=embedding_model_name(embeddings),
+        query_embedding_cache=False,
+        key_encoder="sha256",
+    )
+
+
+_file_keys = OrderedDict()  # (upload ID, name) -> file key, least recently used first
+_file_keys_lock = threading.Lock()
+
+
+def file_key(file) -> str:
+    """
+    Identifies an uploaded file by name and content hash. Uploads with a
+    unique 'file_id' (Streamlit's UploadedFile, api_server's) are hashed
+    once, not on every Streamlit rerun that syncs them again.
+    """
+    upload = (file.file_id, file.name) if getattr(file, "file_id", None) else None
+    if upload:
+        with _file_keys_lock:
+            key = _file_keys.get(upload)
+            if key is not None:
+                _file_keys.move_to_end(upload)
+                return key
+
+    key = f"{file.name}:{hashlib.sha256(file.getvalue()).hexdigest()}"
+    if upload:
+        with _file_keys_lock:
+            _file_keys[upload] = key
+            while len(_file_keys) > MAX_FILE_KEYS:
+                _file_keys.popitem(last=False)
+    return key
+
+
+def corpus_version(keys) -> str:
+    """Content hash of a set of file keys."""
+    return hashlib.sha256("|".join(sorted(keys)).encode("utf-8")).hexdigest()[:16]
+
+
+def split_documents(docs):
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return text_splitter.split_documents(docs)
+
+
+_schedulers = OrderedDict()  # API key -> EmbeddingScheduler, least recently used first
+_schedulers_lock = threading.Lock()
+
+
+def get_embedding_scheduler(api_key: str = None) -> EmbeddingScheduler:
+    """
+    The OpenAI embedder and scheduler for an API key (OPENAI_API_KEY if
+    None). Every index of that key embeds through it, so its sessions share
+    one thread pool and one adaptive rate limit (OpenAI limits are per key)
+    and each upload is billed to the key of the user who made it.
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(api_key)
+        if scheduler is None:
+            # Retries (429s, server errors, timeouts) are handled by the scheduler, not the OpenAI client
+            embeddings = OpenAIEmbeddings(max_retries=0, **({"api_key": api_key} if api_key else {}))
+            scheduler = _schedulers[api_key] = EmbeddingScheduler(embeddings)
+        _schedulers.move_to_end(api_key)
+        while len(_schedulers) > MAX_SCHEDULERS:
+            _schedulers.popitem(last=False)  # indexes still using it keep their reference
+        return scheduler
+
+
+class KnowledgeBaseIndex:
+    """
+    A FAISS index that is kept in sync with the uploaded file set.
+    Each file's chunks are stored under their own document IDs, so adding or
+    removing a file only embeds or deletes that file's vectors. The index and
+    its file manifest are saved to disk after every change.
+
+    The faiss index type follows the corpus size (see vector_index.py):
+    exact Flat for small corpora, HNSW or IVF (optionally SQ8/PQ compressed)
+    for large ones. HNSW graphs cannot delete in place, so removing files
+    from them rebuilds the index from the embedding cache instead.
+
+    With by_content=True the index is saved under its corpus version rather
+    than 'name' (which then names the corpus to load, if any): identical
+    uploads share one directory, and a returning user's is found again.
+    """
+
+    def __init__(self, embeddings=None, name: str = "default", index_dir: str = INDEX_DIR, cache_dir: str = EMBEDDING_CACHE_DIR, max_workers: int = None, options=None, parse=parse_file, scheduler=None, api_key: str = None, by_content: bool = False):
+        # A caller's own embedder gets its own scheduler; pass 'scheduler' to share one between indexes
+        if scheduler is None:
+            scheduler = get_embedding_scheduler(api_key) if embeddings is None else EmbeddingScheduler(embeddings)
+
+        self.scheduler = scheduler
+        self.embeddings = scheduler.embeddings
+        self.index_dir = index_dir
+        self.name = name
+        self.by_content = by_content
+        self.cached_embeddings = get_cached_embeddings(self.scheduler, cache_dir)
+        self.settings = {
+            "model": embedding_model_name(self.embeddings),
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+        }
+        self.max_workers = max_workers
+        self.parse = parse  # (name, bytes) -> text; must be picklable for the process pool
+        self.index_options = index_options(options)
+        self.layout = None
+        self.vectorstore = None
+        self.doc_ids = {}  # file key -> document IDs of its chunks
+        self.resident_bytes = 0  # estimated memory of the loaded index
+        self.lock = threading.Lock()
+        if name:
+            self.load(os.path.join(index_dir, name))
+
+    @property
+    def version(self) -> str:
+        """Content hash of the indexed file set; changes whenever the index does."""
+        return corpus_version(self.doc_ids)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.index_dir, self.version if self.by_content else self.name)
+
+    def saved_manifest(self, path: str):
+        """The manifest of the index saved at 'path', or None if there is none built with these settings."""
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read saved index manifest: {e}")
+            return None
+
+        # A different model or chunking would mix incompatible vectors
+        if manifest.get("settings") != self.settings:
+            logger.info("Saved index settings changed, starting a fresh index")
+            return None
+        return manifest
+
+    def load(self, path: str = None) -> bool:
+        """Loads the index saved at 'path' (its own by default); returns False if there is none."""
+        own = path is None
+        path = path or self.path
+        manifest = self.saved_manifest(path)
+        if manifest is None:
+            return False
+
+        try:
+            vectorstore = None
+            if manifest["doc_ids"]:
+                # The index was pickled by this app, so loading it back is safe
+                vectorstore = FAISS.load_local(path, self.cached_embeddings, allow_dangerous_deserialization=True)
+                tune_index(vectorstore.index, self.index_options)
+        except Exception as e:
+            logger.warning(f"Could not load saved index: {e}")
+            if own:
+                self.vectorstore = None
+                self.doc_ids = {}
+            return False
+
+        self.vectorstore = vectorstore
+        self.layout = manifest.get("layout", "flat")
+        self.doc_ids = manifest["doc_ids"]
+        self.resident_bytes = self.saved_bytes(path)
+        os.utime(path)  # last use, for IndexRegistry.prune_saved
+        logger.info(f"Loaded saved index ({len(self.doc_ids)} files)")
+        return True
+
+    def save(self):
+        path = self.path
+        # Saved by content, an existing directory already holds this exact index
+        if self.by_content and self.saved_manifest(path) is not None:
+            os.utime(path)
+        else:
+            # Write to a temp directory first so a crash never leaves a half-written index
+            temp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+            os.makedirs(temp_path)
+            if self.vectorstore is not None:
+                self.vectorstore.save_local(temp_path)
+            with open(os.path.join(temp_path, MANIFEST_FILE), "w") as f:
+                json.dump({"settings": self.settings, "layout": self.layout, "doc_ids": self.doc_ids}, f)
+
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(temp_path, path)
+        self.resident_bytes = self.saved_bytes(path) if self.vectorstore is not None else 0
+
+    def saved_bytes(self, path: str = None) -> int:
+        """Memory estimate from the saved files: the faiss index as is, the docstore with overhead."""
+        sizes = {}
+        for name in ("index.faiss", "index.pkl"):
+            try:
+                sizes[name] = os.path.getsize(os.path.join(path or self.path, name))
+            except OSError:
+                sizes[name] = 0
+        return sizes["index.faiss"] + sizes["index.pkl"] * DOCSTORE_OVERHEAD
+
+    @property
+    def loaded(self) -> bool:
+        return self.vectorstore is not None or not any(self.doc_ids.values())
+
+    def unload(self):
+        """Frees the in-memory index. It is saved after every change, so ensure_loaded() can bring it back."""
+        with self.lock:
+            self.vectorstore = None
+            self.resident_bytes = 0
+
+    def ensure_loaded(self) -> bool:
+        """Reloads an unloaded index from disk; returns True if it had to."""
+        with self.lock:
+            if self.loaded:
+                return False
+            self.load()
+            return True
+
+    def rebuild(self, layout: str):
+        """Rebuilds the index with a new layout from the stored chunks; vectors come from the embedding cache."""
+        ids = [doc_id for doc_ids in self.doc_ids.values() for doc_id in doc_ids]
+        docs = [self.vectorstore.docstore.search(doc_id) for doc_id in ids]
+        self.vectorstore = build_vectorstore(docs, ids, self.cached_embeddings, layout, self.index_options)
+        self.layout = layout
+        logger.info(f"Rebuilt index as {layout} ({len(ids)} chunks)")
+
+    def diff(self, files):
+        """Returns (files to add, file keys to remove) for a new upload set."""
+        files_by_key = {file_key(file): file for file in files}
+        added = [file for key, file in files_by_key.items() if key not in self.doc_ids]
+        removed = [key for key in self.doc_ids if key not in files_by_key]
+        return added, removed
+
+    def sync(self, files):
+        """
+        Brings the index in line with 'files'. Only new files are parsed and
+        embedded, and only removed files' vectors are deleted.
+        Returns (number of files added, number of files removed).
+        """
+        self.ensure_loaded()
+        with self.lock:
+            added, removed = self.diff(files)
+            if not added and not removed:
+                return 0, 0
+
+            # This exact file set may already be saved (a returning user, another session)
+            if self.by_content and self.load(os.path.join(self.index_dir, corpus_version(set(map(file_key, files))))):
+                logger.info(f"Index synced from a saved copy: +{len(added)} / -{len(removed)} files")
+                return len(added), len(removed)
+
+            needs_rebuild = False
+            if removed:
+                ids = [doc_id for key in removed for doc_id in self.doc_ids[key]]
+                if self.vectorstore is not None and ids:
+                    # Flat and IVF indexes (compressed or not) can remove vectors in place
+                    if can_remove_in_place(self.layout):
+                        remove_vectors(self.vectorstore, ids)
+                    else:
+                        needs_rebuild = True
+                for key in removed:
+                    del self.doc_ids[key]
+
+            # Files are parsed in parallel and split/embedded as each one finishes
+            for file, docs in parse_files(added, self.max_workers, self.parse):
+                key = file_key(file)
+                splits = split_documents(docs)
+                ids = [f"{key}#{i}" for i in range(len(splits))]
+
+                if splits:
+                    if self.vectorstore is None:
+                        self.layout = index_layout(len(splits), self.index_options)
+                        self.vectorstore = build_vectorstore(splits, ids, self.cached_embeddings, self.layout, self.index_options)
+                    else:
+                        self.vectorstore.add_documents(splits, ids=ids)
+                self.doc_ids[key] = ids
+
+            if not any(self.doc_ids.values()):
+                self.vectorstore = None
+                self.layout = None
+            else:
+                # Switch index type when the corpus crosses a size threshold
+                layout = index_layout(sum(len(ids) for ids in self.doc_ids.values()), self.index_options)
+                if needs_rebuild or layout != self.layout:
+                    self.rebuild(layout)
+
+            self.save()
+            logger.info(f"Index synced: +{len(added)} / -{len(removed)} files")
+            return len(added), len(removed)
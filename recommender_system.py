@@ -1,83 +1,85 @@
+import asyncio
+import contextvars
+import logging
 import requests
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from weather_client import get_weather_client
+from event_store import get_event_store
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 
+logger = logging.getLogger(__name__)
+
+# Shared threads for the blocking weather/events fetches, so they can overlap
+fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="recommender")
+
 class WeatherAgent:
     def __init__(self, api_key):
         self.api_key = api_key
+        self.client = get_weather_client(api_key)
 
     def get_weather(self, location, date):
         # Use current weather as we are dealing with same-day recommendations
-        url = f"http://api.weatherapi.com/v1/current.json"
-        params = {
-            "key": self.api_key,
-            "q": location,
-            "aqi": "no"
-        }
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self.client.get_current(location)
         except requests.exceptions.RequestException as e:
             raise Exception(f"Weather API error: {str(e)}")
 
 class EventAgent:
-    def get_events(self, date, event_type=None):
-        conn = sqlite3.connect('events.db')
-        c = conn.cursor()
-
+    def get_events(self, date, event_type=None, location=None, end_date=None):
         try:
-            if event_type:
-                c.execute('SELECT * FROM events WHERE date = ? AND type = ?', (date, event_type))
-            else:
-                c.execute('SELECT * FROM events WHERE date = ?', (date,))
-
-            events = c.fetchall()
-            return events
+            return get_event_store().find(date, end_date=end_date, location=location, event_type=event_type)
         except sqlite3.Error as e:
             raise Exception(f"Database error: {str(e)}")
-        finally:
-            conn.close()
 
 class RecommendationAgent:
     def __init__(self, llm: ChatOpenAI):
         self.llm = llm
 
+    def build_messages(self, weather_data, events):
+        # Handle both current and forecast data
+        if 'current' in weather_data:
+            weather_condition = weather_data['current']['condition']['text']
+            temperature = weather_data['current']['temp_c']
+            context = f"Weather: {weather_condition}, Temperature: {temperature}°C\n\n"
+        else:
+            context = "Weather data unavailable\n\n"
+
+        context += "Available events:\n"
+        for event in events:
+            # Schema: 1=name, 2=type, 3=description, 4=venue
+            context += f"- {event[1]} ({event[2]}): {event[3]} at {event[4]}\n"
+
+        system_prompt = """You are a helpful event recommender. Consider the weather conditions
+        and suggest suitable events. For outdoor events, consider the temperature and weather conditions.
+        Be specific about why you recommend certain events over others. Keep your response concise but informative.
+        If weather data is unavailable, focus on providing a balanced recommendation of both indoor and outdoor events."""
+
+        return [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=context)
+        ]
+
     def generate_recommendation(self, weather_data, events):
         # Create context for GPT
         try:
-            # Handle both current and forecast data
-            if 'current' in weather_data:
-                weather_condition = weather_data['current']['condition']['text']
-                temperature = weather_data['current']['temp_c']
-                context = f"Weather: {weather_condition}, Temperature: {temperature}°C\n\n"
-            else:
-                context = "Weather data unavailable\n\n"
-
-            context += "Available events:\n"
-            for event in events:
-                # Schema: 1=name, 2=type, 3=description, 4=venue
-                context += f"- {event[1]} ({event[2]}): {event[3]} at {event[4]}\n"
-
-            # Use llm.invoke()
-            system_prompt = """You are a helpful event recommender. Consider the weather conditions
-            and suggest suitable events. For outdoor events, consider the temperature and weather conditions.
-            Be specific about why you recommend certain events over others. Keep your response concise but informative.
-            If weather data is unavailable, focus on providing a balanced recommendation of both indoor and outdoor events."""
-            
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=context)
-            ]
-            
-            response = self.llm.invoke(messages)
+            response = self.llm.invoke(self.build_messages(weather_data, events))
             return response.content
         
         except Exception as e:
             raise Exception(f"Recommendation error: {str(e)}")
 
+    async def agenerate_recommendation(self, weather_data, events):
+        try:
+            response = await self.llm.ainvoke(self.build_messages(weather_data, events))
+            return response.content
+
+        except Exception as e:
+            raise Exception(f"Recommendation error: {str(e)}")
+
 class CoordinatorAgent:
     def __init__(self, weather_api_key, llm: ChatOpenAI):
         self.weather_agent = WeatherAgent(weather_api_key)
@@ -86,19 +88,19 @@ class CoordinatorAgent:
 
     def get_recommendations(self, location, date):
         try:
-            # Get weather data
-            print(f"\nFetching weather data for {location} on {date}...")
-            weather_data = self.weather_agent.get_weather(location, date)
-
-            # Get events
-            print("Fetching events...")
-            events = self.event_agent.get_events(date)
+            # Weather and events don't depend on each other, so fetch them concurrently
+            logger.info(f"Fetching weather data for {location} and events on {date}...")
+            # Copies of the caller's context carry the trace session into the pool threads
+            weather_future = fetch_pool.submit(contextvars.copy_context().run, self.weather_agent.get_weather, location, date)
+            events_future = fetch_pool.submit(contextvars.copy_context().run, partial(self.event_agent.get_events, date, location=location))
+            weather_data = weather_future.result()
+            events = events_future.result()
 
             if not events:
-                return "No events found for this date."
+                return f"No events found in {location} for this date."
 
             # Generate recommendations
-            print("Generating recommendations...")
+            logger.info("Generating recommendations...")
             recommendations = self.recommendation_agent.generate_recommendation(
                 weather_data, events
             )
@@ -108,6 +110,24 @@ class CoordinatorAgent:
         except Exception as e:
             return f"Error: {str(e)}"
 
+    async def aget_recommendations(self, location, date):
+        try:
+            logger.info(f"Fetching weather data for {location} and events on {date}...")
+            loop = asyncio.get_running_loop()
+            weather_data, events = await asyncio.gather(
+                loop.run_in_executor(fetch_pool, contextvars.copy_context().run, self.weather_agent.get_weather, location, date),
+                loop.run_in_executor(fetch_pool, contextvars.copy_context().run, partial(self.event_agent.get_events, date, location=location)),
+            )
+
+            if not events:
+                return f"No events found in {location} for this date."
+
+            logger.info("Generating recommendations...")
+            return await self.recommendation_agent.agenerate_recommendation(weather_data, events)
+
+        except Exception as e:
+            return f"Error: {str(e)}"
+
 # Entrypoint function for app.py
 def run_event_recommender(location: str, llm: ChatOpenAI, weather_key: str) -> str:
     """
@@ -119,9 +139,22 @@ def run_event_recommender(location: str, llm: ChatOpenAI, weather_key: str) -> s
         # Get today's date in 'YYYY-MM-DD' format
         today_date = datetime.now().strftime('%Y-%m-%d')
         
-        print(f"--- Event Recommender Tool searching for {location} on {today_date} ---")
+        logger.info(f"Event Recommender Tool searching for {location} on {today_date}")
         
         return coordinator.get_recommendations(location, today_date)
     except Exception as e:
-        print(f"--- Event Recommender Tool FAILED: {str(e)} ---")
+        logger.warning(f"Event Recommender Tool FAILED: {str(e)}")
+        return f"Error in event recommender: {str(e)}"
+
+async def arun_event_recommender(location: str, llm: ChatOpenAI, weather_key: str) -> str:
+    """Async version of run_event_recommender, for AgentExecutor.ainvoke."""
+    try:
+        coordinator = CoordinatorAgent(weather_key, llm)
+        today_date = datetime.now().strftime('%Y-%m-%d')
+
+        logger.info(f"Event Recommender Tool searching for {location} on {today_date}")
+
+        return await coordinator.aget_recommendations(location, today_date)
+    except Exception as e:
+        logger.warning(f"Event Recommender Tool FAILED: {str(e)}")
         return f"Error in event recommender: {str(e)}"
@@ -1,7 +1,40 @@
+import argparse
+import random
 import sqlite3
+from sql_executor import enable_wal
 
-def setup_database():
-    conn = sqlite3.connect('company.db')
+DEPARTMENTS = ["Engineering", "Marketing", "Sales", "Finance", "HR", "Legal", "Support", "Research"]
+FIRST_NAMES = ["Alex", "Sam", "Priya", "Wei", "Maria", "Omar", "Chen", "Aisha", "Lucas", "Mei", "Ravi", "Nora"]
+LAST_NAMES = ["Tan", "Lim", "Kumar", "Garcia", "Nguyen", "Smith", "Lee", "Wong", "Ong", "Brown", "Ali", "Chua"]
+BATCH_SIZE = 50_000
+
+
+def generate_employees(count, start_id, seed=0):
+    """Yields 'count' synthetic (id, name, department, salary) rows."""
+    rng = random.Random(seed)
+    for i in range(start_id, start_id + count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        yield (i, name, rng.choice(DEPARTMENTS), rng.randrange(40_000, 200_000, 500))
+
+
+def add_synthetic_employees(conn, count, seed=0):
+    start_id = (conn.execute("SELECT MAX(id) FROM employees").fetchone()[0] or 0) + 1
+    rows = generate_employees(count, start_id, seed)
+    while True:
+        batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+        if not batch:
+            break
+        conn.executemany("INSERT INTO employees VALUES (?, ?, ?, ?)", batch)
+    # Departments the synthetic employees belong to, so joins find a budget
+    for department in DEPARTMENTS:
+        if not conn.execute("SELECT 1 FROM departments WHERE name = ?", (department,)).fetchone():
+            conn.execute("INSERT INTO departments (name, budget) VALUES (?, ?)",
+                         (department, random.Random(department).randrange(100_000, 5_000_000, 10_000)))
+    conn.commit()
+
+
+def setup_database(path='company.db', synthetic_employees=0):
+    conn = sqlite3.connect(path)
     c = conn.cursor()
 
     # Create sample tables
@@ -29,18 +62,30 @@ def setup_database():
     c.execute("INSERT OR IGNORE INTO departments VALUES (2, 'Marketing', 500000)")
 
     conn.commit()
+
+    # Load-testing data on top of the samples
+    if synthetic_employees:
+        print(f"Generating {synthetic_employees:,} synthetic employees...")
+        add_synthetic_employees(conn, synthetic_employees)
     conn.close()
 
+    # The agent reads through read-only connections; WAL keeps them from blocking writers
+    enable_wal(path)
+
 # Test database setup
 if __name__ == "__main__":
-    setup_database()
+    parser = argparse.ArgumentParser(description="Create company.db with sample (and optionally synthetic) employees.")
+    parser.add_argument("--employees", type=int, default=0, help="number of synthetic employees to add")
+    parser.add_argument("--db", default="company.db")
+    args = parser.parse_args()
+    setup_database(args.db, args.employees)
 
     # Verify the setup
-    conn = sqlite3.connect('company.db')
+    conn = sqlite3.connect(args.db)
     c = conn.cursor()
 
     print("Employees table:")
-    c.execute("SELECT * FROM employees")
+    c.execute("SELECT * FROM employees LIMIT 10")
     print(c.fetchall())
 
     print("\nDepartments table:")
@@ -1,9 +1,43 @@
-import sqlite3
+import argparse
 import os
+import random
+import sqlite3
+from datetime import date, timedelta
+from event_store import SCHEMA, insert_events
+from sql_executor import enable_wal
 
-def setup_database():
-    DB_FILE = "events.db"
-    
+CITIES = ["Singapore", "Kuala Lumpur", "Jakarta", "Bangkok", "Manila", "Ho Chi Minh City", "Hong Kong", "Taipei",
+          "Seoul", "Tokyo", "Sydney", "London", "New York", "San Francisco", "Berlin", "Paris"]
+EVENT_KINDS = {
+    "indoor": ["Tech Meetup", "Art Exhibition", "Theater Show", "Food Festival", "Book Fair", "Jazz Night", "Conference"],
+    "outdoor": ["Night Run", "Open-Air Cinema", "Street Market", "Park Concert", "Food Truck Rally", "Cycling Tour"],
+}
+VENUES = ["Convention Centre", "City Park", "Waterfront", "Old Town Square", "Grand Theater", "Exhibition Hall"]
+BATCH_SIZE = 50_000
+
+
+def generate_events(count, start, days, seed=0):
+    """Yields 'count' synthetic (name, type, description, location, date, city) rows."""
+    rng = random.Random(seed)
+    for i in range(count):
+        event_type = rng.choice(("indoor", "outdoor"))
+        kind = rng.choice(EVENT_KINDS[event_type])
+        city = rng.choice(CITIES)
+        day = (start + timedelta(days=rng.randrange(days))).isoformat()
+        yield (f"{kind} #{i}", event_type, f"A {kind.lower()} in {city}.", f"{rng.choice(VENUES)}, {city}", day, city)
+
+
+def add_synthetic_events(conn, count, start, days, seed=0):
+    events = generate_events(count, start, days, seed)
+    while True:
+        batch = [event for _, event in zip(range(BATCH_SIZE), events)]
+        if not batch:
+            break
+        insert_events(conn, batch)
+    conn.commit()
+
+
+def setup_database(DB_FILE="events.db", synthetic_events=0, days=365, start=None):
     # Simulated current date
     TODAY_STR = "2025-10-26"
     TOMORROW_STR = "2025-10-27"
@@ -12,22 +46,16 @@ def setup_database():
     if os.path.exists(DB_FILE):
         print(f"'{DB_FILE}' already exists. Deleting old file...")
         os.remove(DB_FILE)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(DB_FILE + suffix):
+                os.remove(DB_FILE + suffix)
 
     print(f"Creating new database: {DB_FILE}")
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
 
     # Database schema
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY,
-            name TEXT,
-            type TEXT,  -- 'indoor' or 'outdoor'
-            description TEXT,
-            location TEXT,
-            date TEXT
-        )
-    ''')
+    c.execute(SCHEMA[0])
 
     # Sample events
     events = [
@@ -44,12 +72,29 @@ def setup_database():
         ('Movies at The Fort', 'outdoor', 'Lifestyle', 'Fort Canning Park', TOMORROW_STR)
     ]
 
-    c.executemany('INSERT INTO events (name, type, description, location, date) VALUES (?,?,?,?,?)', events)
+    insert_events(conn, [event + ("Singapore",) for event in events])
+    conn.commit()
+
+    # Load-testing data spread over the days from 'start' (the real today by default,
+    # since the recommender looks up the current date)
+    if synthetic_events:
+        print(f"Generating {synthetic_events:,} synthetic events...")
+        add_synthetic_events(conn, synthetic_events, start or date.today(), days)
+
+    # Indexes the event store queries use; building them after the bulk load is faster
+    for statement in SCHEMA[1:]:
+        c.execute(statement)
     conn.commit()
     conn.close()
+    enable_wal(DB_FILE)
     
     print(f"\nDatabase '{DB_FILE}' created and populated successfully.")
     print(f"Data has been added for {TODAY_STR}.")
 
 if __name__ == "__main__":
-    setup_database()
+    parser = argparse.ArgumentParser(description="Create events.db with sample (and optionally synthetic) events.")
+    parser.add_argument("--events", type=int, default=0, help="number of synthetic events to add")
+    parser.add_argument("--days", type=int, default=365, help="days the synthetic events are spread over")
+    parser.add_argument("--db", default="events.db")
+    args = parser.parse_args()
+    setup_database(args.db, args.events, args.days)
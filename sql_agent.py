@@ -1,42 +1,60 @@
-import sqlite3
+import asyncio
+import logging
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from sql_cache import get_sql_cache
+from sql_executor import get_executor
+from sql_results import render_results
+from sql_planner import QueryRejected, get_query_guard
+from sql_schema import get_schema_catalog, render_schema
+from token_counter import count_tokens
+from tracing import get_tracer
 
-def get_schema():
-    return """
-    Table: employees
-    Columns:
-    - id (INTEGER PRIMARY KEY)
-    - name (TEXT)
-    - department (TEXT)
-    - salary (REAL)
- 
-    Table: departments
-    Columns:
-    - id (INTEGER PRIMARY KEY)
-    - name (TEXT)
-    - budget (REAL)
-    """
+logger = logging.getLogger(__name__)
 
+SCHEMA_TOKEN_MODEL = "gpt-4-turbo"
+
+def get_schema(question: str = None):
+    """Schema of company.db, pruned to the tables and columns relevant to 'question'."""
+    return get_schema_catalog().schema_for(question)
+
+def get_schema_version():
+    # Cached SQL is only valid for the schema it was generated against
+    return get_schema_catalog().refresh().version
+
+
+def build_sql_messages(question: str, feedback: str = None):
+    schema = get_schema(question)
+    full_tokens = count_tokens(render_schema(get_schema_catalog().tables), SCHEMA_TOKEN_MODEL)
+    pruned_tokens = count_tokens(schema, SCHEMA_TOKEN_MODEL)
+    logger.info(f"Schema prompt: {pruned_tokens} tokens after pruning ({full_tokens} for the full schema)")
 
-def generate_sql(question: str, llm: ChatOpenAI) -> str:
-    
     # Create the system message with the schema
     system_content = f"""You are a SQL expert. Use this schema:
-{get_schema()}
+{schema}
 Return ONLY the SQL query without any explanation or markdown formatting."""
+    if feedback:
+        system_content += f"\nA previous query for this question was rejected: {feedback}"
     
     # Create the messages list
-    messages = [
+    return [
         SystemMessage(content=system_content),
         HumanMessage(content=f"Generate SQL for: {question}")
     ]
-    
+
+def generate_sql(question: str, llm: ChatOpenAI, feedback: str = None) -> str:
     # Use the 'llm.invoke()' method from LangChain
-    response = llm.invoke(messages)
-    
-    # The response object is different; get the content
-    sql = response.content.strip()
+    response = llm.invoke(build_sql_messages(question, feedback))
+    return clean_sql(response.content)
+
+async def agenerate_sql(question: str, llm: ChatOpenAI, feedback: str = None) -> str:
+    # Building the prompt reads the schema catalog, which may introspect the database
+    messages = await asyncio.to_thread(build_sql_messages, question, feedback)
+    response = await llm.ainvoke(messages)
+    return clean_sql(response.content)
+
+def clean_sql(content: str) -> str:
+    sql = content.strip()
     
     # Cleaning logic
     sql = sql.replace('```sql', '').replace('```SQL', '').replace('```', '')
@@ -52,53 +70,131 @@ def validate_sql(sql):
         raise ValueError("Only SELECT queries are allowed")
     return sql
 
-def execute_query(sql):
+def check_plan(sql):
+    """Returns the rejection reason if the query plan scans a large table, else None."""
+    try:
+        get_query_guard().check(validate_sql(sql))
+    except QueryRejected as e:
+        logger.warning(f"SQL rejected by plan guard: {e}")
+        return str(e)
+    except Exception:
+        # Syntax errors and the like are reported by execute_query
+        pass
+    return None
+
+def execute_query(sql, params=()):
     sql = validate_sql(sql)
-    # Connects to the database file
-    conn = sqlite3.connect('company.db')
+    # Pooled read-only connections with a per-query deadline and row caps
     try:
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        results = cursor.fetchall()
-        return results
+        with get_tracer().span("sql", "company.db", sql=sql[:500]) as span:
+            get_query_guard().check(sql, params)
+            results = get_executor().execute(sql, params)
+            span["rows"] = len(results)
+            span["truncated"] = results.truncated or None
+            return results
     except Exception as e:
         return f"Error: {str(e)}"
-    finally:
-        conn.close()
 
 def format_results(results):
     if not isinstance(results, list):
         return str(results)
     if not results:
         return "No results found"
-    
-    # If it's a single column result
-    if len(results[0]) == 1:
-        return "\n".join([str(row[0]) for row in results])
-    
-    # For multiple columns
-    if isinstance(results[0], tuple):
-        formatted_rows = []
-        for row in results:
-            row_items = []
-            for item in row:
-                if isinstance(item, float):
-                    row_items.append(f"${item:,.2f}" if "salary" in str(row) or "budget" in str(row) else f"{item:.2f}")
-                else:
-                    row_items.append(str(item))
-            formatted_rows.append("\t".join(row_items))
-        return "\n".join(formatted_rows)
-        
-    return "\n".join([str(row) for row in results])
+    # Capped at RESULT_TOKENS; larger results get a preview plus aggregates computed by SQLite
+    return render_results(results, execute=get_executor().execute)
+
+def company_names_known(names) -> bool:
+    """True if every name is a department or an employee in company.db (the intent router's entity check)."""
+    try:
+        for name in names:
+            rows = get_executor().execute(
+                "SELECT 1 FROM departments WHERE name = ?1 COLLATE NOCASE "
+                "UNION ALL SELECT 1 FROM employees WHERE name = ?1 COLLATE NOCASE OR name LIKE ?1 || ' %' LIMIT 1",
+                (name,),
+            )
+            if not rows:
+                return False
+        return True
+    except Exception as e:
+        logger.info(f"Could not check names against company.db: {e}")
+        return False
+
+def run_cached_sql(question: str, schema_version: str):
+    """
+    Answers from the SQL cache without calling the LLM, or returns None.
+    Only verified templates are served (see SQLCache.store); results prove
+    nothing about a template (a COUNT is never empty), but a replay that
+    errors or finds no rows falls back to the LLM, since the bound value
+    may not be spelled the way the data is.
+    """
+    sql_cache = get_sql_cache()
+    hit = sql_cache.lookup(question, schema_version)
+    get_tracer().record("cache", "sql", cache="hit" if hit else "miss", match=hit and hit["kind"])
+    if not hit:
+        return None
+
+    results = execute_query(hit["sql"], hit["params"])
+    if hit["kind"] == "template":
+        if not isinstance(results, list) or not results:
+            sql_cache.reject(hit)
+            return None
+        sql_cache.confirm(hit, schema_version)
+
+    logger.info(f"Cached SQL ({hit['kind']}): {hit['sql']} {hit['params'] or ''}")
+    logger.info(f"SQL cache: {sql_cache.llm_calls_avoided} LLM calls avoided, hit rate {sql_cache.hit_rate:.0%}")
+    return results
+
+def remember_sql(question: str, sql: str, results, schema_version: str):
+    # Only SQL that validated and executed cleanly is worth reusing
+    if isinstance(results, list):
+        get_sql_cache().store(question, sql, schema_version)
 
 def query_agent(question: str, llm: ChatOpenAI) -> str:
     try:
+        schema_version = get_schema_version()
+        results = run_cached_sql(question, schema_version)
+        if results is not None:
+            return format_results(results)
+
         # Generate SQL
         sql = generate_sql(question, llm)
-        print(f"Generated SQL: {sql}\n")
+        logger.info(f"Generated SQL: {sql}")
+
+        # One rewrite when the plan would scan a large table
+        feedback = check_plan(sql)
+        if feedback:
+            sql = generate_sql(question, llm, feedback)
+            logger.info(f"Rewritten SQL: {sql}")
         
         # Execute and format results
         results = execute_query(sql)
+        remember_sql(question, sql, results, schema_version)
         return format_results(results)
     except Exception as e:
         return f"Error: {str(e)}"
+
+async def aquery_agent(question: str, llm: ChatOpenAI) -> str:
+    """
+    Async version of query_agent. Everything that touches SQLite (schema
+    introspection, the queries, the aggregates in format_results) runs in a
+    worker thread; only the LLM calls run on the event loop.
+    """
+    try:
+        schema_version = await asyncio.to_thread(get_schema_version)
+        results = await asyncio.to_thread(run_cached_sql, question, schema_version)
+        if results is not None:
+            return await asyncio.to_thread(format_results, results)
+
+        sql = await agenerate_sql(question, llm)
+        logger.info(f"Generated SQL: {sql}")
+
+        feedback = await asyncio.to_thread(check_plan, sql)
+        if feedback:
+            sql = await agenerate_sql(question, llm, feedback)
+            logger.info(f"Rewritten SQL: {sql}")
+
+        results = await asyncio.to_thread(execute_query, sql)
+        await asyncio.to_thread(remember_sql, question, sql, results, schema_version)
+        return await asyncio.to_thread(format_results, results)
+    except Exception as e:
+        return f"Error: {str(e)}"
@@ -0,0 +1,257 @@
+import re
+import sqlite3
+import threading
+import time
+
+CACHE_DB = "sql_cache.db"
+CACHE_FORMAT = 2  # PRAGMA user_version; templates from older formats are dropped
+
+# What a template slot may capture: a number for a numeric literal, the same
+# number of words (or one quoted value) for a text literal
+NUMBER_SLOT = r"(\d+(?:\.\d+)?)"
+WORD = r"[^\s'\",;:!?]+"
+QUOTED = r"'[^']*'|\"[^\"]*\""
+
+# SQL string literals ('it''s') and numbers outside of identifiers
+SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+
+
+def light_normalize(question: str) -> str:
+    """Collapses whitespace and drops trailing punctuation, keeping case."""
+    return " ".join(question.split()).rstrip("?!. ")
+
+
+def normalize_question(question: str) -> str:
+    """Key for exact matches: case, punctuation and spacing don't matter."""
+    return " ".join(re.sub(r"[^\w\s']", " ", question.lower()).split())
+
+
+def parse_literal(token: str):
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+    return float(token) if "." in token else int(token)
+
+
+def slot_pattern(value) -> str:
+    """A capture group shaped like the literal it replaces."""
+    if not isinstance(value, str):
+        return NUMBER_SLOT
+    return f"({QUOTED}|" + r"\s+".join([WORD] * len(value.split())) + ")"
+
+
+def make_template(question: str, sql: str):
+    """
+    Turns a (question, SQL) pair into a reusable template when the SQL's
+    literals appear verbatim in the question, e.g.
+        "budget for Engineering" / ... WHERE name = 'Engineering'
+    becomes a pattern matching "budget for <one word>" and ... WHERE name = ?
+    Slots only capture values shaped like the original literal (digits for
+    numbers, as many words for text), and the pattern is anchored, so a
+    question with extra words ("... 50000 in Sales") does not match.
+    Returns (pattern, parameterized SQL, slot for each '?') or None.
+    """
+    text = light_normalize(question)
+    slots = []  # (start, end) of each entity in the question
+    shapes = {}  # slot -> capture group
+    sql_parts = []
+    param_slots = []
+    last = 0
+
+    for match in SQL_LITERAL.finditer(sql):
+        literal = parse_literal(match.group())
+        value = str(literal)
+        found = [m.start() for m in re.finditer(r"(?<!\w)" + re.escape(value) + r"(?!\w)", text)]
+        # Only unambiguous literals that the user actually typed
+        if len(found) != 1 or not value.strip():
+            continue
+        span = (found[0], found[0] + len(value))
+        if span not in slots:
+            if any(s < span[1] and span[0] < e for s, e in slots):
+                return None
+            slots.append(span)
+            shapes[span] = slot_pattern(literal)
+        sql_parts.append(sql[last:match.start()] + "?")
+        last = match.end()
+        param_slots.append(span)
+
+    if not slots:
+        return None
+    sql_parts.append(sql[last:])
+
+    # Too little fixed text and the template would match unrelated questions
+    if len(text) - sum(end - start for start, end in slots) < 12:
+        return None
+
+    slots.sort()
+    pattern, last = "", 0
+    for start, end in slots:
+        pattern += re.escape(text[last:start]) + shapes[(start, end)]
+        last = end
+    pattern = "^" + pattern + re.escape(text[last:]) + "$"
+
+    param_order = [slots.index(span) for span in param_slots]
+    return pattern, "".join(sql_parts), param_order
+
+
+class SQLCache:
+    """
+    Persistent cache from natural-language questions to validated SQL.
+    Entries are keyed on the schema version, so a schema change starts a
+    fresh cache. Besides exact (normalized) question matches, it learns
+    parameterized templates: a question that only differs from a cached one
+    in an entity value ("budget for Marketing" vs "budget for Engineering")
+    reuses the cached SQL with that value bound as a parameter.
+
+    A template learned from one question is only a guess, so it is not
+    served until the LLM has written the same parameterized SQL for a
+    second, different question matching it (see store).
+    """
+
+    def __init__(self, path: str = CACHE_DB):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < CACHE_FORMAT:
+            # Older templates had unverified, free-form slots
+            self.conn.execute("DROP TABLE IF EXISTS templates")
+            self.conn.execute(f"PRAGMA user_version = {CACHE_FORMAT}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "schema_version TEXT, question TEXT, sql TEXT, hits INTEGER DEFAULT 0, created REAL, "
+            "PRIMARY KEY (schema_version, question))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS templates ("
+            "schema_version TEXT, pattern TEXT, sql TEXT, param_order TEXT, hits INTEGER DEFAULT 0, created REAL, "
+            "example TEXT, verified INTEGER DEFAULT 0, PRIMARY KEY (schema_version, pattern))"
+        )
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.templates = {}  # schema version -> [(compiled pattern, pattern, sql, param order)]
+        self.stats = {"lookups": 0, "exact_hits": 0, "template_hits": 0, "template_rejects": 0, "stores": 0,
+                      "templates_verified": 0}
+
+    def load_templates(self, schema_version: str):
+        if schema_version not in self.templates:
+            rows = self.conn.execute(
+                "SELECT pattern, sql, param_order FROM templates WHERE schema_version = ? AND verified", (schema_version,)
+            ).fetchall()
+            self.templates[schema_version] = [
+                (re.compile(pattern, re.IGNORECASE), pattern, sql, [int(i) for i in order.split(",")])
+                for pattern, sql, order in rows
+            ]
+        return self.templates[schema_version]
+
+    def lookup(self, question: str, schema_version: str):
+        """
+        Returns {"sql", "params", "kind"} for a cached translation, or None.
+        'kind' is "exact" or "template".
+        """
+        with self.lock:
+            self.stats["lookups"] += 1
+            row = self.conn.execute(
+                "SELECT sql FROM questions WHERE schema_version = ? AND question = ?",
+                (schema_version, normalize_question(question)),
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    "UPDATE questions SET hits = hits + 1 WHERE schema_version = ? AND question = ?",
+                    (schema_version, normalize_question(question)),
+                )
+                self.conn.commit()
+                self.stats["exact_hits"] += 1
+                return {"sql": row[0], "params": (), "kind": "exact"}
+
+            text = light_normalize(question)
+            for compiled, pattern, sql, param_order in self.load_templates(schema_version):
+                match = compiled.match(text)
+                if match:
+                    values = [parse_value(value) for value in match.groups()]
+                    return {"sql": sql, "params": tuple(values[i] for i in param_order), "kind": "template", "pattern": pattern}
+        return None
+
+    def confirm(self, hit: dict, schema_version: str):
+        """Counts a template hit that was served."""
+        with self.lock:
+            self.stats["template_hits"] += 1
+            self.conn.execute(
+                "UPDATE templates SET hits = hits + 1 WHERE schema_version = ? AND pattern = ?",
+                (schema_version, hit["pattern"]),
+            )
+            self.conn.commit()
+
+    def reject(self, hit: dict):
+        with self.lock:
+            self.stats["template_rejects"] += 1
+
+    def store(self, question: str, sql: str, schema_version: str):
+        """
+        Records SQL that validated and executed successfully for a question.
+        If it parameterizes to a stored template's SQL and the question is
+        not that template's example, the template is marked verified.
+        """
+        template = make_template(question, sql)
+        now = time.time()
+        key = normalize_question(question)
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO questions (schema_version, question, sql, created) VALUES (?, ?, ?, ?)",
+                (schema_version, key, sql, now),
+            )
+            if template:
+                pattern, template_sql, param_order = template
+                param_order = ",".join(map(str, param_order))
+                row = self.conn.execute(
+                    "SELECT sql, param_order, example, verified FROM templates WHERE schema_version = ? AND pattern = ?",
+                    (schema_version, pattern),
+                ).fetchone()
+                if row and row[:2] == (template_sql, param_order):
+                    if not row[3] and row[2] != key:
+                        self.conn.execute(
+                            "UPDATE templates SET verified = 1 WHERE schema_version = ? AND pattern = ?",
+                            (schema_version, pattern),
+                        )
+                        self.stats["templates_verified"] += 1
+                        self.templates.pop(schema_version, None)
+                else:
+                    # New, or the LLM disagreed with the stored guess: start over from this example
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO templates (schema_version, pattern, sql, param_order, created, example) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (schema_version, pattern, template_sql, param_order, now, key),
+                    )
+                    self.templates.pop(schema_version, None)
+            self.conn.commit()
+            self.stats["stores"] += 1
+
+    @property
+    def llm_calls_avoided(self) -> int:
+        return self.stats["exact_hits"] + self.stats["template_hits"]
+
+    @property
+    def hit_rate(self) -> float:
+        return self.llm_calls_avoided / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+
+def parse_value(value: str):
+    """Binds numbers as numbers, everything else as text (without its quotes)."""
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sql_cache() -> SQLCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLCache()
+        return _cache
@@ -0,0 +1,175 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "company.db"
+POOL_SIZE = 4
+QUERY_TIMEOUT = 5.0        # seconds before a query is interrupted
+MAX_ROWS = 1000            # rows returned to the agent
+MAX_BYTES = 256 * 1024     # approximate size of the returned rows
+FETCH_SIZE = 200
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+PROGRESS_STEPS = 10_000    # VM instructions between deadline checks
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class Rows(list):
+    """Result rows, plus the column names, whether the caps cut them short and the query that produced them."""
+
+    def __init__(self, rows=(), columns=(), truncated=False, sql=None, params=()):
+        super().__init__(rows)
+        self.columns = list(columns)
+        self.truncated = truncated
+        self.sql = sql
+        self.params = params
+
+
+def row_size(row) -> int:
+    # Cheap estimate; exact Python object sizes don't matter for the cap
+    return sum(len(value) if isinstance(value, (str, bytes)) else 8 for value in row)
+
+
+def connect_read_only(path: str, cached_statements: int = 128):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False, cached_statements=cached_statements)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    return conn
+
+
+def enable_wal(path: str):
+    """
+    Switches the database to WAL so readers don't block (or get blocked by)
+    the process that writes it. The setting is persistent, so this runs
+    once from the setup scripts rather than on the read-only connections.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class SQLExecutor:
+    """
+    Pool of read-only SQLite connections for running LLM-generated SQL.
+    Connections are opened with mode=ro and query_only, so nothing can be
+    written even if validation misses a statement. Each query gets a
+    deadline enforced by a progress handler, and rows are streamed with
+    fetchmany until the row or byte cap is hit.
+    """
+
+    def __init__(self, path: str = DB_PATH, pool_size: int = POOL_SIZE, timeout: float = QUERY_TIMEOUT,
+                 max_rows: int = MAX_ROWS, max_bytes: int = MAX_BYTES):
+        self.path = path
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+
+        self.pool = queue.Queue()
+        self.deadlines = {}  # id(conn) -> monotonic deadline of the running query
+        for _ in range(pool_size):
+            self.pool.put(self.open())
+
+        self.lock = threading.Lock()
+        self.stats = {"queries": 0, "errors": 0, "timeouts": 0, "truncated": 0, "seconds": 0.0}
+
+        journal_mode = self.pool.queue[0].execute("PRAGMA journal_mode").fetchone()[0]
+        if journal_mode.lower() != "wal":
+            logger.warning(f"SQL executor: {path} uses journal_mode={journal_mode}; the setup scripts switch it to WAL")
+
+    def open(self):
+        conn = connect_read_only(self.path)
+        key = id(conn)
+        self.deadlines[key] = None
+
+        def past_deadline():
+            deadline = self.deadlines[key]
+            # A non-zero return makes SQLite abort the statement
+            return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+        conn.set_progress_handler(past_deadline, PROGRESS_STEPS)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            self.pool.put(conn)
+
+    def execute(self, sql: str, params=(), timeout: float = None) -> Rows:
+        """
+        Runs one statement and returns up to max_rows rows as a Rows list.
+        Raises QueryTimeout if it runs past the deadline and sqlite3 errors
+        for bad SQL.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        truncated = False
+
+        with self.connection() as conn:
+            self.deadlines[id(conn)] = time.monotonic() + timeout
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                columns = [column[0] for column in cursor.description or ()]
+                rows, size = [], 0
+                while not truncated:
+                    batch = cursor.fetchmany(FETCH_SIZE)
+                    if not batch:
+                        break
+                    for row in batch:
+                        size += row_size(row)
+                        if len(rows) >= self.max_rows or size > self.max_bytes:
+                            truncated = True
+                            break
+                        rows.append(row)
+            except sqlite3.OperationalError as e:
+                self.record(start, error=True, timeout="interrupted" in str(e))
+                if "interrupted" in str(e):
+                    raise QueryTimeout(f"Query took longer than {timeout:g}s and was stopped") from e
+                raise
+            except Exception:
+                self.record(start, error=True)
+                raise
+            finally:
+                self.deadlines[id(conn)] = None
+                cursor.close()
+
+        self.record(start, truncated=truncated)
+        return Rows(rows, columns, truncated, sql, params)
+
+    def record(self, start, error=False, timeout=False, truncated=False):
+        with self.lock:
+            self.stats["queries"] += 1
+            self.stats["errors"] += error
+            self.stats["timeouts"] += timeout
+            self.stats["truncated"] += truncated
+            self.stats["seconds"] += time.perf_counter() - start
+
+    def close(self):
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(path: str = DB_PATH) -> SQLExecutor:
+    """Returns the process-wide executor for a database file."""
+    with _executors_lock:
+        if path not in _executors:
+            _executors[path] = SQLExecutor(path)
+        return _executors[path]
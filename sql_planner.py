@@ -0,0 +1,255 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from sql_executor import DB_PATH, connect_read_only
+
+logger = logging.getLogger(__name__)
+
+MAX_SCAN_ROWS = 1_000_000   # row-returning full scans over bigger tables are rejected
+ROW_COUNT_TTL = 60          # seconds a table's row estimate is reused
+MIN_USES = 2                # filter/join uses before a column is recommended for an index
+
+# "FROM employees e", "JOIN departments AS d"
+TABLE_REF = re.compile(r"\b(?:from|join)\s+[\"`]?(\w+)[\"`]?(?:\s+(?:as\s+)?(\w+))?", re.IGNORECASE)
+# "e.department =", "name LIKE", "salary >=", "id IN"
+PREDICATE = re.compile(
+    r"(?:(\w+)\.)?(\w+)\s*(?:=|==|!=|<>|<=|>=|<|>|\s+like\s+|\s+in\s*\(|\s+between\s+)", re.IGNORECASE
+)
+SQL_KEYWORDS = {"where", "and", "or", "not", "on", "select", "from", "join", "as", "by", "having", "case", "when", "then", "else"}
+AGGREGATE_CALL = re.compile(r"\b(?:count|sum|avg|min|max|total|group_concat)\s*\(", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    pass
+
+
+def explain(conn, sql: str, params=()):
+    """
+    Returns the detail lines of EXPLAIN QUERY PLAN, e.g. 'SCAN employees'.
+    EXPLAIN never checks the schema cookie, so after another connection
+    adds an index it plans against a stale schema; reading sqlite_master
+    first reloads it. Use a connection without a statement cache, or a
+    cached EXPLAIN keeps its old plan.
+    """
+    conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def full_scans(plan) -> list:
+    """Tables read start to end without an index ('SCAN t', not 'SCAN t USING INDEX ...')."""
+    tables = []
+    for detail in plan:
+        match = re.match(r"SCAN (?:TABLE )?(\w+)(?: AS \w+)?$", detail)
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+def outer_query(sql: str) -> str:
+    """'sql' with string literals and everything inside parentheses blanked, leaving the outer query."""
+    chars, depth, quote = [], 0, None
+    for ch in sql:
+        if quote:
+            quote = None if ch == quote else quote
+            chars.append(" ")
+        elif ch in "'\"":
+            quote = ch
+            chars.append(" ")
+        elif ch == "(":
+            depth += 1
+            chars.append("(" if depth == 1 else " ")
+        elif ch == ")":
+            depth -= 1
+            chars.append(")" if depth == 0 else " ")
+        else:
+            chars.append(ch if depth == 0 else " ")
+    return "".join(chars)
+
+
+def returns_bounded_rows(sql: str) -> bool:
+    """
+    True if the outer query has a LIMIT or aggregates in its select list
+    ("SELECT AVG(salary) FROM employees"): it may scan, but its result is
+    small, and the executor's deadline bounds the scan itself.
+    """
+    outer = outer_query(sql)
+    if re.search(r"\blimit\b", outer, re.IGNORECASE):
+        return True
+    select_list = re.search(r"\bselect\b(.*?)\bfrom\b", outer, re.IGNORECASE | re.DOTALL)
+    return bool(select_list and AGGREGATE_CALL.search(select_list.group(1)))
+
+
+def predicate_columns(sql: str) -> list:
+    """
+    (table, column) pairs used in WHERE/ON comparisons, resolving aliases
+    against the FROM/JOIN clauses. Bare columns are left to the caller to
+    resolve (table is None). Columns compared with a leading-wildcard LIKE
+    are skipped, since no index can serve them.
+    """
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias.lower()] = table
+
+    # Only look after the first WHERE/ON so selected columns are not counted
+    start = re.search(r"\b(where|on)\b", sql, re.IGNORECASE)
+    if not start:
+        return []
+    clause = sql[start.start():]
+
+    columns = []
+    for match in PREDICATE.finditer(clause):
+        prefix, column = match.group(1), match.group(2)
+        if column.lower() in SQL_KEYWORDS or column.isdigit():
+            continue
+        if re.match(r"\s*like\s+'%", clause[match.end(2):], re.IGNORECASE):
+            continue
+        table = aliases.get(prefix.lower()) if prefix else None
+        columns.append((table, column))
+    return columns
+
+
+class QueryPlanGuard:
+    """
+    Runs EXPLAIN QUERY PLAN on every statement before it executes.
+    Full scans over tables larger than max_scan_rows are rejected when the
+    query returns rows without bound; aggregates and LIMITed queries are
+    left to the executor's deadline (an index could not avoid their scan).
+    The columns that scanned queries filter or join on are counted, so the
+    guard can recommend (or, with auto_create, build) indexes for them.
+    """
+
+    def __init__(self, path: str = DB_PATH, max_scan_rows: int = MAX_SCAN_ROWS, auto_create: bool = False):
+        self.path = path
+        self.max_scan_rows = max_scan_rows
+        self.auto_create = auto_create
+        self.lock = threading.Lock()
+        self.row_counts = {}   # table -> (expires_at, rows)
+        self.usage = Counter() # (table, column) -> uses in queries that scanned the table
+        self.stats = {"checked": 0, "rejected": 0, "full_scans": 0, "bounded_scans": 0, "indexes_created": 0}
+        # Planning is sub-millisecond, so one uncached connection is enough
+        self.conn = None
+        self.conn_lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self.conn_lock:
+            if self.conn is None:
+                self.conn = connect_read_only(self.path, cached_statements=0)
+            yield self.conn
+
+    def estimate_rows(self, conn, table: str) -> int:
+        with self.lock:
+            cached = self.row_counts.get(table)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+        try:
+            # MAX(rowid) is a single b-tree seek; COUNT(*) would read the whole table
+            rows = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            rows = 0  # WITHOUT ROWID tables
+        with self.lock:
+            self.row_counts[table] = (time.monotonic() + ROW_COUNT_TTL, rows)
+        return rows
+
+    def table_columns(self, conn, table: str) -> set:
+        return {row[1].lower() for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+    def check(self, sql: str, params=()):
+        """Raises QueryRejected if the plan fully scans a large table for an unbounded number of rows."""
+        with self.connection() as conn:
+            plan = explain(conn, sql, params)
+            scanned = full_scans(plan)
+            with self.lock:
+                self.stats["checked"] += 1
+                self.stats["full_scans"] += len(scanned)
+            if not scanned:
+                return plan
+
+            self.record_usage(conn, sql, scanned)
+            too_big = []
+            if returns_bounded_rows(sql):
+                with self.lock:
+                    self.stats["bounded_scans"] += 1
+            else:
+                too_big = [(table, self.estimate_rows(conn, table)) for table in scanned]
+                too_big = [(table, rows) for table, rows in too_big if rows > self.max_scan_rows]
+
+        if self.auto_create:
+            self.create_indexes()
+        if too_big:
+            with self.lock:
+                self.stats["rejected"] += 1
+            tables = ", ".join(f"{table} (~{rows:,} rows)" for table, rows in too_big)
+            raise QueryRejected(
+                f"The query would scan all of {tables}. Filter on an indexed column or narrow the query."
+            )
+        return plan
+
+    def record_usage(self, conn, sql: str, scanned: list):
+        columns = {table: self.table_columns(conn, table) for table in scanned}
+        with self.lock:
+            for table, column in predicate_columns(sql):
+                candidates = [table] if table else [t for t in scanned if column.lower() in columns[t]]
+                for candidate in candidates:
+                    if candidate in columns and column.lower() in columns[candidate]:
+                        self.usage[(candidate, column)] += 1
+
+    def indexed_columns(self, conn, table: str) -> set:
+        """Columns that already lead an index (including the rowid alias)."""
+        leading = {row[1].lower() for row in conn.execute(f'PRAGMA table_info("{table}")') if row[5] == 1}
+        for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+            info = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchall()
+            if info and info[0][2]:
+                leading.add(info[0][2].lower())
+        return leading
+
+    def recommendations(self, min_uses: int = MIN_USES) -> list:
+        """CREATE INDEX statements for recurring filter/join columns that have no index."""
+        with self.lock:
+            usage = [(key, uses) for key, uses in self.usage.most_common() if uses >= min_uses]
+        statements = []
+        with self.connection() as conn:
+            for (table, column), uses in usage:
+                if column.lower() in self.indexed_columns(conn, table):
+                    continue
+                statements.append(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}"("{column}")')
+        return statements
+
+    def create_indexes(self, min_uses: int = MIN_USES) -> list:
+        """
+        Builds the recommended indexes. The query connections are read-only,
+        so this opens its own writable connection.
+        """
+        statements = self.recommendations(min_uses)
+        if not statements:
+            return []
+        conn = sqlite3.connect(self.path)
+        try:
+            for statement in statements:
+                logger.info(f"Creating index: {statement}")
+                conn.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+        with self.lock:
+            self.stats["indexes_created"] += len(statements)
+        return statements
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_query_guard(path: str = DB_PATH) -> QueryPlanGuard:
+    """Process-wide guard; set SQL_AUTO_INDEX=1 to let it create recommended indexes."""
+    with _guards_lock:
+        if path not in _guards:
+            _guards[path] = QueryPlanGuard(path, auto_create=os.environ.get("SQL_AUTO_INDEX") == "1")
+        return _guards[path]
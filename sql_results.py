@@ -0,0 +1,126 @@
+import logging
+import re
+from token_counter import count_tokens
+from tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+RESULT_TOKENS = 800   # tool output fed back to the agent LLM
+FOOTER_TOKENS = 150   # kept free for the truncation note and aggregates
+TYPE_SAMPLE_ROWS = 50 # rows inspected to decide a column's type
+TOKEN_MODEL = "gpt-4-turbo"
+
+# Numeric columns shown as money, by name (also matches expressions like AVG(salary))
+CURRENCY_COLUMNS = re.compile(r"salary|salaries|budget|price|cost|amount|revenue|pay", re.IGNORECASE)
+KEY_COLUMNS = re.compile(r"^id$|_id$", re.IGNORECASE)
+
+
+def column_type(results, index: int) -> str:
+    """'int', 'float', 'text' or 'null', from the first non-NULL values of a column."""
+    kinds = {type(row[index]) for row in results[:TYPE_SAMPLE_ROWS] if row[index] is not None}
+    if not kinds:
+        return "null"
+    if kinds <= {int, bool}:
+        return "int"
+    if kinds <= {int, float}:
+        return "float"
+    return "text"
+
+
+def column_formatter(name: str, kind: str):
+    """Picks how a column's cells are rendered, once per column."""
+    if kind in ("int", "float") and CURRENCY_COLUMNS.search(name):
+        number = lambda value: f"${value:,.2f}"
+    elif kind == "float":
+        number = lambda value: f"{value:.2f}"
+    else:
+        number = str
+
+    # SQLite columns are dynamically typed, so a cell may not match its column
+    def format_cell(value):
+        if value is None:
+            return "NULL"
+        if isinstance(value, (int, float)):
+            return number(value)
+        return " ".join(str(value).split()) if isinstance(value, str) else str(value)
+
+    return format_cell
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sql_aggregates(results, numeric: list, execute):
+    """
+    COUNT(*) plus MIN, MAX and SUM of each numeric column over the whole
+    result of 'results.sql', computed by SQLite. Returns None if the query
+    fails (e.g. duplicate column names in a join).
+    """
+    parts = ["COUNT(*)"] + [f"{fn}({quote_identifier(name)})" for _, name in numeric for fn in ("MIN", "MAX", "SUM")]
+    sql = f"SELECT {', '.join(parts)} FROM ({results.sql.rstrip().rstrip(';')})"
+    try:
+        with get_tracer().span("sql", "aggregates", columns=len(numeric)):
+            row = execute(sql, results.params)[0]
+    except Exception as e:
+        logger.info(f"Aggregates over the full result failed: {e}")
+        return None
+    return row[0], [row[1 + 3 * i: 4 + 3 * i] for i in range(len(numeric))]
+
+
+def render_results(results, max_tokens: int = RESULT_TOKENS, execute=None) -> str:
+    """
+    Renders SQL result rows for the agent: a header of column names, then
+    tab-separated rows with cells formatted per column (money, decimals),
+    until 'max_tokens' is reached. If rows are left out (by the budget or
+    the executor's caps), a note says how many, and count, min, max and
+    sum of the numeric columns are added, computed by re-running the query
+    as an aggregate through 'execute(sql, params)' when the result carries
+    its SQL, else over the fetched rows.
+    """
+    width = len(results[0])
+    columns = list(getattr(results, "columns", None) or [f"column_{i + 1}" for i in range(width)])
+    kinds = [column_type(results, i) for i in range(width)]
+    formatters = [column_formatter(name, kind) for name, kind in zip(columns, kinds)]
+
+    header = "\t".join(columns)
+    lines = [header]
+    budget = max_tokens - FOOTER_TOKENS - count_tokens(header, TOKEN_MODEL)
+    for row in results:
+        line = "\t".join(format_cell(value) for format_cell, value in zip(formatters, row))
+        tokens = count_tokens(line, TOKEN_MODEL)
+        if tokens > budget and len(lines) > 1:
+            break
+        lines.append(line)
+        budget -= tokens
+
+    shown = len(lines) - 1
+    fetched_all = not getattr(results, "truncated", False)
+    if shown == len(results) and fetched_all:
+        return "\n".join(lines)
+
+    # Summed IDs mean nothing, so key columns are left out
+    numeric = [(i, name) for i, (name, kind) in enumerate(zip(columns, kinds))
+               if kind in ("int", "float") and not KEY_COLUMNS.search(name)]
+    aggregates = None
+    if execute is not None and getattr(results, "sql", None):
+        aggregates = sql_aggregates(results, numeric, execute)
+    if aggregates is not None:
+        total, stats = aggregates
+        scope = f"all {total:,} rows"
+    else:
+        # Only the fetched rows are known
+        total = len(results) if fetched_all else None
+        stats = [(min(values), max(values), sum(values)) if values else (None, None, None)
+                 for values in ([row[i] for row in results if isinstance(row[i], (int, float))] for i, _ in numeric)]
+        scope = f"all {total:,} rows" if fetched_all else f"the first {len(results):,} rows fetched"
+
+    lines.append(f"(Showing {shown:,} of {total:,} rows.)" if total is not None
+                 else f"(Showing {shown:,} rows; the query returned more than {len(results):,}.)")
+    if numeric:
+        summaries = []
+        for (i, name), (low, high, total_sum) in zip(numeric, stats):
+            format_cell = formatters[i]
+            summaries.append(f"{name}: min {format_cell(low)}, max {format_cell(high)}, sum {format_cell(total_sum)}")
+        lines.append(f"Aggregates over {scope}: " + "; ".join(summaries))
+    return "\n".join(lines)
@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import re
+import threading
+from sql_executor import DB_PATH, get_executor
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_ROWS = 50      # rows read per table to pick sample values from
+SAMPLE_VALUES = 3     # sample values shown for each text column
+MAX_TABLES = 6        # tables put in a pruned prompt (plus their foreign-key neighbours)
+PRUNE_COLUMNS_OVER = 12  # narrower tables are always shown whole
+
+
+def introspect(conn) -> dict:
+    """
+    Reads every user table from sqlite_master and PRAGMA table_info /
+    foreign_key_list. Returns {table: {"columns": [...], "foreign_keys": [...]}},
+    where each column is {"name", "type", "pk", "samples"}.
+    """
+    tables = {}
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    for table in names:
+        quoted = '"' + table.replace('"', '""') + '"'
+        columns = [
+            {"name": name, "type": col_type or "", "pk": bool(pk), "samples": []}
+            for _, name, col_type, _, _, pk in conn.execute(f"PRAGMA table_info({quoted})")
+        ]
+        foreign_keys = [
+            {"column": column, "table": ref_table, "ref_column": ref_column}
+            for _, _, ref_table, column, ref_column, *_ in conn.execute(f"PRAGMA foreign_key_list({quoted})")
+        ]
+
+        # A bounded read instead of SELECT DISTINCT, which scans the whole table
+        rows = conn.execute(f"SELECT * FROM {quoted} LIMIT {SAMPLE_ROWS}").fetchall()
+        for i, column in enumerate(columns):
+            if column["pk"]:
+                continue
+            for row in rows:
+                value = row[i]
+                if isinstance(value, str) and value not in column["samples"] and len(value) <= 40:
+                    column["samples"].append(value)
+                    if len(column["samples"]) == SAMPLE_VALUES:
+                        break
+
+        tables[table] = {"columns": columns, "foreign_keys": foreign_keys}
+    return tables
+
+
+def render_schema(tables: dict, columns=None) -> str:
+    """
+    Formats tables the way the SQL prompt expects. 'columns' optionally
+    maps a table to the column names to keep; keys and foreign keys are
+    always kept so joins still work.
+    """
+    parts = []
+    for table, info in tables.items():
+        keep = columns.get(table) if columns else None
+        fk_columns = {fk["column"] for fk in info["foreign_keys"]}
+        lines = [f"    Table: {table}", "    Columns:"]
+        for column in info["columns"]:
+            if keep is not None and column["name"] not in keep and not column["pk"] and column["name"] not in fk_columns:
+                continue
+            details = column["type"] + (" PRIMARY KEY" if column["pk"] else "")
+            if column["samples"]:
+                details += ", e.g. " + ", ".join(repr(value) for value in column["samples"])
+            lines.append(f"    - {column['name']} ({details.lstrip(', ')})")
+        for fk in info["foreign_keys"]:
+            lines.append(f"    - {fk['column']} references {fk['table']}({fk['ref_column'] or 'id'})")
+        parts.append("\n".join(lines))
+    return "\n" + "\n \n".join(parts) + "\n    "
+
+
+def words(text: str) -> set:
+    """Lower-cased words, with a crude singular form so 'departments' matches 'department'."""
+    tokens = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower().replace("_", " ")):
+        tokens.add(word)
+        if len(word) > 3 and word.endswith("s"):
+            tokens.add(word[:-1])
+    return tokens
+
+
+def prune(tables: dict, question: str, max_tables: int = MAX_TABLES):
+    """
+    Picks the tables and columns a question is likely to need by lexical
+    overlap with table names, column names and sample values, then adds
+    the tables they reference through foreign keys.
+    Returns (tables, columns) for render_schema; everything when nothing matches.
+    """
+    asked = words(question)
+    scores, matched_columns = {}, {}
+    for table, info in tables.items():
+        score = 3 * len(words(table) & asked)
+        matched = set()
+        for column in info["columns"]:
+            hits = len(words(column["name"]) & asked)
+            hits += sum(1 for value in column["samples"] if value.lower() in question.lower())
+            if hits:
+                matched.add(column["name"])
+                score += hits
+        if score:
+            scores[table] = score
+            matched_columns[table] = matched
+
+    if not scores:
+        return tables, None
+
+    selected = sorted(scores, key=scores.get, reverse=True)[:max_tables]
+    for table in list(selected):
+        for fk in tables[table]["foreign_keys"]:
+            if fk["table"] in tables and fk["table"] not in selected:
+                selected.append(fk["table"])
+    # Narrow tables and tables named in the question keep all their columns
+    columns = {
+        table: matched_columns.get(table, set())
+        for table in selected
+        if len(tables[table]["columns"]) > PRUNE_COLUMNS_OVER and not words(table) & asked
+    }
+    return {table: tables[table] for table in tables if table in selected}, columns
+
+
+class SchemaCatalog:
+    """
+    Live schema of a database, introspected once and reused until SQLite's
+    PRAGMA schema_version changes (any CREATE/ALTER/DROP bumps it).
+    'version' is a hash of the rendered schema, for keying caches.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.schema_version = None
+        self.tables = {}
+        self.version = None
+
+    def refresh(self):
+        with get_executor(self.path).connection() as conn:
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            with self.lock:
+                if schema_version != self.schema_version:
+                    logger.info(f"Introspecting schema of {self.path} (schema_version {schema_version})")
+                    self.tables = introspect(conn)
+                    self.version = hashlib.sha256(render_schema(self.tables).encode("utf-8")).hexdigest()[:16]
+                    self.schema_version = schema_version
+        return self
+
+    def schema_for(self, question: str = None) -> str:
+        self.refresh()
+        if not question:
+            return render_schema(self.tables)
+        tables, columns = prune(self.tables, question)
+        return render_schema(tables, columns)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_schema_catalog(path: str = DB_PATH) -> SchemaCatalog:
+    with _catalogs_lock:
+        if path not in _catalogs:
+            _catalogs[path] = SchemaCatalog(path)
+        return _catalogs[path]
@@ -0,0 +1,332 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from langchain_core.callbacks import BaseCallbackHandler
+from token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.path.join("traces", "traces.jsonl")
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUPS = 5
+MAX_SESSIONS = 1000     # sessions whose breakdown is kept in memory
+TURNS_PER_SESSION = 20
+
+# USD per 1M tokens (input, output); unknown models are traced without a cost
+MODEL_PRICES = {
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Set per chat turn, so spans recorded deep inside tools (SQL, HTTP) know their session
+current_session = contextvars.ContextVar("current_session", default=None)
+current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int):
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model and model.startswith(name):
+            input_price, output_price = MODEL_PRICES[name]
+            return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return None
+
+
+class Tracer:
+    """
+    Collects spans (LLM calls, tool calls, retrievals, SQL, HTTP, cache
+    lookups) from every session. Each span is appended to a rotating JSONL
+    file, folded into Prometheus-style metrics, and kept per session so the
+    app can show where the last turn spent its time.
+    """
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.lock = threading.Lock()
+        self.file_logger = logging.getLogger(f"{__name__}.spans.{id(self)}")
+        self.file_logger.propagate = False
+        self.file_logger.setLevel(logging.INFO)
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.file_logger.addHandler(handler)
+
+        # Metrics, keyed by Prometheus label tuples
+        self.span_counts = defaultdict(int)          # (kind, name, status)
+        self.span_seconds = defaultdict(float)       # (kind, name)
+        self.span_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.tokens = defaultdict(int)               # (model, "prompt"|"completion")
+        self.cost = defaultdict(float)               # model
+        self.cache = defaultdict(int)                # (cache, "hit"|"miss")
+        self.sessions = OrderedDict()                # session -> {"totals", "turns"}
+
+    def record(self, kind: str, name: str, duration: float = 0.0, status: str = "ok", session=None, turn=None, **attrs):
+        """Records one finished span."""
+        session = session or current_session.get()
+        turn = turn or current_turn.get()
+        span = {
+            "ts": round(time.time() - duration, 6),
+            "session": session,
+            "turn": turn,
+            "kind": kind,
+            "name": name,
+            "duration_ms": round(duration * 1000, 3),
+            "status": status,
+        }
+        span.update({key: value for key, value in attrs.items() if value is not None})
+
+        with self.lock:
+            self.span_counts[(kind, name, status)] += 1
+            self.span_seconds[(kind, name)] += duration
+            buckets = self.span_buckets[(kind, name)]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+            if kind == "llm":
+                self.tokens[(name, "prompt")] += attrs.get("prompt_tokens") or 0
+                self.tokens[(name, "completion")] += attrs.get("completion_tokens") or 0
+                self.cost[name] += attrs.get("cost_usd") or 0.0
+            if attrs.get("cache") in ("hit", "miss"):
+                self.cache[(name, attrs["cache"])] += 1
+            if session:
+                self.add_to_session(session, turn, span)
+
+        self.file_logger.info(json.dumps(span, default=str))
+        return span
+
+    def add_to_session(self, session, turn, span):
+        entry = self.sessions.get(session)
+        if entry is None:
+            entry = {"totals": defaultdict(lambda: {"count": 0, "seconds": 0.0}), "tokens": 0, "cost": 0.0,
+                     "turns": OrderedDict()}
+            self.sessions[session] = entry
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session)
+
+        totals = entry["totals"][span["kind"]]
+        totals["count"] += 1
+        totals["seconds"] += span["duration_ms"] / 1000
+        entry["tokens"] += (span.get("prompt_tokens") or 0) + (span.get("completion_tokens") or 0)
+        entry["cost"] += span.get("cost_usd") or 0.0
+        entry["turns"].setdefault(turn, deque(maxlen=500)).append(span)
+        while len(entry["turns"]) > TURNS_PER_SESSION:
+            entry["turns"].popitem(last=False)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs):
+        """
+        Times a block as a span. The block can add attributes through the
+        yielded dict, e.g. attrs["rows"] = len(rows).
+        """
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield attrs
+        except Exception as e:
+            status = "error"
+            attrs["error"] = str(e)[:500]
+            raise
+        finally:
+            self.record(kind, name, time.perf_counter() - start, status, **attrs)
+
+    def session_summary(self, session) -> dict:
+        """Totals per span kind for a session, plus the spans of its latest turn."""
+        with self.lock:
+            entry = self.sessions.get(session)
+            if entry is None:
+                return {"totals": {}, "tokens": 0, "cost": 0.0, "last_turn": []}
+            last_turn = list(next(reversed(entry["turns"].values()), []))
+            return {
+                "totals": {kind: dict(values) for kind, values in entry["totals"].items()},
+                "tokens": entry["tokens"],
+                "cost": entry["cost"],
+                "last_turn": last_turn,
+            }
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        def labels(**values):
+            return "{" + ",".join(f'{key}="{str(value).replace(chr(34), "")}"' for key, value in values.items()) + "}"
+
+        lines = []
+        with self.lock:
+            lines += ["# HELP chatbot_spans_total Finished spans by kind, name and status.",
+                      "# TYPE chatbot_spans_total counter"]
+            for (kind, name, status), count in sorted(self.span_counts.items()):
+                lines.append(f"chatbot_spans_total{labels(kind=kind, name=name, status=status)} {count}")
+
+            lines += ["# HELP chatbot_span_seconds Span latency.", "# TYPE chatbot_span_seconds histogram"]
+            for (kind, name), buckets in sorted(self.span_buckets.items()):
+                for bound, count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"chatbot_span_seconds_bucket{labels(kind=kind, name=name, le=bound)} {count}")
+                total = sum(count for (k, n, _), count in self.span_counts.items() if (k, n) == (kind, name))
+                lines.append(f"chatbot_span_seconds_bucket{labels(kind=kind, name=name, le='+Inf')} {total}")
+                lines.append(f"chatbot_span_seconds_sum{labels(kind=kind, name=name)} {self.span_seconds[(kind, name)]:.6f}")
+                lines.append(f"chatbot_span_seconds_count{labels(kind=kind, name=name)} {total}")
+
+            lines += ["# HELP chatbot_llm_tokens_total LLM tokens by model and type.", "# TYPE chatbot_llm_tokens_total counter"]
+            for (model, token_type), count in sorted(self.tokens.items()):
+                lines.append(f"chatbot_llm_tokens_total{labels(model=model, type=token_type)} {count}")
+
+            lines += ["# HELP chatbot_llm_cost_usd_total Estimated LLM spend.", "# TYPE chatbot_llm_cost_usd_total counter"]
+            for model, cost in sorted(self.cost.items()):
+                lines.append(f"chatbot_llm_cost_usd_total{labels(model=model)} {cost:.6f}")
+
+            lines += ["# HELP chatbot_cache_lookups_total Cache lookups by cache and result.",
+                      "# TYPE chatbot_cache_lookups_total counter"]
+            for (cache, result), count in sorted(self.cache.items()):
+                lines.append(f"chatbot_cache_lookups_total{labels(cache=cache, result=result)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.tracer.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int, tracer: Tracer = None, host: str = "127.0.0.1"):
+    """Serves /metrics for Prometheus to scrape, from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.tracer = tracer or get_tracer()
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+    return server
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that turns LLM, tool and retriever runs into spans.
+    Token counts come from the provider's usage report when there is one,
+    and are estimated with tiktoken otherwise.
+    """
+
+    def __init__(self, session: str = None, tracer: Tracer = None):
+        self.session = session
+        self.tracer = tracer or get_tracer()
+        self.runs = {}  # run_id -> (start, kind, name, attrs)
+
+    def start(self, run_id, kind, name, **attrs):
+        self.runs[run_id] = (time.perf_counter(), kind, name, attrs, current_turn.get())
+
+    def finish(self, run_id, status="ok", **attrs):
+        run = self.runs.pop(run_id, None)
+        if run is None:
+            return
+        start, kind, name, start_attrs, turn = run
+        start_attrs.update(attrs)
+        self.tracer.record(kind, name, time.perf_counter() - start, status, session=self.session, turn=turn, **start_attrs)
+
+    # LLM calls
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        model = self.model_name(serialized, kwargs)
+        prompt = "\n".join(str(m.content) for batch in messages for m in batch)
+        self.start(run_id, "llm", model, prompt_estimate=count_tokens(prompt, model))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        model = self.model_name(serialized, kwargs)
+        self.start(run_id, "llm", model, prompt_estimate=count_tokens("\n".join(prompts), model))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        model, attrs = run[2], run[3]
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+
+        if prompt_tokens is None:
+            # Streaming responses carry no usage report
+            text = "".join(g.text for generations in response.generations for g in generations)
+            prompt_tokens = attrs.get("prompt_estimate", 0)
+            completion_tokens = count_tokens(text, model)
+            attrs["tokens_estimated"] = True
+        attrs.pop("prompt_estimate", None)
+        self.finish(
+            run_id,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=estimate_cost(model, prompt_tokens, completion_tokens),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.finish(run_id, status="error", error=str(error)[:500])
+
+    # Tool calls
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self.start(run_id, "tool", name, input=str(input_str)[:200])
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self.finish(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.finish(run_id, status="error", error=str(error)[:500])
+
+    # Retrievals
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self.start(run_id, "retriever", (serialized or {}).get("name") or "retriever")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self.finish(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self.finish(run_id, status="error", error=str(error)[:500])
+
+    @staticmethod
+    def model_name(serialized, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        return (params.get("model_name") or params.get("model")
+                or ((serialized or {}).get("kwargs") or {}).get("model_name") or "llm")
+
+
+@contextmanager
+def trace_turn(session: str, **attrs):
+    """Marks a chat turn: spans recorded inside it are grouped under one turn ID."""
+    session_token = current_session.set(session)
+    turn_token = current_turn.set(uuid.uuid4().hex[:12])
+    try:
+        with get_tracer().span("turn", "chat", **attrs) as span_attrs:
+            yield span_attrs
+    finally:
+        current_turn.reset(turn_token)
+        current_session.reset(session_token)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer; TRACE_FILE='' in the environment disables the JSONL file."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(os.environ.get("TRACE_FILE", TRACE_FILE))
+        return _tracer
@@ -0,0 +1,160 @@
+import math
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+# Exact search stays fast below this many vectors
+FLAT_MAX_VECTORS = 20_000
+# HNSW needs no training but costs ~2x the memory of IVF; above this, use IVF
+HNSW_MAX_VECTORS = 200_000
+# PQ codebooks have 256 centroids each and need ~39 training points per centroid
+PQ_MIN_VECTORS = 256 * 39
+
+DEFAULT_INDEX_OPTIONS = {
+    "kind": "auto",          # auto | flat | hnsw | ivf
+    "compression": None,     # None | sq8 | pq
+    "nlist": None,           # IVF cells; defaults to 4 * sqrt(n)
+    "nprobe": 16,            # IVF cells visited per query
+    "hnsw_m": 32,            # HNSW graph degree
+    "ef_construction": 40,   # HNSW build-time beam width
+    "ef_search": 64,         # HNSW query-time beam width
+    "pq_m": None,            # PQ sub-quantizers; defaults to ~d/16
+}
+
+
+def index_options(options=None) -> dict:
+    merged = dict(DEFAULT_INDEX_OPTIONS)
+    merged.update(options or {})
+    return merged
+
+
+def index_layout(num_vectors: int, options: dict) -> str:
+    """
+    Picks the index type and storage for a corpus size, e.g. "flat",
+    "hnsw+sq8" or "ivf+pq". PQ falls back to uncompressed storage until
+    there is enough data to train it.
+    """
+    kind = options["kind"]
+    if kind == "auto":
+        if num_vectors <= FLAT_MAX_VECTORS:
+            kind = "flat"
+        elif num_vectors <= HNSW_MAX_VECTORS:
+            kind = "hnsw"
+        else:
+            kind = "ivf"
+
+    compression = options["compression"]
+    if compression == "pq" and num_vectors < PQ_MIN_VECTORS:
+        compression = None
+    return f"{kind}+{compression}" if compression else kind
+
+
+def default_nlist(num_vectors: int) -> int:
+    # faiss wants ~39 training points per cell
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def default_pq_m(dimension: int) -> int:
+    # Largest divisor of d that gives sub-vectors of at least 16 dimensions
+    for m in range(max(1, dimension // 16), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def factory_string(layout: str, dimension: int, num_vectors: int, options: dict) -> str:
+    """faiss.index_factory description for an index layout."""
+    kind, _, compression = layout.partition("+")
+    if compression == "sq8":
+        storage = "SQ8"
+    elif compression == "pq":
+        storage = f"PQ{options['pq_m'] or default_pq_m(dimension)}"
+    else:
+        storage = "Flat"
+
+    if kind == "flat":
+        return storage
+    if kind == "hnsw":
+        hnsw = f"HNSW{options['hnsw_m']}"
+        return hnsw if storage == "Flat" else f"{hnsw},{storage}"
+    if kind == "ivf":
+        return f"IVF{options['nlist'] or default_nlist(num_vectors)},{storage}"
+    raise ValueError(f"Unknown index kind: {kind}")
+
+
+def tune_index(index, options: dict):
+    """Applies query-time knobs, which are not all saved with the index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = options["ef_search"]
+    try:
+        faiss.extract_index_ivf(index).nprobe = options["nprobe"]
+    except RuntimeError:
+        pass  # Not an IVF index
+    return index
+
+
+def build_index(vectors: np.ndarray, layout: str, options: dict):
+    """Creates, trains and fills a faiss index with the given layout."""
+    dimension = vectors.shape[1]
+    index = faiss.index_factory(dimension, factory_string(layout, dimension, len(vectors), options), faiss.METRIC_L2)
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = options["ef_construction"]
+
+    if not index.is_trained:
+        # A random sample of 256 points per cell is plenty for k-means
+        sample_size = min(len(vectors), 256 * max(default_nlist(len(vectors)), 256))
+        sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+        index.train(sample)
+
+    index.add(vectors)
+    return tune_index(index, options)
+
+
+def build_vectorstore(docs, ids, embeddings, layout: str = "flat", options=None):
+    """Like FAISS.from_documents, but with a chosen faiss index layout."""
+    options = index_options(options)
+    vectors = np.array(embeddings.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+    index = build_index(vectors, layout, options)
+
+    for doc, doc_id in zip(docs, ids):
+        doc.id = doc_id
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, docs))),
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def can_remove_in_place(layout: str) -> bool:
+    """HNSW graphs cannot drop vectors; flat and IVF indexes (any storage) can."""
+    return not layout.startswith("hnsw")
+
+
+def remove_vectors(vectorstore, ids):
+    """
+    Deletes documents from a flat or IVF vectorstore in place.
+    FAISS.delete renumbers its position -> document mapping to stay
+    contiguous; flat indexes compact the same way, but IVF lists keep each
+    vector's original ID, so those are renumbered here to match.
+    """
+    reversed_index = {doc_id: position for position, doc_id in vectorstore.index_to_docstore_id.items()}
+    removed = np.array(sorted(reversed_index[doc_id] for doc_id in ids), dtype=np.int64)
+    vectorstore.delete(ids)
+
+    try:
+        ivf = faiss.extract_index_ivf(vectorstore.index)
+    except RuntimeError:
+        return  # Flat: already compacted
+    invlists = ivf.invlists
+    for list_no in range(invlists.nlist):
+        size = invlists.list_size(list_no)
+        if size == 0:
+            continue
+        old_ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy()
+        codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * invlists.code_size).copy()
+        # Each surviving ID moves down by the number of removed IDs below it
+        new_ids = old_ids - np.searchsorted(removed, old_ids)
+        invlists.update_entries(list_no, 0, size, faiss.swig_ptr(new_ids), faiss.swig_ptr(codes))
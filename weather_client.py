@@ -0,0 +1,133 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from tracing import get_tracer
+
+BASE_URL = "https://api.weatherapi.com/v1/current.json"
+CACHE_TTL = 10 * 60  # current conditions update every ~15 minutes upstream
+TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def normalize_location(location: str) -> str:
+    """'  singapore ' and 'Singapore' share one cache entry."""
+    return " ".join(location.split()).lower()
+
+
+class WeatherClient:
+    """
+    Client for WeatherAPI's current conditions, shared by the weather tool
+    and the event recommender.
+    Uses one pooled keep-alive session, caches responses per normalized
+    location for a TTL, and coalesces concurrent lookups for the same
+    location into a single upstream request.
+    """
+
+    def __init__(self, api_key: str, ttl: float = CACHE_TTL, base_url: str = BASE_URL, timeout=TIMEOUT):
+        self.api_key = api_key
+        self.ttl = ttl
+        self.base_url = base_url
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.cache = {}      # location -> (expires_at, data)
+        self.in_flight = {}  # location -> {"done": Event, "data": ..., "error": ...}
+        self.lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "upstream_calls": 0,
+            "upstream_seconds": 0.0,
+            "upstream_max_seconds": 0.0,
+        }
+
+    def get_current(self, location: str) -> dict:
+        """
+        Returns WeatherAPI's current.json payload for a location.
+        Raises requests exceptions on failure (HTTPError carries the response).
+        """
+        key = normalize_location(location)
+
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.stats["hits"] += 1
+                get_tracer().record("cache", "weather", cache="hit", location=key)
+                return cached[1]
+
+            flight = self.in_flight.get(key)
+            if flight is None:
+                # This caller fetches; everyone else waits for its result
+                flight = {"done": threading.Event(), "data": None, "error": None}
+                self.in_flight[key] = flight
+                leader = True
+                self.stats["misses"] += 1
+            else:
+                leader = False
+                self.stats["coalesced"] += 1
+        get_tracer().record("cache", "weather", cache="miss" if leader else "hit", coalesced=not leader or None, location=key)
+
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["data"]
+
+        try:
+            flight["data"] = self.fetch(key)
+            with self.lock:
+                self.cache[key] = (time.monotonic() + self.ttl, flight["data"])
+            return flight["data"]
+        except Exception as e:
+            flight["error"] = e
+            with self.lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            flight["done"].set()
+
+    def fetch(self, location: str) -> dict:
+        params = {"key": self.api_key, "q": location, "aqi": "no"}
+
+        start = time.perf_counter()
+        try:
+            with get_tracer().span("http", "weatherapi", location=location) as span:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                span["status_code"] = response.status_code
+                response.raise_for_status()
+                return response.json()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stats["upstream_calls"] += 1
+                self.stats["upstream_seconds"] += elapsed
+                self.stats["upstream_max_seconds"] = max(self.stats["upstream_max_seconds"], elapsed)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            metrics = dict(self.stats)
+        lookups = metrics["hits"] + metrics["misses"] + metrics["coalesced"]
+        metrics["hit_rate"] = (metrics["hits"] + metrics["coalesced"]) / lookups if lookups else 0.0
+        metrics["upstream_avg_seconds"] = (
+            metrics["upstream_seconds"] / metrics["upstream_calls"] if metrics["upstream_calls"] else 0.0
+        )
+        return metrics
+
+
+def get_weather_client(api_key: str) -> WeatherClient:
+    """Returns the process-wide client for an API key."""
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = WeatherClient(api_key)
+        return _clients[api_key]